@@ -5,6 +5,7 @@ from .core import (
     FileToken,
     OutputToken,
     PathToken,
+    QueryError,
     Remake,
     RemakeError,
     Rule,
@@ -17,12 +18,24 @@ from .core import (
     deferrable,
     rule,
 )
-from .executors import (
-    DaskExecutor,
-    Executor,
-    MultiprocExecutor,
-    SingleprocExecutor,
-    SlurmExecutor,
-)
+from .executors import Executor
 from .loader import load_remake
 from .metadata import MetadataManager, Sqlite3Backend, TaskRecord
+
+# Executors are imported on first use: see executors/__init__.py.
+_EXECUTORS = (
+    'AsyncioExecutor',
+    'DaskExecutor',
+    'MultiprocExecutor',
+    'SingleprocExecutor',
+    'SlurmExecutor',
+    'ThreadExecutor',
+)
+
+
+def __getattr__(name):
+    if name in _EXECUTORS:
+        from . import executors
+
+        return getattr(executors, name)
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
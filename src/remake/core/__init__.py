@@ -1,6 +1,7 @@
 from .dag import build_rule_dag, expand_rule, resolve_matrix
 from .exceptions import (
     Defer,
+    QueryError,
     RemakeError,
     RemakeLoadError,
     ScopeError,
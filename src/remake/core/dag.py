@@ -4,18 +4,114 @@ The rule DAG is the only graph remake builds — there is no task-level DAG.
 See remake3_design.md, "No task-level DAG".
 """
 import itertools
+from hashlib import sha1
 
-import networkx as nx
-
+from ..util.profile import phase
 from .exceptions import Defer, SignatureError
+from .query import Query
 from .rule import is_deferrable
-from .task import Task
+from .task import TaskBatch
+
+
+class RuleDag:
+    """The rule DAG: rules and their depends_on edges, in insertion order.
+
+    Remake needs only successors and a topological order of a graph of tens
+    of rules, and importing networkx took longer than the rest of remake's
+    start-up — paid by every CLI call, including every SLURM array element.
+    The order is networkx's (topological generations, each in insertion
+    order), so plan order is unchanged. `to_networkx()` gives a DiGraph for
+    anything more.
+    """
+
+    def __init__(self):
+        self._succ = {}  # rule -> {dependent: None} (an ordered set)
+        self._pred = {}
+
+    def add_node(self, rule):
+        self._succ.setdefault(rule, {})
+        self._pred.setdefault(rule, {})
+
+    def add_edge(self, upstream, rule):
+        self.add_node(upstream)
+        self.add_node(rule)
+        self._succ[upstream][rule] = None
+        self._pred[rule][upstream] = None
+
+    def __iter__(self):
+        return iter(self._succ)
+
+    def __len__(self):
+        return len(self._succ)
+
+    def __contains__(self, rule):
+        return rule in self._succ
+
+    def successors(self, rule):
+        return iter(self._succ[rule])
+
+    def predecessors(self, rule):
+        return iter(self._pred[rule])
+
+    def topological_order(self):
+        """Rules, each after everything it depends on. ValueError on a cycle."""
+        indegree = {rule: len(preds) for rule, preds in self._pred.items()}
+        generation = [rule for rule, n in indegree.items() if not n]
+        order = []
+        while generation:
+            order.extend(generation)
+            following = []
+            for rule in generation:
+                for child in self._succ[rule]:
+                    indegree[child] -= 1
+                    if not indegree[child]:
+                        following.append(child)
+            generation = following
+        if len(order) != len(indegree):
+            raise ValueError(f'Rule dependencies contain a cycle: {self.find_cycle()}')
+        return order
+
+    def find_cycle(self):
+        """Edges [(upstream, rule), ...] of one cycle, or [] if there is none."""
+        done = set()
+        for root in self._succ:
+            if root in done:
+                continue
+            # Iterative DFS; `path` holds the rules on the current branch.
+            path, on_path = [root], {root: 0}
+            stack = [iter(self._succ[root])]
+            while stack:
+                child = next(stack[-1], None)
+                if child is None:
+                    stack.pop()
+                    finished = path.pop()
+                    del on_path[finished]
+                    done.add(finished)
+                    continue
+                if child in on_path:
+                    cycle = path[on_path[child]:] + [child]
+                    return list(zip(cycle, cycle[1:]))
+                if child not in done:
+                    on_path[child] = len(path)
+                    path.append(child)
+                    stack.append(iter(self._succ[child]))
+        return []
+
+    def to_networkx(self):
+        """The same graph as a networkx DiGraph."""
+        import networkx as nx
+
+        g = nx.DiGraph()
+        g.add_nodes_from(self._succ)
+        g.add_edges_from((u, v) for u, succ in self._succ.items() for v in succ)
+        return g
 
 
 def build_rule_dag(rules):
-    """Directed rule-level DAG from explicit depends_on declarations."""
+    """Directed rule-level DAG (a RuleDag) from explicit depends_on
+    declarations. ValueError on an unknown rule name or a cycle."""
     rules_by_name = {rule.name: rule for rule in rules}
-    g = nx.DiGraph()
+    g = RuleDag()
     for rule in rules:
         g.add_node(rule)
         resolved = []
@@ -29,9 +125,7 @@ def build_rule_dag(rules):
             resolved.append(dep)
             g.add_edge(dep, rule)
         rule.depends_on = resolved
-    if not nx.is_directed_acyclic_graph(g):
-        cycle = nx.find_cycle(g)
-        raise ValueError(f'Rule dependencies contain a cycle: {cycle}')
+    g.topological_order()  # raises on a cycle
     return g
 
 
@@ -81,6 +175,22 @@ def resolve_matrix(matrix):
     ]
 
 
+def matrix_digest(matrix):
+    """Stable digest of a static matrix (None, dict or list), or None for a
+    callable matrix — its rows are only knowable by calling it, which is the
+    expansion cost a digest exists to avoid. Axes are listed out (not repr'd
+    as containers) so a range or generator-backed axis digests by its values."""
+    if matrix is None:
+        payload = 'None'
+    elif callable(matrix) and not isinstance(matrix, (dict, list)):
+        return None
+    elif isinstance(matrix, dict):
+        payload = repr([(key, list(values)) for key, values in matrix.items()])
+    else:
+        payload = repr(matrix)
+    return sha1(payload.encode()).hexdigest()
+
+
 def expand_rule(rule, predicate=None):
     """Expand the matrix for one rule into Task objects (no I/O).
 
@@ -88,8 +198,105 @@ def expand_rule(rule, predicate=None):
     construction so filtered-out tasks are never created. The namespace is
     the task kwargs plus 'rule' (the rule name — it wins over a matrix key
     of the same name), so queries can select by rule: "rule == 'extract'".
+
+    Keys are computed in bulk (see TaskBatch.keys) and cached on the Tasks.
     """
-    return list(iter_expand_rule(rule, predicate))
+    batch = expand_rule_batch(rule, predicate)
+    batch.keys  # noqa: B018 — computed once, seeded into each Task below
+    return list(batch)
+
+
+def expand_rule_batch(rule, predicate=None):
+    """Expand the matrix for one rule into a TaskBatch (no I/O, no Task
+    objects). A dict matrix is expanded column by column: its rows are never
+    built as dicts, and values are checked once per axis value rather than
+    once per row. Rows, their order and validation match expand_rule; the
+    predicate (see expand_rule) still sees one namespace per row."""
+    with phase('expand') as timed:
+        matrix = rule.matrix
+        query = predicate if isinstance(predicate, Query) else None
+        columns = (_product_columns(rule, matrix, query)
+                   if isinstance(matrix, dict) else None)
+        if columns is not None:
+            batch = TaskBatch(rule, *columns)
+            if query is not None:
+                # Conditions were applied to the axes; only the rest is left.
+                predicate = query.residual_predicate()
+        else:
+            kwargs_list = resolve_matrix(matrix)
+            if callable(matrix) and kwargs_list:
+                # Deferred half of the signature contract: parameter names were
+                # unknowable at decoration time for callable matrices.
+                _check_expanded_kwargs(rule, kwargs_list[0])
+            for kw in kwargs_list:
+                _check_scalar_kwargs(rule, kw)
+            batch = TaskBatch.from_kwargs(rule, kwargs_list)
+        if predicate is not None:
+            batch = batch.take(
+                i for i in range(len(batch))
+                if predicate({**batch.kwargs(i), 'rule': rule.name})
+            )
+        timed.items = len(batch)
+    return batch
+
+
+def _product_columns(rule, matrix, query=None):
+    """(names, columns, nrows) of a dict matrix's cartesian product, in
+    resolve_matrix's row order: the last axis varies fastest. None when two
+    axes bind the same kwarg (left to resolve_matrix's merge semantics).
+
+    query: a Query whose conditions are applied before the product — to
+    the rule name, and to each axis's values (all values are validated
+    first, as without one). The rows are those of the full product that
+    satisfy the conditions, in the same order."""
+    axes = []  # (kwarg names, value tuples)
+    for key, values in matrix.items():
+        values = list(values)
+        if isinstance(key, tuple):
+            for v in values:
+                if not isinstance(v, tuple) or len(v) != len(key):
+                    raise SignatureError(
+                        f'matrix tuple key {key} expects value tuples of length '
+                        f'{len(key)}, got {v!r}'
+                    )
+            axes.append((list(key), values))
+        else:
+            axes.append(([key], [(v,) for v in values]))
+    names = [name for axis_names, _ in axes for name in axis_names]
+    if len(set(names)) != len(names):
+        return None
+    for axis_names, values in axes:
+        for v in values:
+            _check_scalar_kwargs(rule, dict(zip(axis_names, v)))
+    if query is not None:
+        if not query.accepts('rule', rule.name) or set(query.conditions) - {'rule', *names}:
+            # Wrong rule, or a condition on a kwarg this rule doesn't have.
+            return names, [[] for _ in names], 0
+        axes = [
+            (axis_names, [v for v in values
+                          if all(query.accepts(name, value)
+                                 for name, value in zip(axis_names, v)
+                                 if name != 'rule')])
+            for axis_names, values in axes
+        ]
+
+    nrows = 1
+    for _, values in axes:
+        nrows *= len(values)
+    columns = []
+    inner, outer = nrows, 1
+    for axis_names, values in axes:
+        if not nrows:
+            columns.extend([] for _ in axis_names)
+            continue
+        inner //= len(values)
+        for pos in range(len(axis_names)):
+            column = []
+            for v in values:
+                column.extend([v[pos]] * inner)
+            columns.append(column * outer)
+        outer *= len(values)
+    return names, columns, nrows
 
 
 # Matrix kwarg values must survive the JSON round-trip used to ship SLURM
@@ -113,17 +320,23 @@ def _check_scalar_kwargs(rule, kwargs):
             )
 
 
+def in_matrix(rule, kwargs):
+    """Whether kwargs is a row of the rule's current matrix. Checked as an
+    equality query, so a dict matrix is checked axis by axis (see
+    _product_columns) and never expanded; other matrices are. False if the
+    matrix defers."""
+    query = Query(' and '.join(
+        f'{name} == {value!r}' for name, value in kwargs.items() if name != 'rule') or 'True')
+    try:
+        batch = expand_rule_batch(rule, query)
+    except Defer:
+        return False
+    return any(batch.kwargs(i) == kwargs for i in range(len(batch)))
+
+
 def iter_expand_rule(rule, predicate=None):
     """Generator form of expand_rule — yields Tasks one at a time."""
-    kwargs_list = resolve_matrix(rule.matrix)
-    if callable(rule.matrix) and kwargs_list:
-        # Deferred half of the signature contract: parameter names were
-        # unknowable at decoration time for callable matrices.
-        _check_expanded_kwargs(rule, kwargs_list[0])
-    for kw in kwargs_list:
-        _check_scalar_kwargs(rule, kw)
-        if predicate is None or predicate({**kw, 'rule': rule.name}):
-            yield Task(rule=rule, kwargs=kw)
+    yield from expand_rule_batch(rule, predicate)
 
 
 def _check_expanded_kwargs(rule, kwargs):
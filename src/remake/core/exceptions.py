@@ -12,6 +12,12 @@ class SignatureError(RemakeError):
     pass
 
 
+class QueryError(RemakeError):
+    """A task-filter query (-Q) that does not parse or uses disallowed syntax."""
+
+    pass
+
+
 class ScopeError(RemakeError):
     """Rule function uses undeclared names from outer scope (strict mode)."""
 
@@ -6,79 +6,130 @@ compare), uses changed, or any relevant upstream task reruns. Filesystem
 checks happen only via the opt-in check_outputs modes.
 """
 import difflib
-from collections import namedtuple
+from collections import Counter, namedtuple
+from hashlib import sha1
 from time import perf_counter
 
-import networkx as nx
 from loguru import logger
 
-from ..metadata.metadata_manager import TASK_STATUS_FAILED, TASK_STATUS_SUCCESS
-from ..util.code_compare import CodeComparer
-from .dag import expand_rule
+from ..metadata.metadata_manager import (
+    STATUS_NAMES,
+    TASK_STATUS_FAILED,
+    TASK_STATUS_SUCCESS,
+)
+from ..util.code_compare import CodeComparer, ast_digest
+from ..util.profile import phase, profile_rule
+from .dag import expand_rule_batch, matrix_digest
 from .exceptions import Defer
+from .query import Query
 from .rule import is_deferrable
-from .scope import (
-    io_hash,
-    parse_io_hash,
-    parse_uses_hash,
-    raw_uses_parts,
-    uses_hash,
-    uses_parts,
-)
+from .scope import parse_io_hash, parse_uses_hash, raw_uses_parts, uses_parts
+from .task import Task, TaskBatch, prime_keys
+from .tokens import check_complete
+
+# Bump when the planner's rerun rules change, so snapshots written by an older
+# planner are never reused (see _plan_fingerprint).
+PLAN_SNAPSHOT_VERSION = 1
+# Snapshots store the rerunning tasks' kwargs; past this many a snapshot is
+# more JSON to parse than the expansion it saves, so none is stored.
+PLAN_SNAPSHOT_MAX_RERUN = 10000
 
 
 def make_predicate(query):
     """Compile a task-filter expression evaluated against task kwargs plus
     'rule' (the rule name), e.g. "year > 1985 and model == 'era5'",
-    "rule in ['extract', 'clean']"."""
-    # MM: this looks like a risk - using compile to compile the code?
-    # See how pyquerylist does this - it only allows certain Python ops.
-    code = compile(query, '<query>', 'eval')
+    "rule in ['extract', 'clean']". A Query (core/query.py): QueryError on
+    syntax outside the query language; expansion pushes what it can down
+    to the matrix axes."""
+    return Query(query)
 
-    def predicate(kwargs):
-        try:
-            return bool(eval(code, {'__builtins__': {}}, dict(kwargs)))
-        except NameError:
-            # Query references a kwarg this rule doesn't have: no match.
-            return False
 
-    return predicate
-
-
-def _upstream_rerunning(rule, rerun_kwargs):
+def _upstream_rerunning(rule, rerun_keys):
     """Any depends_on upstream rerunning this wave? An entry is 'all'
-    (truthy) or a set of kwarg-tuples (truthy when non-empty); a rule that
+    (truthy) or a set of task keys (truthy when non-empty); a rule that
     fully passes leaves an empty set (falsy)."""
-    return any(rerun_kwargs.get(dep) for dep in rule.depends_on)
+    return any(rerun_keys.get(dep) for dep in rule.depends_on)
 
 
-def _same_matrix(rule, dep):
+def same_matrix(rule, dep):
     """Element-wise rerun propagation applies when a rule shares its
     upstream's matrix (the matrix=upstream.matrix idiom)."""
     return rule.matrix is dep.matrix or rule.matrix == dep.matrix
 
 
-def _max_upstream_run_seq(rule, task_kwargs, run_seq_by_rule):
-    """Highest run_seq among the upstream tasks feeding this task — element-wise
-    when the matrices match, else the max over all of the upstream rule's tasks
-    (conservative, mirroring rerun propagation). `run_seq_by_rule` maps a rule
-    to {frozenset(kwargs.items()): run_seq or None}. Returns None when no
-    upstream run_seq is known (nothing to compare against)."""
-    best = None
+def _upstream_run_seqs(rule, batch, upstream_records):
+    """Per row of `batch`, the highest run_seq among the upstream tasks feeding
+    it — element-wise when the matrices match (the counterpart task, found by
+    key), else the max over all of the upstream rule's tasks (conservative,
+    mirroring rerun propagation). `upstream_records` maps a rule to its
+    {key: TaskRecord}; rules absent from it contribute nothing. An entry is
+    None when no upstream run_seq is known (nothing to compare against)."""
+    best = [None] * len(batch)
     for dep in rule.depends_on:
-        seqs = run_seq_by_rule.get(dep, {})
-        candidates = [seqs.get(task_kwargs)] if _same_matrix(rule, dep) else seqs.values()
-        for s in candidates:
-            if s is not None and (best is None or s > best):
-                best = s
+        records = upstream_records.get(dep)
+        if not records:
+            continue
+        if same_matrix(rule, dep):
+            seqs = [rec.run_seq if (rec := records.get(key)) is not None else None
+                    for key in batch.keys_as(dep.name)]
+        else:
+            top = max((rec.run_seq for rec in records.values()
+                       if rec.run_seq is not None), default=None)
+            if top is None:
+                continue
+            seqs = [top] * len(batch)
+        best = [b if s is None or (b is not None and b >= s) else s
+                for b, s in zip(best, seqs)]
     return best
 
 
+def _plan_fingerprint(rule, task_gen, fingerprints, renderings, ignore_code_changes):
+    """Everything a rule's plan result depends on, hashed: its matrix, its
+    current run/uses/io renderings (None under ignore_code_changes, which
+    never reads them), its task-write generation (`task_gen` — bumped by every
+    write to its records, so it covers statuses, stored code ids and run_seqs)
+    and its upstreams' fingerprints (their rerun sets and run_seqs). Returns
+    None when any part is unknowable without expanding: a callable matrix, or
+    an upstream without a fingerprint.
+
+    Only valid for a plan without a query, force or filesystem checks — plan()
+    does not consult snapshots otherwise."""
+    digest = matrix_digest(rule.matrix)
+    if digest is None:
+        return None
+    upstream = []
+    for dep in rule.depends_on:
+        fingerprint = fingerprints.get(dep)
+        if fingerprint is None:
+            return None
+        upstream.append((dep.name, fingerprint, same_matrix(rule, dep)))
+    payload = repr((
+        PLAN_SNAPSHOT_VERSION, rule.name, digest, task_gen, upstream,
+        ignore_code_changes, renderings,
+    ))
+    return sha1(payload.encode()).hexdigest()
+
+
 def _outputs_complete(task):
     outputs = task.outputs
     return bool(outputs) and all(token.is_complete() for token in outputs.values())
 
 
+def outputs_complete(tasks):
+    """[complete?] per task: True/False whether all its outputs are complete,
+    None for a task with no declared outputs (nothing to check). Every output
+    of every task is checked in one tokens.check_complete call — the batched
+    form of _outputs_complete."""
+    outputs = [list(task.outputs.values()) for task in tasks]
+    flat = check_complete(token for task_outputs in outputs for token in task_outputs)
+    done, pos = [], 0
+    for task_outputs in outputs:
+        n = len(task_outputs)
+        done.append(all(flat[pos:pos + n]) if n else None)
+        pos += n
+    return done
+
+
 def cascade_settled(rule_set, dag, selected, run_seq, status):
     """Guarded downstream cascade for `set-state --success`.
 
@@ -101,7 +152,7 @@ def cascade_settled(rule_set, dag, selected, run_seq, status):
     does, re-triggering its own descendants on the next pass.
     """
     settled = {rule: set(ids) for rule, ids in selected.items()}
-    for rule in nx.topological_sort(dag):
+    for rule in dag.topological_order():
         if rule not in rule_set or not rule.depends_on:
             continue
         for task_kwargs, st in status.get(rule, {}).items():
@@ -110,7 +161,7 @@ def cascade_settled(rule_set, dag, selected, run_seq, status):
             this_seq = run_seq.get(rule, {}).get(task_kwargs)
             downstream_of_settled = independent_newer = False
             for dep in rule.depends_on:
-                dep_ids = ([task_kwargs] if _same_matrix(rule, dep)
+                dep_ids = ([task_kwargs] if same_matrix(rule, dep)
                            else list(run_seq.get(dep, {})))
                 for did in dep_ids:
                     if did in settled.get(dep, set()):
@@ -136,7 +187,7 @@ def upstream_failed(task, failures):
         failed = failures.get(dep)
         if not failed:
             continue
-        if _same_matrix(task.rule, dep):
+        if same_matrix(task.rule, dep):
             if frozenset(task.kwargs.items()) in failed:
                 return True
         else:
@@ -240,13 +291,13 @@ def explain_task(rules, dag, metadata, task, *, check_outputs='never', runnable=
             )
             reasons.append(Reason('code-changed', f'run code changed since last run:\n{diff}'))
         stored_uses = codes.get(rec.uses_code_id) or ''
-        if stored_uses != uses_hash(task.rule.uses):
+        if stored_uses != task.rule.uses_hash:
             old_manifest = (metadata.get_uses_manifest(rec.uses_code_id)
                             if rec.uses_code_id is not None else {})
             reasons.append(Reason('uses-changed',
                 _uses_change_message(stored_uses, task.rule.uses, old_manifest)))
         stored_io = codes.get(rec.io_code_id)
-        current_io = io_hash(task.rule)
+        current_io = task.rule.io_hash
         if rec.io_code_id is not None and stored_io != current_io:
             # Name which segment differs — diagnosing an io-changed rerun
             # previously meant pulling the stored string from the DB and
@@ -266,7 +317,7 @@ def explain_task(rules, dag, metadata, task, *, check_outputs='never', runnable=
         dep_running = [t for t in runnable if t.rule is dep]
         if not dep_running:
             continue
-        if _same_matrix(task.rule, dep):
+        if same_matrix(task.rule, dep):
             match = [t for t in dep_running if t.kwargs == task.kwargs]
             if match:
                 in_pass_upstream = True
@@ -282,22 +333,16 @@ def explain_task(rules, dag, metadata, task, *, check_outputs='never', runnable=
     # invocation than this task without rerunning it in the same pass (the gap
     # that an in-pass-only signal misses). Only reported when nothing upstream
     # is rerunning *this* pass — otherwise the upstream-rerun reason above is
-    # the live cause. Mirrors the planner's `_max_upstream_run_seq` check.
+    # the live cause. Mirrors the planner's `_upstream_run_seqs` check.
     if rec is not None and rec.run_seq is not None and not in_pass_upstream:
-        run_seq_by_rule = {}
+        upstream_records = {}
         for dep in task.rule.depends_on:
             try:
-                dep_tasks = expand_rule(dep)
+                upstream_records[dep] = metadata.get_tasks_status(expand_rule_batch(dep))
             except Defer:
                 continue
-            dep_recs = metadata.get_tasks_status(dep_tasks)
-            run_seq_by_rule[dep] = {
-                frozenset(t.kwargs.items()):
-                    (dep_recs[t.key].run_seq if t.key in dep_recs else None)
-                for t in dep_tasks
-            }
-        up_seq = _max_upstream_run_seq(
-            task.rule, frozenset(task.kwargs.items()), run_seq_by_rule)
+        (up_seq,) = _upstream_run_seqs(
+            task.rule, TaskBatch.from_kwargs(task.rule, [task.kwargs]), upstream_records)
         if up_seq is not None and up_seq > rec.run_seq:
             reasons.append(Reason('upstream-newer',
                 f'an upstream ran more recently (run_seq {up_seq} > {rec.run_seq}) '
@@ -307,7 +352,7 @@ def explain_task(rules, dag, metadata, task, *, check_outputs='never', runnable=
 
 
 def plan(rules, dag, metadata, *, query=None, force=False, check_outputs='never',
-         ignore_code_changes=False):
+         ignore_code_changes=False, tallies=None):
     """Return (runnable_tasks, deferred_rules).
 
     runnable_tasks: ordered (rule-topologically) list of tasks needing a run.
@@ -319,6 +364,14 @@ def plan(rules, dag, metadata, *, query=None, force=False, check_outputs='never'
     comparisons are skipped, so a task reruns only if it has never
     *succeeded* (failed counts as not run) or an upstream task reruns
     this wave (a fan-in must still pick up newly-run elements).
+
+    tallies: optional dict, filled with rule name -> Counter{(status name,
+    rerun): ntasks} for every non-deferred rule (the `remake info` counts).
+
+    A plan without query/force/filesystem checks reuses each rule's stored
+    snapshot while its fingerprint (`_plan_fingerprint`) is unchanged: the
+    rule is neither expanded nor queried. Rules planned in full store a fresh
+    snapshot for next time.
     """
     # MM: this is a core piece of logic, but I find it hard to understand end-to-end.
     # MM: also quite a long func.
@@ -326,26 +379,38 @@ def plan(rules, dag, metadata, *, query=None, force=False, check_outputs='never'
     predicate = make_predicate(query) if query else None
     code_comparer = CodeComparer()
     rules = set(rules)
+    # Snapshots encode the DB-only view: a query changes the task set, force
+    # the outcome, and check_outputs depends on the filesystem.
+    use_snapshots = query is None and not force and check_outputs == 'never'
+    # Read before any records: a write landing mid-plan bumps task_gen past
+    # the generation stored below, so a snapshot built from records older
+    # than the DB is never served.
+    with phase('snapshot_load'):
+        snapshots = metadata.get_plan_snapshots(rules) if use_snapshots else {}
+    fingerprints = {}  # rule -> fingerprint, or None (not snapshot-able)
+    from_snapshot = set()
+    new_snapshots = {}
 
     runnable = []
     deferred = []
-    rerun_kwargs = {}  # rule -> set of frozenset(kwargs.items()), or 'all'
-    # rule -> {frozenset(kwargs.items()): run_seq or None}. Threaded in topo
-    # order so a task can compare its stored run_seq against its upstreams'
-    # (durable cross-pass propagation; see bugs/01_durable_rerun_propagation.md).
-    task_run_seq = {}
+    rerun_keys = {}  # rule -> set of rerunning task keys, or 'all'
+    # rule -> {key: TaskRecord} of its planned tasks. Threaded in topo order so
+    # a task can compare its stored run_seq against its upstreams' (durable
+    # cross-pass propagation; see bugs/01_durable_rerun_propagation.md).
+    rule_records = {}
 
-    for rule in nx.topological_sort(dag):
+    for rule in dag.topological_order():
         if rule not in rules:
             continue
+        profile_rule(rule.name)
         if any(dep in deferred for dep in rule.depends_on):
             # Downstream of a deferred rule: cannot run this wave even if
             # its own matrix is static — its upstream tasks don't exist yet.
             logger.debug('{}: deferred (downstream of a deferred rule)', rule.name)
             deferred.append(rule)
-            rerun_kwargs[rule] = 'all'
+            rerun_keys[rule] = 'all'
             continue
-        if is_deferrable(rule.matrix) and _upstream_rerunning(rule, rerun_kwargs):
+        if is_deferrable(rule.matrix) and _upstream_rerunning(rule, rerun_keys):
             # A @deferrable matrix derives its task set from upstream outputs.
             # If an upstream is rerunning this wave its on-disk output is stale,
             # so expanding now would build the wrong task set. Defer: the local
@@ -355,19 +420,53 @@ def plan(rules, dag, metadata, *, query=None, force=False, check_outputs='never'
                 '{}: deferred (deferrable matrix, upstream rerunning)', rule.name
             )
             deferred.append(rule)
-            rerun_kwargs[rule] = 'all'
+            rerun_keys[rule] = 'all'
             continue
+        # Current renderings, shared by the fingerprint and the code checks.
+        # Not needed when nothing reads them: force reruns unconditionally,
+        # ignore_code_changes skips the freshness checks (uses_hash alone can
+        # render ~100 KB per rule).
+        renderings = None
+        if not force and not ignore_code_changes:
+            with phase('render'):
+                renderings = (rule.source['run'], rule.uses_hash, rule.io_hash)
+        fingerprint = None
+        if rule.name in snapshots:
+            task_gen, stored_fingerprint, snapshot = snapshots[rule.name]
+            with phase('fingerprint'):
+                fingerprint = _plan_fingerprint(
+                    rule, task_gen, fingerprints, renderings, ignore_code_changes)
+            fingerprints[rule] = fingerprint
+            if fingerprint is not None and fingerprint == stored_fingerprint:
+                with phase('tasks', len(snapshot['rerun'])):
+                    rule_runnable = prime_keys(
+                        [Task(rule=rule, kwargs=kw) for kw in snapshot['rerun']])
+                runnable.extend(rule_runnable)
+                rerun_keys[rule] = {task.key for task in rule_runnable}
+                from_snapshot.add(rule)
+                counts = Counter({
+                    (status, rerun): n for status, rerun, n in snapshot['counts']})
+                if tallies is not None:
+                    tallies[rule.name] = counts
+                logger.debug(
+                    '{}: {} task(s), {} to rerun (unchanged since last plan)',
+                    rule.name, sum(counts.values()), len(rule_runnable))
+                continue
+
         try:
-            tasks = expand_rule(rule, predicate)
+            batch = expand_rule_batch(rule, predicate)
         except Defer:
             logger.debug('{}: deferred (matrix not ready)', rule.name)
             deferred.append(rule)
             # Unknown tasks: downstream rules must assume everything reruns.
-            rerun_kwargs[rule] = 'all'
+            rerun_keys[rule] = 'all'
             continue
 
-        records = metadata.get_tasks_status(tasks)
-        rule_rerun = set()
+        # Columnar from here on: rows are walked by index and key, and a Task
+        # is only built for a row that reruns or whose outputs must be checked.
+        with phase('keys', len(batch)):
+            keys = batch.keys
+        records = metadata.get_tasks_status(batch)
 
         # Records carry code *ids*, not text; resolve the distinct few (per
         # rule, typically 1 of each — more only when tasks last ran under
@@ -375,108 +474,166 @@ def plan(rules, dag, metadata, *, query=None, force=False, check_outputs='never'
         # once. The per-task check below is then set membership on ints —
         # this is what keeps status+plan cost from scaling with task count
         # (logs_analysis §1.1/1.2). Skipped entirely when nothing will read
-        # the sets: force reruns unconditionally, ignore_code_changes skips
-        # the freshness checks — either way the source rendering and compares
-        # would be pure waste (uses_hash alone can render ~100 KB per rule).
+        # the sets (no renderings: see above).
         run_unchanged = uses_unchanged = io_unchanged = frozenset()
-        if not force and not ignore_code_changes:
-            run_src = rule.source['run']
-            current_uses_hash = uses_hash(rule.uses)
-            current_io_hash = io_hash(rule)
+        if renderings is not None:
+            run_src, current_uses_hash, current_io_hash = renderings
             run_ids = {rec.run_code_id for rec in records.values()}
             uses_ids = {rec.uses_code_id for rec in records.values()}
             io_ids = {rec.io_code_id for rec in records.values()}
             codes = metadata.get_codes(run_ids | uses_ids | io_ids)
-            run_unchanged = {cid for cid in run_ids
-                             if code_comparer(codes.get(cid) or '', run_src)}
-            uses_unchanged = {cid for cid in uses_ids
-                              if (codes.get(cid) or '') == current_uses_hash}
-            # io id None = pre-upgrade record, not tracked: never a rerun cause.
-            io_unchanged = {cid for cid in io_ids
-                            if cid is None or codes.get(cid) == current_io_hash}
-
-        # MM: what does this block do?
-        upstream_all = any(rerun_kwargs.get(dep) == 'all' for dep in rule.depends_on)
-        elementwise_deps = []
-        for dep in rule.depends_on:
-            dep_rerun = rerun_kwargs.get(dep, set())
-            if dep_rerun == 'all' or not dep_rerun:
-                continue
-            if _same_matrix(rule, dep):
-                elementwise_deps.append(dep_rerun)
-            else:
-                # Fan-in or differing matrices: conservative.
-                upstream_all = True
-
-        for task in tasks:
-            rec = records.get(task.key)
-            task_kwargs = frozenset(task.kwargs.items())
-            # `reason` is a short literal (cheap to assign every iteration);
-            # only formatted into a log line when a TRACE sink is attached.
-            if force:
-                # Unconditional: skip the freshness checks (and their stat
-                # calls under check_outputs) rather than compute-then-discard.
-                rerun, reason = True, 'forced'
-            elif rec is None:
-                if check_outputs in ('fallback', 'always') and _outputs_complete(task):
-                    rerun, reason = False, 'outputs complete (no DB record)'
+            with phase('code_compare', len(run_ids) + len(uses_ids) + len(io_ids)):
+                # Stored run code is raw source: the same text is unchanged;
+                # any other is compared by its stored AST digest, so only the
+                # current source is parsed, and only when some record differs.
+                run_unchanged = {cid for cid in run_ids if codes.get(cid) == run_src}
+                if run_ids - run_unchanged:
+                    run_digest = ast_digest(run_src)
+                    digests = metadata.get_code_digests(run_ids - run_unchanged)
+                    run_unchanged |= {
+                        cid for cid in run_ids - run_unchanged
+                        if (digests[cid] == run_digest if cid in digests
+                            else code_comparer(codes.get(cid) or '', run_src))}
+                uses_unchanged = {cid for cid in uses_ids
+                                  if (codes.get(cid) or '') == current_uses_hash}
+                # io id None = pre-upgrade record, not tracked: never a rerun cause.
+                io_unchanged = {cid for cid in io_ids
+                                if cid is None or codes.get(cid) == current_io_hash}
+
+        # Upstream rerun propagation, resolved per row before the loop: a
+        # rerunning upstream with the same matrix taints only the row whose
+        # counterpart (same kwargs, so the upstream key of this row's kwargs)
+        # reruns; 'all' or a differing matrix (fan-in) taints every row.
+        upstream_all = any(rerun_keys.get(dep) == 'all' for dep in rule.depends_on)
+        with phase('upstream'):
+            upstream_rows = set()
+            for dep in rule.depends_on:
+                dep_rerun = rerun_keys.get(dep, set())
+                if upstream_all or dep_rerun == 'all' or not dep_rerun:
+                    continue
+                if same_matrix(rule, dep):
+                    upstream_rows.update(
+                        i for i, key in enumerate(batch.keys_as(dep.name)) if key in dep_rerun)
                 else:
-                    rerun, reason = True, 'never run (no DB record)'
-            else:
-                rerun = rec.status != TASK_STATUS_SUCCESS
-                reason = 'last run not successful' if rerun else 'up to date'
-                if not rerun and not ignore_code_changes:
-                    # All three are cheap int set-memberships, so record every
-                    # trigger rather than the first (several can be true at
-                    # once). The later checks (stat calls, upstream scan) stay
-                    # short-circuited on purpose — they cost real work, and
-                    # explain_task is the full-fidelity view.
-                    changed = []
-                    if rec.run_code_id not in run_unchanged:
-                        changed.append('run code changed')
-                    if rec.uses_code_id not in uses_unchanged:
-                        changed.append('uses= changed')
-                    if rec.io_code_id not in io_unchanged:
-                        changed.append('inputs/outputs spec changed')
-                    if changed:
-                        rerun, reason = True, ' + '.join(changed)
-                if not rerun and check_outputs == 'always' and task.outputs:
-                    if not _outputs_complete(task):
+                    # Fan-in or differing matrices: conservative.
+                    upstream_all = True
+        # Durable cross-pass backstop inputs, only when a record here has a
+        # run_seq to compare. An upstream answered from its snapshot was never
+        # expanded; read its records now.
+        up_seqs = None
+        if rule.depends_on and any(rec.run_seq is not None for rec in records.values()):
+            for dep in rule.depends_on:
+                if dep in from_snapshot and dep not in rule_records:
+                    rule_records[dep] = metadata.get_tasks_status(expand_rule_batch(dep))
+            with phase('upstream'):
+                up_seqs = _upstream_run_seqs(rule, batch, rule_records)
+
+        # Filesystem checks, batched: every row the loop below would check is
+        # checked in one outputs_complete call, so the stats overlap instead
+        # of running one after another. These are exactly the rows whose
+        # result can matter — not forced, not already tainted by an upstream,
+        # and either unrecorded or (check_outputs='always') up to date.
+        complete = {}  # row -> outputs_complete result
+        if (check_outputs in ('fallback', 'always') and not force
+                and rule.outputs is not None and not upstream_all):
+            rows = []
+            for i, key in enumerate(keys):
+                if i in upstream_rows:
+                    continue
+                rec = records.get(key)
+                if rec is None or (
+                        check_outputs == 'always' and rec.status == TASK_STATUS_SUCCESS
+                        and (ignore_code_changes or (
+                            rec.run_code_id in run_unchanged
+                            and rec.uses_code_id in uses_unchanged
+                            and rec.io_code_id in io_unchanged))):
+                    rows.append(i)
+            with phase('stat', len(rows)):
+                complete = dict(zip(rows, outputs_complete(batch.task(i) for i in rows)))
+
+        rerun_rows = []
+        by_status = Counter()  # (status code, rerun) -> ntasks
+        with phase('classify', len(keys)):
+            for i, key in enumerate(keys):
+                rec = records.get(key)
+                # `reason` is a short literal (cheap to assign every iteration);
+                # only formatted into a log line when a TRACE sink is attached.
+                if force:
+                    # Unconditional: skip the freshness checks (and their stat
+                    # calls under check_outputs) rather than compute-then-discard.
+                    rerun, reason = True, 'forced'
+                elif rec is None:
+                    if complete.get(i):
+                        rerun, reason = False, 'outputs complete (no DB record)'
+                    else:
+                        rerun, reason = True, 'never run (no DB record)'
+                else:
+                    rerun = rec.status != TASK_STATUS_SUCCESS
+                    reason = 'last run not successful' if rerun else 'up to date'
+                    if not rerun and not ignore_code_changes:
+                        # All three are cheap int set-memberships, so record every
+                        # trigger rather than the first (several can be true at
+                        # once). The later checks (stat calls, upstream scan) stay
+                        # short-circuited on purpose — they cost real work, and
+                        # explain_task is the full-fidelity view.
+                        changed = []
+                        if rec.run_code_id not in run_unchanged:
+                            changed.append('run code changed')
+                        if rec.uses_code_id not in uses_unchanged:
+                            changed.append('uses= changed')
+                        if rec.io_code_id not in io_unchanged:
+                            changed.append('inputs/outputs spec changed')
+                        if changed:
+                            rerun, reason = True, ' + '.join(changed)
+                    if not rerun and complete.get(i) is False:
                         rerun, reason = True, 'outputs missing (check_outputs=always)'
 
-            if not rerun:
-                if upstream_all or any(task_kwargs in dep_rerun for dep_rerun in elementwise_deps):
-                    rerun, reason = True, 'upstream reruns'
-            # Durable cross-pass backstop: an upstream committed in a later
-            # invocation than this task (e.g. an upstream rerun via `run -Q`,
-            # or after a crash) without rerunning it in the same pass. run_seq
-            # None = not-yet-tracked (pre-upgrade): don't rerun on that alone.
-            # MM: Can't quite see how task_run_seq works here.
-            if not rerun and rec is not None and rec.run_seq is not None:
-                up_seq = _max_upstream_run_seq(rule, task_kwargs, task_run_seq)
-                if up_seq is not None and up_seq > rec.run_seq:
-                    rerun, reason = True, 'upstream ran more recently'
-
-            logger.trace('{}: {} — {}', task.key, 'rerun' if rerun else 'skip', reason)
-            if rerun:
-                rule_rerun.add(task_kwargs)
-                runnable.append(task)
-
-        rerun_kwargs[rule] = rule_rerun
-        # MM: oh, it's a dict of all currently know tasks grouped by rule I think.
-        task_run_seq[rule] = {
-            frozenset(task.kwargs.items()):
-                (records[task.key].run_seq if task.key in records else None)
-            for task in tasks
-        }
-        logger.debug('{}: {} task(s), {} to rerun', rule.name, len(tasks), len(rule_rerun))
-
+                if not rerun:
+                    if upstream_all or i in upstream_rows:
+                        rerun, reason = True, 'upstream reruns'
+                # Durable cross-pass backstop: an upstream committed in a later
+                # invocation than this task (e.g. an upstream rerun via `run -Q`,
+                # or after a crash) without rerunning it in the same pass. run_seq
+                # None = not-yet-tracked (pre-upgrade): don't rerun on that alone.
+                if not rerun and up_seqs is not None and rec.run_seq is not None:
+                    up_seq = up_seqs[i]
+                    if up_seq is not None and up_seq > rec.run_seq:
+                        rerun, reason = True, 'upstream ran more recently'
+
+                logger.trace('{}: {} — {}', key, 'rerun' if rerun else 'skip', reason)
+                by_status[rec.status if rec is not None else None, rerun] += 1
+                if rerun:
+                    rerun_rows.append(i)
+
+        with phase('tasks', len(rerun_rows)):
+            rule_runnable = [batch.task(i) for i in rerun_rows]
+        rule_rerun = {keys[i] for i in rerun_rows}
+
+        runnable.extend(rule_runnable)
+        counts = Counter()
+        for (status, rerun), n in by_status.items():
+            counts[STATUS_NAMES.get(status, 'pending'), rerun] += n
+        if tallies is not None:
+            tallies[rule.name] = counts
+        if fingerprint is not None and len(rule_runnable) <= PLAN_SNAPSHOT_MAX_RERUN:
+            new_snapshots[rule.name] = (fingerprint, {
+                'rerun': [task.kwargs for task in rule_runnable],
+                'counts': [[status, rerun, n] for (status, rerun), n in counts.items()],
+            })
+        rerun_keys[rule] = rule_rerun
+        rule_records[rule] = records
+        logger.debug('{}: {} task(s), {} to rerun', rule.name, len(batch), len(rule_rerun))
+
+    profile_rule(None)
+    if new_snapshots:
+        with phase('snapshot_store', len(new_snapshots)):
+            metadata.store_plan_snapshots(new_snapshots)
     elapsed = perf_counter() - start
     logger.bind(
         event='plan', nrunnable=len(runnable), ndeferred=len(deferred),
-        seconds=round(elapsed, 6),
+        nsnapshot=len(from_snapshot), seconds=round(elapsed, 6),
     ).debug(
-        'plan: {} runnable, {} deferred in {:.3f}s',
-        len(runnable), len(deferred), elapsed,
+        'plan: {} runnable, {} deferred ({} rule(s) unchanged) in {:.3f}s',
+        len(runnable), len(deferred), len(from_snapshot), elapsed,
     )
     return runnable, deferred
@@ -0,0 +1,184 @@
+"""Task-filter queries (`-Q`): checked, compiled, and split for pushdown.
+
+A query is a Python expression over a task's matrix kwargs plus `rule` (the
+rule name), e.g. "year > 1985 and model == 'era5'". Only a small expression
+language is accepted — names, literals, comparisons, boolean and arithmetic
+operators — so a query cannot reach attributes, call functions or build
+anything else; it is checked once, when the query is made. `*` and `%` take
+numbers only: repeating a string or list, or printf-formatting one with a
+huge width, could ask for any amount of memory per row.
+
+For a dict matrix, the top-level conjuncts that compare one name against a
+literal (`year == 2020`, `model in ['a', 'b']`, `1990 < year`) are applied
+to the matrix axes before the product is built (dag._product_columns), and
+`rule` conjuncts to the rule itself. Whatever is left is evaluated per row
+as before, on the rows that survive. A query with nothing left over
+evaluates nothing per row: a narrow selection from a huge matrix costs the
+size of its axes, not of their product.
+"""
+import ast
+import operator
+
+from .exceptions import QueryError
+
+_ALLOWED_NODES = (
+    ast.Expression, ast.BoolOp, ast.And, ast.Or, ast.UnaryOp, ast.Not,
+    ast.USub, ast.UAdd, ast.BinOp, ast.Add, ast.Sub, ast.Mult, ast.Div,
+    ast.FloorDiv, ast.Mod, ast.Compare, ast.Eq, ast.NotEq, ast.Lt, ast.LtE,
+    ast.Gt, ast.GtE, ast.In, ast.NotIn, ast.Is, ast.IsNot, ast.Name, ast.Load,
+    ast.Constant, ast.List, ast.Tuple, ast.Set,
+)
+
+_COMPARE = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+    ast.In: lambda a, b: a in b,
+    ast.NotIn: lambda a, b: a not in b,
+    ast.Is: operator.is_,
+    ast.IsNot: operator.is_not,
+}
+
+
+# What `*` and `%` compile to: calls the query text itself cannot make (calls
+# are rejected, and no kwarg is named like this).
+_GUARDED = {
+    ast.Mult: ('__remake_query_mul__', '*', operator.mul),
+    ast.Mod: ('__remake_query_mod__', '%', operator.mod),
+}
+
+
+def _guard(symbol, op):
+    def guarded(a, b):
+        if isinstance(a, (int, float)) and isinstance(b, (int, float)):
+            return op(a, b)
+        raise QueryError(f'query applies `{symbol}` to {type(a).__name__} and '
+                         f'{type(b).__name__}: `{symbol}` is for numbers only')
+    return guarded
+
+
+_GUARDS = {name: _guard(symbol, op) for name, symbol, op in _GUARDED.values()}
+
+
+class _GuardArith(ast.NodeTransformer):
+    def visit_BinOp(self, node):
+        self.generic_visit(node)
+        if type(node.op) not in _GUARDED:
+            return node
+        name = _GUARDED[type(node.op)][0]
+        call = ast.Call(ast.Name(name, ast.Load()), [node.left, node.right], [])
+        return ast.copy_location(call, node)
+
+
+def _non_number(node):
+    """Whether node is a literal that is certainly not a number."""
+    if isinstance(node, (ast.List, ast.Tuple, ast.Set)):
+        return True
+    return isinstance(node, ast.Constant) and not isinstance(node.value, (int, float))
+
+
+def _literal(node):
+    try:
+        return True, ast.literal_eval(node)
+    except (ValueError, TypeError, SyntaxError, MemoryError, RecursionError):
+        return False, None
+
+
+def _conditions(node):
+    """[(name, test)] for a Compare of names against literals, each test a
+    callable(value) -> bool; None if any link of the chain is not one."""
+    conditions = []
+    operands = [node.left, *node.comparators]
+    for op, left, right in zip(node.ops, operands, operands[1:]):
+        compare = _COMPARE[type(op)]
+        if isinstance(left, ast.Name) and not isinstance(right, ast.Name):
+            is_literal, literal = _literal(right)
+            if not is_literal:
+                return None
+            conditions.append(
+                (left.id, lambda v, c=compare, lit=literal: bool(c(v, lit))))
+        elif isinstance(right, ast.Name) and not isinstance(left, ast.Name):
+            is_literal, literal = _literal(left)
+            if not is_literal:
+                return None
+            conditions.append(
+                (right.id, lambda v, c=compare, lit=literal: bool(c(lit, v))))
+        else:
+            return None
+    return conditions
+
+
+def _eval(code, namespace):
+    try:
+        return bool(eval(code, {'__builtins__': {}, **_GUARDS}, dict(namespace)))
+    except NameError:
+        # Query references a kwarg this rule doesn't have: no match.
+        return False
+
+
+class Query:
+    """A compiled query. Called with a namespace (task kwargs plus 'rule'),
+    returns whether the task matches. `conditions` ({name: [test, ...]})
+    and `residual` (the rest, or None) are the split used for pushdown; a
+    row matches iff every condition on its values holds and the residual
+    does."""
+
+    def __init__(self, text):
+        try:
+            tree = ast.parse(text, '<query>', 'eval')
+        except SyntaxError as e:
+            raise QueryError(f'invalid query {text!r}: {e.msg}') from None
+        for node in ast.walk(tree):
+            if not isinstance(node, _ALLOWED_NODES):
+                raise QueryError(
+                    f'query {text!r}: {type(node).__name__} is not allowed. Queries '
+                    f'compare matrix kwargs and `rule` with literals, using and/or/'
+                    f'not, comparisons (==, <, in, ...) and arithmetic.'
+                )
+            if (isinstance(node, ast.BinOp) and type(node.op) in _GUARDED
+                    and (_non_number(node.left) or _non_number(node.right))):
+                symbol = _GUARDED[type(node.op)][1]
+                raise QueryError(f'query {text!r}: `{symbol}` is for numbers only.')
+        # Operands that are names are only known per row: checked then.
+        tree = ast.fix_missing_locations(_GuardArith().visit(tree))
+        self.text = text
+        self.code = compile(tree, '<query>', 'eval')
+
+        body = tree.body
+        conjuncts = (body.values if isinstance(body, ast.BoolOp)
+                     and isinstance(body.op, ast.And) else [body])
+        self.conditions = {}
+        residual = []
+        for conjunct in conjuncts:
+            conditions = (_conditions(conjunct) if isinstance(conjunct, ast.Compare)
+                          else None)
+            if conditions is None:
+                residual.append(conjunct)
+                continue
+            for name, test in conditions:
+                self.conditions.setdefault(name, []).append(test)
+        self.residual = None
+        if residual:
+            expr = residual[0] if len(residual) == 1 else ast.BoolOp(ast.And(), residual)
+            self.residual = compile(
+                ast.fix_missing_locations(ast.Expression(expr)), '<query>', 'eval')
+
+    def __call__(self, namespace):
+        return _eval(self.code, namespace)
+
+    def __repr__(self):
+        return f'Query({self.text!r})'
+
+    def accepts(self, name, value):
+        """Whether value passes every condition on name."""
+        return all(test(value) for test in self.conditions.get(name, ()))
+
+    def residual_predicate(self):
+        """callable(namespace) -> bool for what pushdown leaves to be
+        evaluated per row, or None if nothing is."""
+        if self.residual is None:
+            return None
+        return lambda namespace: _eval(self.residual, namespace)
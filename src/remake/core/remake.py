@@ -1,4 +1,5 @@
 """The Remake class — wires rules, planner, metadata and executors together."""
+import asyncio
 import inspect
 import traceback
 from collections import Counter
@@ -15,12 +16,19 @@ from ..metadata.metadata_manager import (
 )
 from ..util import task_log_path
 from ..util.resources import capture_for_config
-from .dag import build_rule_dag, expand_rule, iter_expand_rule
+from .dag import (
+    build_rule_dag,
+    expand_rule,
+    expand_rule_batch,
+    in_matrix,
+    iter_expand_rule,
+)
 from .exceptions import Defer, RemakeError
-from .planner import cascade_settled, explain_task, make_predicate, plan
-from .rule import Rule
+from .planner import cascade_settled, explain_task, make_predicate, outputs_complete, plan
+from .rule import Rule, run_deferred_checks
 from .scope import check_scope, exec_function
 from .task import Task
+from .tokens import invalidate_listings, listing_cache
 
 
 class _TemplatePlaceholder:
@@ -88,8 +96,10 @@ class Remake:
                 raise RemakeError(f'Not a Rule (use the @rule decorator): {rule!r}')
             if rule in self.rules:
                 continue
-            # Resolve tri-state strict_scope against the Remake default.
-            if rule.strict_scope is None and self.strict_scope:
+            # Resolve tri-state strict_scope against the Remake default
+            # (for a rule with deferred checks, at finalize).
+            if (rule.strict_scope is None and self.strict_scope
+                    and not rule._checks_deferred):
                 check_scope(rule.fn, rule.uses, strict=True)
             rule.remake = self
             self.rules.append(rule)
@@ -109,6 +119,11 @@ class Remake:
     # --- planning ---
 
     def finalize(self):
+        for rule in self.rules:
+            if rule._checks_deferred:
+                run_deferred_checks(rule)
+                if rule.strict_scope is None and self.strict_scope:
+                    check_scope(rule.fn, rule.uses, strict=True)
         if self.metadata is None:
             from ..metadata.sqlite3_backend import Sqlite3Backend
 
@@ -125,15 +140,45 @@ class Remake:
         # (they can't write the DB concurrently); fold them in before the
         # DB is read for planning.
         self.metadata.ingest_sidecars(self.rules)
-        return plan(
-            self.rules,
-            self.dag,
-            self.metadata,
-            query=query,
-            force=force,
-            check_outputs=self.check_outputs,
-            ignore_code_changes=ignore_code_changes,
-        )
+        with listing_cache():
+            return plan(
+                self.rules,
+                self.dag,
+                self.metadata,
+                query=query,
+                force=force,
+                check_outputs=self.check_outputs,
+                ignore_code_changes=ignore_code_changes,
+            )
+
+    def profile_plan(self, query=None):
+        """Plan once with phase timing on — the data behind `remake
+        profile-plan`. Returns (runnable, deferred, profile), where profile is
+        a util.profile.PlanProfile: per-rule, per-phase wall time and counts
+        (matrix expansion, key hashing, status queries, code fetch/compare,
+        renderings, stat calls, Task construction), plus plan-level sidecar
+        ingest and snapshot load/store."""
+        from ..util.profile import profiling
+
+        if not self._finalized:
+            self.finalize()
+        with profiling() as profile:
+            runnable, deferred = self.plan(query=query)
+        return runnable, deferred, profile
+
+    def estimate(self, executor='multiproc', nproc=None, query=None, force=False):
+        """How long running the plan would take under `executor`'s model
+        ('singleproc', 'multiproc', 'dask' or 'slurm') — `remake estimate`.
+        Simulated from recorded task durations; returns an
+        executors.estimate.Estimate (makespan, critical path, per-rule
+        utilisation). Deferred rules are listed, not estimated."""
+        from ..executors.estimate import estimate
+
+        if not self._finalized:
+            self.finalize()
+        runnable, deferred = self.plan(query=query, force=force)
+        return estimate(self, runnable, executor, nproc,
+                        deferred=[rule.name for rule in deferred])
 
     def explain_task(self, task):
         """(will_run, reasons) for one task — `remake why`."""
@@ -226,23 +271,68 @@ class Remake:
     def task_from_key(self, key):
         """Find a task by key or unambiguous key prefix.
 
-        Streams lazily; a full-length key returns on first match. A prefix
-        must scan all tasks to detect ambiguity (hashes are not invertible),
-        but never materialises more than the matches.
+        Recorded tasks resolve with one indexed query (the DB stores each
+        task's rule and kwargs): a single recorded match whose rule still
+        exists is the answer, two are ambiguous. Otherwise — never-recorded
+        tasks, pre-upgrade records without kwargs, backends without a store —
+        scan the matrices one rule at a time, keys computed in bulk per rule
+        (TaskBatch); a full-length key returns on first match, a prefix must
+        scan all tasks to detect ambiguity (hashes are not invertible). Only
+        matches are materialised as Tasks.
+
+        A prefix matching one recorded task is not checked against
+        never-recorded ones: for the 8-character prefixes remake prints, a
+        collision is ~1 in 4000 lookups even at 1e6 tasks, and a full key is
+        always exact.
         """
+        if not self._finalized:
+            self.finalize()
+        task = self._task_from_recorded_key(key)
+        if task is not None:
+            return task
         full_length = len(key) == 40
         matches = []
-        for task in self.iter_tasks():
-            if task.key.startswith(key):
-                if full_length:
-                    return task
-                matches.append(task)
-                if len(matches) > 1:
-                    raise RemakeError(f'Task key prefix {key} is ambiguous')
+        for rule in self.rules:
+            try:
+                batch = expand_rule_batch(rule)
+            except Defer:
+                logger.warning(
+                    '{}: deferred (matrix not ready), tasks unknown', rule.name
+                )
+                continue
+            for i, task_key in enumerate(batch.keys):
+                if task_key.startswith(key):
+                    if full_length:
+                        return batch.task(i)
+                    matches.append(batch.task(i))
+                    if len(matches) > 1:
+                        raise RemakeError(f'Task key prefix {key} is ambiguous')
         if not matches:
             raise RemakeError(f'No task with key {key}')
         return matches[0]
 
+    def _task_from_recorded_key(self, key):
+        """The task behind a unique recorded key match, or None to fall back
+        to the matrix scan. Raises when two current recorded tasks match.
+        Records of tasks no longer in their rule's matrix (a value dropped
+        from an axis) are not tasks: they are skipped, as the scan would."""
+        found = self.metadata.find_tasks_by_key(key, limit=2)
+        rules_by_name = {rule.name: rule for rule in self.rules}
+        tasks = []
+        for task_key, rule_name, kwargs in found:
+            rule = rules_by_name.get(rule_name)
+            if rule is None or kwargs is None:
+                continue  # rule since removed/renamed, or a pre-upgrade record
+            task = Task(rule=rule, kwargs=kwargs)
+            if task.key == task_key and in_matrix(rule, kwargs):
+                tasks.append(task)
+        if len(tasks) > 1:
+            raise RemakeError(f'Task key prefix {key} is ambiguous')
+        if len(tasks) == 1 and len(found) == 1:
+            logger.trace('{}: resolved from the DB', key)
+            return tasks[0]
+        return None
+
     def select_task(self, key=None, query=None):
         """Resolve the single task a command addresses: a key (or unambiguous
         prefix), or a query matching exactly one task. Raises if both/neither
@@ -283,8 +373,6 @@ class Remake:
         up_to_date + to_run == tasks (a success the plan skips is up to date,
         everything else is to run; an adopted-outputs task under
         check_outputs='fallback'/'always' counts as up to date)."""
-        import networkx as nx
-
         if not self._finalized:
             self.finalize()
         # Read-only: the plan and the per-rule status table below ask for the
@@ -292,9 +380,10 @@ class Remake:
         # twice per `remake info` (bug 04 Issue 1).
         self.metadata.ingest_sidecars(self.rules)
         cache = RecordCache(self.metadata)
+        tallies = {}
         runnable, deferred = plan(
             self.rules, self.dag, cache, query=query,
-            check_outputs=self.check_outputs,
+            check_outputs=self.check_outputs, tallies=tallies,
         )
         remaining = Counter(task.rule.name for task in runnable)
         runnable_keys = {task.key for task in runnable}
@@ -317,28 +406,33 @@ class Remake:
                     bucket[r.category] += 1
 
         rule_rows, task_rows, failures = [], [], []
-        for rule in nx.topological_sort(self.dag):
+        for rule in self.dag.topological_order():
             if rule.name in deferred_names:
                 rule_rows.append({'rule': rule.name, 'deferred': True})
                 continue
-            tasks = expand_rule(rule, predicate)
-            records = cache.get_tasks_status(tasks)
-            statuses = {
-                t.key: STATUS_NAMES.get(records[t.key].status, 'pending')
-                if t.key in records
-                else 'pending'
-                for t in tasks
-            }
             # Status (DB history) crossed with the plan: a success the plan
             # reruns is stale, not up to date; a pending task the plan skips
-            # (adopted outputs) is up to date, not pending.
-            counts = Counter(
-                (statuses[t.key], t.key in runnable_keys) for t in tasks
-            )
+            # (adopted outputs) is up to date, not pending. The plan tallied
+            # these already — per task only when the rows are listed, so an
+            # unchanged rule (served from its plan snapshot) is never expanded.
+            if list_tasks or list_failures:
+                tasks = expand_rule(rule, predicate)
+                records = cache.get_tasks_status(tasks)
+                statuses = {
+                    t.key: STATUS_NAMES.get(records[t.key].status, 'pending')
+                    if t.key in records
+                    else 'pending'
+                    for t in tasks
+                }
+                counts = Counter(
+                    (statuses[t.key], t.key in runnable_keys) for t in tasks
+                )
+            else:
+                counts = tallies[rule.name]
             row = {
                 'rule': rule.name,
                 'deferred': False,
-                'tasks': len(tasks),
+                'tasks': sum(counts.values()),
                 'up_to_date': counts[('success', False)] + counts[('pending', False)],
                 'stale': counts[('success', True)],
                 'failed': counts[('failed', True)] + counts[('failed', False)],
@@ -585,12 +679,10 @@ class Remake:
         keys)}, each (None, None) when a dynamic matrix can't be resolved yet
         (e.g. a continuation rule awaiting upstream outputs). Builds a fresh DAG
         and does not finalize — no metadata backend needed."""
-        import networkx as nx
-
         from .dag import resolve_matrix
 
         dag = build_rule_dag(self.rules)
-        order = list(nx.topological_sort(dag))
+        order = dag.topological_order()
         pos = {rule: i for i, rule in enumerate(order)}
         edges = {
             rule.name: [s.name for s in sorted(dag.successors(rule), key=pos.get)]
@@ -640,10 +732,7 @@ class Remake:
         tasks = self.tasks(query=query)
         skipped = 0
         if check_outputs:
-            verified = [
-                t for t in tasks
-                if t.outputs and all(token.is_complete() for token in t.outputs.values())
-            ]
+            verified = [t for t, complete in zip(tasks, outputs_complete(tasks)) if complete]
             skipped = len(tasks) - len(verified)
             tasks = verified
 
@@ -693,16 +782,25 @@ class Remake:
         dynamic (deferred) matrices resolve as their upstreams complete.
         Returns the number of failed tasks (0 for asynchronous executors,
         which don't know at submission time)."""
+        if executor is None:
+            from ..executors import SingleprocExecutor
+
+            executor = SingleprocExecutor(self)
+        # The executor keeps its workers warm across the replanning waves;
+        # they are released here, once, whatever happens.
+        try:
+            with listing_cache():
+                return self._run(executor, query, force, ignore_code_changes)
+        finally:
+            executor.close()
+
+    def _run(self, executor, query, force, ignore_code_changes):
         if not self._finalized:
             self.finalize()
         # One run_seq for this whole invocation (shared across replanning
         # waves); committed onto every task so downstream propagation survives
         # to later invocations. See bugs/01_durable_rerun_propagation.md.
         self.metadata.begin_invocation()
-        if executor is None:
-            from ..executors import SingleprocExecutor
-
-            executor = SingleprocExecutor(self)
 
         def _plan():
             return self.plan(
@@ -722,6 +820,7 @@ class Remake:
         attempted = set()
         wave = 0
         start = perf_counter()
+        starts0, startup0 = executor.worker_starts, executor.worker_startup_s
         while True:
             runnable, deferred = _plan()
             force = False  # only force the first wave
@@ -736,11 +835,17 @@ class Remake:
                 'wave {}: running {} task(s)', wave, len(runnable))
             attempted |= {t.key for t in runnable}
             nfailed += executor.run_tasks(runnable) or 0
+            # Out-of-process executors wrote these outputs behind this
+            # process's listing cache; the next wave's plan must see them.
+            invalidate_listings(token for t in runnable for token in t.outputs.values())
         if attempted:
             elapsed = perf_counter() - start
             logger.bind(event='run_summary', ntasks=len(attempted),
                         nfailed=nfailed, nwaves=wave,
-                        seconds=round(elapsed, 6)).info(
+                        seconds=round(elapsed, 6),
+                        worker_starts=executor.worker_starts - starts0,
+                        worker_startup_s=round(
+                            executor.worker_startup_s - startup0, 6)).info(
                 'ran {} task(s), {} failed in {:.1f}s',
                 len(attempted), nfailed, elapsed)
         else:
@@ -752,7 +857,45 @@ class Remake:
         entry point — used by all executors and `remake run-task`. Timing and
         completion are logged here so every executor gets them uniformly
         (per-element detail at TRACE, per-task duration at DEBUG — the
-        summarise-loops convention, per_task_logging.md)."""
+        summarise-loops convention, per_task_logging.md). An `async def`
+        rule is run to completion on an event loop of its own."""
+        fn, args = self._task_call(task)
+        # Resources are measured here, the one execution chokepoint every
+        # executor shares, so all of them record the same fields
+        # (design_docs/resource_capture.md). Both exit paths record: a task
+        # that fails after three hours is a duration worth keeping.
+        capture = capture_for_config(self.config)
+        try:
+            with capture:
+                result = fn(*args, **task.kwargs)
+                if inspect.iscoroutine(result):
+                    asyncio.run(result)
+        except Exception:
+            self._task_failed(task, capture)
+            raise
+        self._task_succeeded(task, capture)
+
+    async def run_task_async(self, task):
+        """run_task for the asyncio executor: an `async def` rule is awaited
+        on the running loop, so many run concurrently; a plain rule runs
+        inline, blocking the loop while it does. No RSS sampling: tasks on
+        one loop overlap by design, and overlapping tasks record wall time
+        only (util/resources.py)."""
+        fn, args = self._task_call(task)
+        capture = capture_for_config(self.config, sample_rss=False)
+        try:
+            with capture:
+                result = fn(*args, **task.kwargs)
+                if inspect.iscoroutine(result):
+                    await result
+        except Exception:
+            self._task_failed(task, capture)
+            raise
+        self._task_succeeded(task, capture)
+
+    def _task_call(self, task):
+        """(fn, positional args) to call a task with, its output directories
+        created."""
         # opt(lazy=True): the path lists are only built when a TRACE sink is
         # attached (they'd cost real time at 1e6 tasks otherwise).
         logger.opt(lazy=True).trace(
@@ -770,29 +913,28 @@ class Remake:
             args.append(task.inputs)
         if task.rule.outputs is not None:
             args.append(task.outputs)
-        # Resources are measured here, the one execution chokepoint every
-        # executor shares, so all of them record the same fields
-        # (design_docs/resource_capture.md). Both exit paths record: a task
-        # that fails after three hours is a duration worth keeping.
-        capture = capture_for_config(self.config)
-        try:
-            with capture:
-                fn(*args, **task.kwargs)
-        except Exception:
-            resources = capture.result()
-            # `or 0` guards the one path where the task failed before the
-            # measurement completed: recording the failure matters more than
-            # the timing, and a TypeError here would lose the real exception.
-            elapsed = resources['wall_s'] or 0.0
-            logger.bind(event='task_failed', task=str(task), rule=task.rule.name,
-                        key=task.key, seconds=round(elapsed, 6),
-                        **_resource_fields(resources),
-                        ).error(f'failed: {task} after {elapsed:.2f}s')
-            self.metadata.update_task(
-                task, TASK_STATUS_FAILED, exception=traceback.format_exc(),
-                resources=resources,
-            )
-            raise
+        return fn, args
+
+    def _task_failed(self, task, capture):
+        """Record a failure; called from the task's `except` block."""
+        # Even a failed task may have written some of its outputs.
+        invalidate_listings(task.outputs.values())
+        resources = capture.result()
+        # `or 0` guards the one path where the task failed before the
+        # measurement completed: recording the failure matters more than
+        # the timing, and a TypeError here would lose the real exception.
+        elapsed = resources['wall_s'] or 0.0
+        logger.bind(event='task_failed', task=str(task), rule=task.rule.name,
+                    key=task.key, seconds=round(elapsed, 6),
+                    **_resource_fields(resources),
+                    ).error(f'failed: {task} after {elapsed:.2f}s')
+        self.metadata.update_task(
+            task, TASK_STATUS_FAILED, exception=traceback.format_exc(),
+            resources=resources,
+        )
+
+    def _task_succeeded(self, task, capture):
+        invalidate_listings(task.outputs.values())
         resources = capture.result()
         elapsed = resources['wall_s']
         logger.bind(event='task_complete', task=str(task), rule=task.rule.name,
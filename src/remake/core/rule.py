@@ -3,13 +3,25 @@
 Decoration does exactly two things: validate the signature contract and run
 scope analysis. Registration with a Remake instance happens separately
 (rules are free-standing, importable objects).
+
+A SLURM array element loads the whole remakefile to run one task of one
+rule: within `checks_only_for(names)`, the checks run only for the named
+rules, and the rest are deferred to `run_deferred_checks` (Remake.finalize).
 """
 import inspect
+from contextlib import contextmanager
 from dataclasses import dataclass, field
 from typing import Callable, Optional, Union
 
 from .exceptions import SignatureError
-from .scope import check_scope, check_shadowing, function_source
+from .scope import (
+    check_scope,
+    check_shadowing,
+    function_source,
+    io_hash,
+    rendering_stamp,
+    uses_hash,
+)
 
 
 @dataclass(eq=False)
@@ -23,6 +35,10 @@ class Rule:
     strict_scope: Optional[bool] = None  # None -> inherit Remake default
     config: dict = field(default_factory=dict)
     _name: Optional[str] = None
+    # Decoration-time checks not yet run (see checks_only_for).
+    _checks_deferred: bool = False
+    # Memoised renderings (see _rendered).
+    _renderings: dict = field(default_factory=dict, repr=False)
     # Set by Remake at registration:
     remake: object = None
 
@@ -30,6 +46,17 @@ class Rule:
     def name(self):
         return self._name if self._name is not None else self.fn.__name__
 
+    def _rendered(self, name, render):
+        """Memoised rendering: reused until the rule's rendering_stamp
+        changes. The planner, ensure_rules and every sidecar write all ask,
+        and a uses_hash alone can be ~100 KB of AST dump."""
+        stamp, refs = rendering_stamp(self)
+        if self._renderings.get('stamp') != stamp:
+            self._renderings = {'stamp': stamp, 'refs': refs}
+        if name not in self._renderings:
+            self._renderings[name] = render()
+        return self._renderings[name]
+
     @property
     def source(self):
         """Source representation of each part, for metadata storage and
@@ -42,11 +69,21 @@ class Rule:
                 return function_source(part)
             return repr(part)
 
-        return {
+        return self._rendered('source', lambda: {
             'inputs': part_source(self.inputs),
             'outputs': part_source(self.outputs),
             'run': function_source(self.fn),
-        }
+        })
+
+    @property
+    def uses_hash(self):
+        """scope.uses_hash(self.uses), memoised."""
+        return self._rendered('uses_hash', lambda: uses_hash(self.uses))
+
+    @property
+    def io_hash(self):
+        """scope.io_hash(self), memoised."""
+        return self._rendered('io_hash', lambda: io_hash(self))
 
     def __repr__(self):
         return f'Rule({self.name})'
@@ -188,6 +225,36 @@ def _validate_signature(fn, inputs, outputs, matrix):
     check_io_spec(fn.__name__, 'outputs', outputs, matrix_keys)
 
 
+# Names of the rules decoration checks, or None for all (checks_only_for).
+_checked_names = None
+
+
+@contextmanager
+def checks_only_for(names):
+    """Within the block, @rule validates and scope-checks only the rules
+    named in `names`; the others are created with their checks deferred.
+
+    For `remake run-array-task`: the element runs one task of one rule, and
+    every rule was already checked by the `remake run` that submitted it.
+    """
+    global _checked_names
+    previous, _checked_names = _checked_names, frozenset(names)
+    try:
+        yield
+    finally:
+        _checked_names = previous
+
+
+def run_deferred_checks(rule_obj):
+    """Run the decoration-time checks deferred by checks_only_for, once."""
+    if not rule_obj._checks_deferred:
+        return
+    rule_obj._checks_deferred = False
+    _validate_signature(rule_obj.fn, rule_obj.inputs, rule_obj.outputs, rule_obj.matrix)
+    check_scope(rule_obj.fn, rule_obj.uses, strict=bool(rule_obj.strict_scope))
+    check_shadowing(rule_obj.fn, rule_obj.uses)
+
+
 def rule(
     *,
     inputs=None,
@@ -206,11 +273,14 @@ def rule(
 
     def decorator(fn):
         uses_ = dict(uses) if uses else {}
-        _validate_signature(fn, inputs, outputs, matrix)
-        # Rule-level strict_scope=True errors now; None defers strictness to
-        # registration (warnings are still emitted now).
-        check_scope(fn, uses_, strict=bool(strict_scope))
-        check_shadowing(fn, uses_)
+        deferred = (_checked_names is not None
+                    and (fn.__name__ if name is None else name) not in _checked_names)
+        if not deferred:
+            _validate_signature(fn, inputs, outputs, matrix)
+            # Rule-level strict_scope=True errors now; None defers strictness
+            # to registration (warnings are still emitted now).
+            check_scope(fn, uses_, strict=bool(strict_scope))
+            check_shadowing(fn, uses_)
         rule_obj = Rule(
             fn=fn,
             inputs=inputs,
@@ -221,6 +291,7 @@ def rule(
             strict_scope=strict_scope,
             config=dict(config) if config else {},
             _name=name,
+            _checks_deferred=deferred,
         )
         # Surface the decorated function's docstring on the Rule itself so
         # `help(rule)` / `rule.__doc__` see through to the user's function
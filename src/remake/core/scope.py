@@ -13,6 +13,7 @@ import ast
 import builtins
 import dis
 import inspect
+import os
 import sys
 import types
 import warnings
@@ -296,6 +297,52 @@ def parse_uses_hash(stored):
     return parts
 
 
+def _source_file(obj):
+    code = getattr(obj, '__code__', None)
+    if code is not None:
+        return code.co_filename
+    module = sys.modules.get(getattr(obj, '__module__', None) or '')
+    return getattr(module, '__file__', None)
+
+
+def rendering_stamp(rule):
+    """(stamp, refs): what a rule's renderings — `Rule.source`,
+    `Rule.uses_hash`, `Rule.io_hash` — are derived from, cheaply. Equal stamps
+    mean equal renderings.
+
+    Each callable part and `uses` value is stamped by identity, code object
+    and the mtime of its source file, so rebinding a part, redefining a
+    function (a notebook cell) or editing its file all change the stamp; a
+    plain `uses` value by its repr, which is its rendering anyway. Identities
+    are only meaningful while the objects live: the caller keeps `refs`
+    alongside the stamp.
+    """
+    stamp = []
+    refs = []
+    mtimes = {}
+
+    def add(label, obj):
+        if not callable(obj):
+            stamp.append((label, repr(obj)))
+            return
+        path = _source_file(obj)
+        if path not in mtimes:
+            try:
+                mtimes[path] = os.stat(path).st_mtime_ns
+            except (OSError, TypeError, ValueError):
+                mtimes[path] = None
+        code = getattr(obj, '__code__', None)
+        refs.append((obj, code))
+        stamp.append((label, id(obj), id(code), path, mtimes[path]))
+
+    add('run', rule.fn)
+    add('inputs', rule.inputs)
+    add('outputs', rule.outputs)
+    for name in sorted(rule.uses):
+        add(f'uses:{name}', rule.uses[name])
+    return tuple(stamp), refs
+
+
 def exec_function(fn, uses):
     """Return `fn` with `uses` entries available as globals.
 
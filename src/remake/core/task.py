@@ -3,6 +3,10 @@
 Inputs/outputs are resolved on first access, never at construction: for 1e6
 tasks you only pay for the ones you touch. DB state (status, timestamps)
 lives in TaskRecord, returned by the metadata backend — not here.
+
+TaskBatch is the columnar form of one rule's expanded matrix: rows stored as
+per-kwarg columns, keys computed in bulk. The planner works on batches and
+materialises Task objects only for the tasks it returns.
 """
 import inspect
 from dataclasses import dataclass, field
@@ -39,8 +43,7 @@ class Task:
 
     @cached_property
     def key(self):
-        kwargs_repr = repr(dict(sorted(self.kwargs.items())))
-        return sha1(f'{self.rule.name}:{kwargs_repr}'.encode()).hexdigest()
+        return _kwargs_key(self.rule.name, self.kwargs)
 
     @cached_property
     def inputs(self):
@@ -59,3 +62,164 @@ class Task:
     def __repr__(self):
         kstr = ', '.join(f'{k}={v}' for k, v in self.kwargs.items())
         return f'{self.key[:8]} {self.rule.name}[{kstr}]'
+
+
+def _kwargs_key(rule_name, kwargs):
+    kwargs_repr = repr(dict(sorted(kwargs.items())))
+    return sha1(f'{rule_name}:{kwargs_repr}'.encode()).hexdigest()
+
+
+def _key_prefix(rule_name):
+    """sha1 state after the part of every key string shared by a rule's
+    tasks — `<name>:{` — to .copy() per task instead of rehashing it."""
+    return sha1(f'{rule_name}:{{'.encode())
+
+
+def compute_keys(rule, kwargs_rows):
+    """Task.key for each kwargs dict of one rule, computed in bulk: the
+    rule-name prefix is hashed once and copied, and the sorted kwarg order is
+    fixed once as a repr template (`'a': %r, 'b': %r}` — exactly the tail of
+    the sorted dict's repr). A row whose names differ from the first row's
+    falls back to the per-task computation. Identical to Task.key."""
+    return _compute_keys(rule.name, kwargs_rows)
+
+
+def _compute_keys(rule_name, kwargs_rows):
+    rows = list(kwargs_rows)
+    if not rows:
+        return []
+    names = sorted(rows[0])
+    template = ', '.join(f'{name!r}: %r' for name in names) + '}'
+    prefix = _key_prefix(rule_name)
+    keys = []
+    for kwargs in rows:
+        body = None
+        if len(kwargs) == len(names):
+            try:
+                body = template % tuple([kwargs[name] for name in names])
+            except KeyError:
+                pass  # same count, different names
+        if body is None:
+            keys.append(_kwargs_key(rule_name, kwargs))
+            continue
+        h = prefix.copy()
+        h.update(body.encode())
+        keys.append(h.hexdigest())
+    return keys
+
+
+def prime_keys(tasks):
+    """Compute and cache Task.key in bulk (compute_keys per rule) for tasks
+    that have not computed it yet — before a loop that reads every key."""
+    by_rule = {}
+    for task in tasks:
+        if 'key' not in task.__dict__:
+            by_rule.setdefault(task.rule, []).append(task)
+    for rule, rule_tasks in by_rule.items():
+        for task, key in zip(rule_tasks, compute_keys(rule, [t.kwargs for t in rule_tasks])):
+            task.__dict__['key'] = key  # seed the cached_property
+    return tasks
+
+
+class TaskBatch:
+    """One rule's tasks as columns: `names` (kwarg order) and `columns` (one
+    list of values per name, row i = task i). Sequence-like: len(), indexing
+    and iteration yield Task objects, built on demand.
+
+    `keys` are computed in bulk — each distinct value is repr'd once per
+    column (matrix axes repeat each value many times), so a row costs one
+    string join and one sha1 update of the copied rule prefix (as in
+    compute_keys) rather than a dict build, a sort and a repr. They match
+    Task.key exactly.
+    """
+
+    def __init__(self, rule, names, columns, nrows=None):
+        self.rule = rule
+        self.names = list(names)
+        self.columns = [list(column) for column in columns]
+        self._nrows = len(self.columns[0]) if self.columns else (nrows or 0)
+        self._keys = None
+
+    @classmethod
+    def from_kwargs(cls, rule, kwargs_list):
+        """Batch from row dicts (list/callable matrices). Kwarg order is taken
+        from the first row; rows listing the same names in another order keep
+        their keys (keys are order-independent) but Task.kwargs follow the
+        first row's order."""
+        if not kwargs_list:
+            return cls(rule, [], [], 0)
+        names = list(kwargs_list[0])
+        return cls(rule, names, [[kw[name] for kw in kwargs_list] for name in names],
+                   len(kwargs_list))
+
+    def __len__(self):
+        return self._nrows
+
+    def kwargs(self, i):
+        return {name: column[i] for name, column in zip(self.names, self.columns)}
+
+    def task(self, i):
+        task = Task(rule=self.rule, kwargs=self.kwargs(i))
+        if self._keys is not None:
+            task.__dict__['key'] = self._keys[i]  # seed the cached_property
+        return task
+
+    def __getitem__(self, i):
+        return self.task(range(self._nrows)[i])
+
+    def __iter__(self):
+        return (self.task(i) for i in range(self._nrows))
+
+    def take(self, indices):
+        """Sub-batch of the given rows, in the given order."""
+        indices = list(indices)
+        batch = TaskBatch(
+            self.rule, self.names,
+            [[column[i] for i in indices] for column in self.columns], len(indices))
+        if self._keys is not None:
+            batch._keys = [self._keys[i] for i in indices]
+        return batch
+
+    @property
+    def keys(self):
+        if self._keys is None:
+            self._keys = self.keys_as(self.rule.name)
+        return self._keys
+
+    def keys_as(self, rule_name):
+        """Keys of these rows' kwargs under another rule name — the keys of a
+        same-matrix upstream's counterpart tasks."""
+        if not self.names:
+            return [_kwargs_key(rule_name, {})] * self._nrows
+        parts = []
+        for j in sorted(range(len(self.names)), key=lambda j: self.names[j]):
+            name = self.names[j]
+            memo = {}
+            rendered = []
+            for value in self.columns[j]:
+                if type(value) is float:
+                    # Not memoised: 0.0 == -0.0 but they repr differently.
+                    rendered.append(f'{name!r}: {value!r}')
+                    continue
+                # type in the memo key: 1 and True are equal dict keys but
+                # repr differently.
+                memo_key = (type(value), value)
+                part = memo.get(memo_key)
+                if part is None:
+                    part = memo[memo_key] = f'{name!r}: {value!r}'
+                rendered.append(part)
+            parts.append(rendered)
+        prefix = _key_prefix(rule_name)
+        keys = []
+        for row in zip(*parts):
+            h = prefix.copy()
+            h.update(f'{", ".join(row)}}}'.encode())
+            keys.append(h.hexdigest())
+        return keys
+
+
+def task_keys(tasks):
+    """Keys of a TaskBatch (computed in bulk) or of any iterable of Tasks."""
+    if isinstance(tasks, TaskBatch):
+        return tasks.keys
+    return [task.key for task in tasks]
@@ -7,10 +7,37 @@ of *finished*.
 
 Path-backed tokens are transparent (`os.PathLike`): rule code passes them
 straight to open(), Path(), xarray, zarr — no unwrapping.
+
+Checking many tokens at once goes through `check_complete`, which lists each
+shared output directory once and overlaps the round-trips on a thread pool —
+on Lustre/NFS each stat is a metadata-server round-trip, so checking tokens
+one by one is latency-bound, not CPU-bound. Within a `listing_cache()`
+block (one invocation), FileToken/ZarrStore completeness is answered from
+cached directory listings: each parent directory is scanned at most once.
 """
 import abc
+import os
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
 
+# Worker threads for check_complete. The work is waiting on the filesystem's
+# metadata server, so many more threads than CPUs pay off.
+CHECK_THREADS = 32
+# A directory holding at least this many of the checked paths is listed once
+# with os.scandir instead of stat'ing each path. Below it, listing a big
+# shared directory could cost more than the few stats it replaces.
+SCANDIR_MIN_PATHS = 8
+# Paths stat'ed per thread-pool job (directories below SCANDIR_MIN_PATHS),
+# so a million sparse outputs are not a million futures.
+_STAT_CHUNK = 256
+
+# The active listing cache (see listing_cache): parent directory, as spelled
+# in the token paths -> (names, symlink names), or None for a directory that
+# does not exist. None when no cache is active.
+_listings = None
+
 
 class OutputToken(abc.ABC):
     @abc.abstractmethod
@@ -21,6 +48,13 @@ class OutputToken(abc.ABC):
     def is_complete(self) -> bool:
         """Has this output been successfully produced?"""
 
+    def completion_path(self):
+        """The one filesystem path whose existence means this output is
+        complete, or None when completeness is not a path check. Lets
+        check_complete answer many tokens from directory listings; tokens
+        returning None are asked via is_complete()."""
+        return None
+
     @abc.abstractmethod
     def format(self, **kwargs) -> 'OutputToken':
         """A new token with matrix kwargs interpolated into the spec."""
@@ -50,14 +84,20 @@ class PathToken(OutputToken):
 
 class FileToken(PathToken):
     def is_complete(self):
-        return Path(self.path).exists()
+        return _path_exists(self.path)
+
+    def completion_path(self):
+        return self.path
 
 
 class ZarrStore(PathToken):
     def is_complete(self):
         # A half-written store also has a directory; only the consolidated
         # metadata written by zarr.consolidate_metadata() marks completion.
-        return Path(self.path, '.zmetadata').exists()
+        return _path_exists(self.completion_path())
+
+    def completion_path(self):
+        return os.path.join(self.path, '.zmetadata')
 
 
 class S3Object(OutputToken):
@@ -82,6 +122,155 @@ class S3Object(OutputToken):
             return False
 
 
+def check_complete(tokens, max_workers=CHECK_THREADS):
+    """[token.is_complete() for token in tokens], answered in bulk.
+
+    Tokens with a completion_path are grouped by parent directory: a directory
+    holding SCANDIR_MIN_PATHS or more of them is listed once (os.scandir), the
+    rest are stat'ed individually, and both kinds of job run on a pool of
+    `max_workers` threads. Inside listing_cache() every directory is listed,
+    once per block, and its listing cached. Names must match the listing
+    exactly, as they do on the case-sensitive filesystems remake targets. A
+    symlink counts only if its target exists, as with Path.exists(). Other
+    tokens (S3Object, custom types) are asked via is_complete() one at a
+    time on the calling thread, so their implementations need not be
+    thread-safe.
+    """
+    tokens = list(tokens)
+    results = [False] * len(tokens)
+    by_dir = defaultdict(list)  # parent directory -> [(index, name)]
+    sparse = []  # (index, path) to stat
+    others = []
+    for i, token in enumerate(tokens):
+        path = token.completion_path()
+        if path is None:
+            others.append(i)
+            continue
+        parent, name = os.path.split(path)
+        if name in ('', '.', '..'):
+            sparse.append((i, path))  # 'out/' is never a listing entry
+        else:
+            by_dir[parent].append((i, name))
+
+    jobs = []
+    listings = _listings
+    for parent, entries in by_dir.items():
+        if listings is not None or len(entries) >= SCANDIR_MIN_PATHS:
+            jobs.append((_list_dir, parent, entries))
+        else:
+            sparse.extend((i, os.path.join(parent, name)) for i, name in entries)
+    for start in range(0, len(sparse), _STAT_CHUNK):
+        jobs.append((_stat_paths, sparse[start:start + _STAT_CHUNK]))
+
+    if len(jobs) > 1 and max_workers > 1:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(jobs))) as pool:
+            futures = [pool.submit(fn, *args) for fn, *args in jobs]
+            for i in others:
+                results[i] = tokens[i].is_complete()
+            parts = [future.result() for future in futures]
+    else:
+        for i in others:
+            results[i] = tokens[i].is_complete()
+        parts = [fn(*args) for fn, *args in jobs]
+    for part in parts:
+        for i, complete in part:
+            results[i] = complete
+    return results
+
+
+def _list_dir(parent, entries):
+    listings = _listings
+    if listings is not None and parent in listings:
+        listing = listings[parent]
+    else:
+        try:
+            listing = _scan(parent)
+        except OSError:
+            # Unlistable (e.g. search-only permission): stat the paths instead.
+            return _stat_paths([(i, os.path.join(parent, name)) for i, name in entries])
+        if listings is not None:
+            listings[parent] = listing
+    return [(i, _listed(listing, parent, name)) for i, name in entries]
+
+
+def _scan(parent):
+    """(names, symlink names) of a directory, or None if it does not exist.
+    Raises OSError when it exists but cannot be listed."""
+    try:
+        with os.scandir(parent or '.') as it:
+            names, links = set(), set()
+            for entry in it:
+                names.add(entry.name)
+                if entry.is_symlink():
+                    links.add(entry.name)
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    return names, links
+
+
+def _listed(listing, parent, name):
+    if listing is None:
+        return False
+    names, links = listing
+    if name in links:
+        # Follow the link, as Path.exists() does: a dangling one is missing.
+        return os.path.exists(os.path.join(parent, name))
+    return name in names
+
+
+def _path_exists(path):
+    """os.path.exists(path), answered from the active listing cache when
+    there is one (scanning the parent directory on first use)."""
+    listings = _listings
+    parent, name = os.path.split(path)
+    if listings is None or name in ('', '.', '..'):
+        return Path(path).exists()
+    if parent not in listings:
+        try:
+            listings[parent] = _scan(parent)
+        except OSError:
+            return Path(path).exists()
+    return _listed(listings[parent], parent, name)
+
+
+@contextmanager
+def listing_cache():
+    """Answer FileToken/ZarrStore completeness from directory listings for the
+    duration of the block — one invocation: a CLI command, `Remake.run()` or
+    `Remake.plan()`. Each parent directory is scanned once, so a task's 100
+    outputs in a shared directory cost one listing, not 100 stats.
+
+    Listings go stale when outputs are written: `Remake.run_task` and
+    `Remake.run` call invalidate_listings for the tasks they complete; code
+    writing outputs itself inside the block must do the same. Re-entrant:
+    a nested block shares the outer cache."""
+    global _listings
+    if _listings is not None:
+        yield
+        return
+    _listings = {}
+    try:
+        yield
+    finally:
+        _listings = None
+
+
+def invalidate_listings(tokens):
+    """Drop the cached listings of these tokens' directories (their outputs
+    may have changed). A no-op outside listing_cache()."""
+    listings = _listings
+    if listings is None:
+        return
+    for token in tokens:
+        path = token.completion_path()
+        if path is not None:
+            listings.pop(os.path.split(path)[0], None)
+
+
+def _stat_paths(paths):
+    return [(i, os.path.exists(path)) for i, path in paths]
+
+
 def as_token(value):
     """Wrap plain strings/Paths in FileToken; pass tokens through."""
     if isinstance(value, OutputToken):
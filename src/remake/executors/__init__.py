@@ -1,5 +1,29 @@
-from .dask_executor import DaskExecutor
+"""Executors, each imported on first use (PEP 562 module __getattr__).
+
+An executor module brings its stack with it (multiprocessing and
+concurrent.futures, dask, the SLURM script machinery), and `import remake`
+happens on every CLI call — including once per SLURM array element, which
+runs a single task and needs none of them.
+"""
+from importlib import import_module
+
 from .executor import Executor
-from .multiproc_executor import MultiprocExecutor
-from .singleproc_executor import SingleprocExecutor
-from .slurm_executor import SlurmExecutor
+
+_LAZY = {
+    'AsyncioExecutor': 'asyncio_executor',
+    'DaskExecutor': 'dask_executor',
+    'MultiprocExecutor': 'multiproc_executor',
+    'SingleprocExecutor': 'singleproc_executor',
+    'SlurmExecutor': 'slurm_executor',
+    'ThreadExecutor': 'thread_executor',
+}
+
+__all__ = ['Executor', *_LAZY]
+
+
+def __getattr__(name):
+    if name not in _LAZY:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    value = getattr(import_module(f'.{_LAZY[name]}', __name__), name)
+    globals()[name] = value
+    return value
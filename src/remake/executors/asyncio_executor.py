@@ -0,0 +1,81 @@
+"""Asyncio executor — many `async def` tasks at once on one event loop.
+
+Rules that are naturally coroutines (HTTP downloads, object-store
+transfers) spend nearly all their time waiting. Here each is awaited on a
+single loop in this process, up to `concurrency` at a time (`-j`, or
+`config={'asyncio': {'concurrency': ...}}`, default 100), so one process can
+keep hundreds of transfers in flight without a thread or worker each.
+
+Per-rule barriers with upstream-failure skipping, as in dask and threads.
+Results are recorded by Remake.run_task_async through the usual metadata
+path, from the loop's thread (the SQLite connection's own). Plain `def`
+rules still run, but inline: each blocks the loop, and every other task,
+while it runs. Wall time is measured per task; CPU time and peak memory
+only for a task that ran alone (util/resources.py).
+
+`async def` rules run under every other executor too, each task on an
+event loop of its own (Remake.run_task), one at a time per worker.
+"""
+import asyncio
+
+from loguru import logger
+
+from ..core.planner import upstream_failed
+from .executor import Executor
+from .scheduling import rule_groups
+
+DEFAULT_CONCURRENCY = 100
+
+
+class AsyncioExecutor(Executor):
+    def __init__(self, rmk, concurrency=None):
+        super().__init__(rmk)
+        self.concurrency = (
+            concurrency or rmk.config.get('asyncio', {}).get('concurrency')
+            or DEFAULT_CONCURRENCY
+        )
+
+    def run_tasks(self, tasks):
+        return asyncio.run(self._run_tasks(tasks))
+
+    async def _run_tasks(self, tasks):
+        ntasks = len(tasks)
+        nfailed = 0
+        nskipped = 0
+        done = 0
+        failures = {}  # rule -> set of frozenset(kwargs.items())
+        logger.info(f'{ntasks} task(s), up to {self.concurrency} at once')
+        slots = asyncio.Semaphore(self.concurrency)
+
+        async def run(task):
+            async with slots:
+                try:
+                    await self.rmk.run_task_async(task)
+                    return task, True
+                except Exception:
+                    return task, False  # recorded (and logged) by run_task_async
+
+        for rule, rule_tasks in rule_groups(tasks):
+            to_run = []
+            for task in rule_tasks:
+                if upstream_failed(task, failures):
+                    failures.setdefault(rule, set()).add(frozenset(task.kwargs.items()))
+                    nskipped += 1
+                    done += 1
+                    logger.warning(f'{done}/{ntasks} skipped (upstream failed): {task}')
+                else:
+                    to_run.append(task)
+            # Barrier: drain this rule before starting the next.
+            for finished in asyncio.as_completed([run(task) for task in to_run]):
+                task, succeeded = await finished
+                done += 1
+                if succeeded:
+                    logger.info(f'{done}/{ntasks}: {task}')
+                else:
+                    failures.setdefault(rule, set()).add(frozenset(task.kwargs.items()))
+                    nfailed += 1
+                    logger.error(f'{done}/{ntasks} failed: {task}')
+        if nfailed:
+            skipped = f' ({nskipped} downstream task(s) skipped)' if nskipped else ''
+            logger.error(f'{nfailed}/{ntasks} tasks failed{skipped}')
+        return nfailed
@@ -13,6 +13,12 @@ with Remake(config={'dask': {'scheduler': 'tcp://...'}}); remote workers
 must share the filesystem and working directory (the same contract as
 SLURM jobs), and have remake + the pipeline's deps importable.
 
+Tasks of one rule can be submitted in batches (executors/scheduling.py),
+`config={'dask': {'batch_size': ...}}` or `{'batch_seconds': ...}`; each
+task in a batch still gets its own log, sidecar result and failure handling.
+Within a rule, tasks are submitted in `priority` order (executors/
+scheduling.py; by default longest recorded `wall_s` first).
+
 Long-lived workers cache the loaded remakefile: editing it mid-run is
 not picked up until the workers restart.
 
@@ -25,21 +31,37 @@ from loguru import logger
 from ..core.exceptions import RemakeError
 from ..core.planner import upstream_failed
 from .executor import Executor
+from .scheduling import (
+    batch_size,
+    batches,
+    critical_path,
+    dependents,
+    priority_keys,
+    rule_groups,
+    simulate,
+    task_durations,
+)
 
 _worker_rmk_cache = {}
 
 
-def _run_spec(remakefile, rule_name, kwargs):
-    """Runs on a dask worker. Returns True on success."""
+def _run_specs(remakefile, rule_name, kwargs_list):
+    """Runs on a dask worker: one rule's tasks, in order. Returns a success
+    flag per task."""
     from ..loader import load_remake
     from ..metadata.sidecar import SidecarWriter
-    from ..util import task_log_path
 
     rmk = _worker_rmk_cache.get(remakefile)
     if rmk is None:
         rmk = load_remake(remakefile, finalize=False)
         rmk.metadata = SidecarWriter()
         _worker_rmk_cache[remakefile] = rmk
+    return [_run_spec(rmk, rule_name, kwargs) for kwargs in kwargs_list]
+
+
+def _run_spec(rmk, rule_name, kwargs):
+    from ..util import task_log_path
+
     task = rmk.task_from_spec(rule_name, kwargs)
     logfile = task_log_path(task)
     logfile.parent.mkdir(parents=True, exist_ok=True)
@@ -80,16 +102,29 @@ class DaskExecutor(Executor):
         )
         return Client(cluster), cluster
 
+    def _schedule(self, groups):
+        """Rule barriers, estimated durations and priority keys of `groups`:
+        (task_waits, group_waits, durations, measured, ranks, keys)."""
+        task_waits = [[[] for _ in rule_tasks] for _, rule_tasks in groups]
+        group_waits = [[g - 1] if g else [] for g in range(len(groups))]
+        durations, measured = task_durations(self.rmk, groups)
+        ranks = critical_path(durations, *dependents(task_waits, group_waits))
+        keys = priority_keys(self.rmk, groups, durations, ranks, 'dask')
+        return task_waits, group_waits, durations, measured, ranks, keys
+
+    def predict_makespan(self, tasks):
+        groups = rule_groups(tasks)
+        task_waits, group_waits, durations, measured, ranks, keys = self._schedule(groups)
+        if not measured:
+            return None
+        makespan = simulate(durations, task_waits, group_waits, self.nproc, keys)
+        return makespan, max(ranks.values(), default=0.0)
+
     def run_tasks(self, tasks):
         from distributed import as_completed
 
-        # Group consecutive same-rule tasks; plan order is rule-topological.
-        groups = []
-        for task in tasks:
-            if groups and groups[-1][0] is task.rule:
-                groups[-1][1].append(task)
-            else:
-                groups.append((task.rule, [task]))
+        groups = rule_groups(tasks)
+        keys = self._schedule(groups)[-1]
 
         ntasks = len(tasks)
         nfailed = 0
@@ -98,9 +133,10 @@ class DaskExecutor(Executor):
         failures = {}  # rule -> set of frozenset(kwargs.items())
         client, cluster = self._client()
         try:
-            for rule, rule_tasks in groups:
+            for g, (rule, rule_tasks) in enumerate(groups):
                 to_run = []
-                for task in rule_tasks:
+                order = sorted(range(len(rule_tasks)), key=lambda i: (keys[g, i], i))
+                for task in (rule_tasks[i] for i in order):
                     if upstream_failed(task, failures):
                         failures.setdefault(rule, set()).add(frozenset(task.kwargs.items()))
                         nskipped += 1
@@ -110,23 +146,26 @@ class DaskExecutor(Executor):
                         to_run.append(task)
                 if not to_run:
                     continue
-                logger.info(f'{rule.name}: {len(to_run)} task(s) on dask ({self.nproc} workers)')
+                size = batch_size(self.rmk, rule, to_run, self.nproc, 'dask')
+                logger.info(f'{rule.name}: {len(to_run)} task(s) on dask '
+                            f'({self.nproc} workers, batches of {size})')
                 futures = {
                     client.submit(
-                        _run_spec, self.remakefile, rule.name, task.kwargs, pure=False
-                    ): task
-                    for task in to_run
+                        _run_specs, self.remakefile, rule.name,
+                        [task.kwargs for task in batch], pure=False,
+                    ): batch
+                    for batch in batches(to_run, size)
                 }
                 # Barrier: drain this rule before starting the next.
                 for future in as_completed(futures):
-                    done += 1
-                    task = futures[future]
-                    if future.result():
-                        logger.info(f'{done}/{ntasks}: {task}')
-                    else:
-                        failures.setdefault(rule, set()).add(frozenset(task.kwargs.items()))
-                        nfailed += 1
-                        logger.error(f'{done}/{ntasks} failed: {task}')
+                    for task, succeeded in zip(futures[future], future.result()):
+                        done += 1
+                        if succeeded:
+                            logger.info(f'{done}/{ntasks}: {task}')
+                        else:
+                            failures.setdefault(rule, set()).add(frozenset(task.kwargs.items()))
+                            nfailed += 1
+                            logger.error(f'{done}/{ntasks} failed: {task}')
         finally:
             client.close()
             if cluster is not None:
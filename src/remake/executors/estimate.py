@@ -0,0 +1,193 @@
+"""Makespan and critical-path estimates — the data behind `remake estimate`.
+
+Simulates running a plan's runnable tasks under one executor's execution
+model, each task taking its recorded `wall_s` (unmeasured tasks are
+estimated as in scheduling.task_durations):
+
+- singleproc: one task at a time, in plan order.
+- multiproc: `nproc` workers; element-wise pipelining unless the
+  `multiproc` config turns it off; ready tasks start in `priority` order.
+- dask: `nproc` workers with per-rule barriers; `priority` order within a
+  rule.
+- slurm: one array job per rule. Each element runs its tasks back to back,
+  bundled as `bundle_seconds`/`bundle_size` would bundle them. An element
+  waits for its upstream counterpart where submission would use aftercorr,
+  otherwise for the whole upstream array (afterok). `array_throttle` caps a
+  rule's running elements. `nproc`, when given, caps running elements over
+  all arrays; otherwise the cluster is taken to have room for everything.
+
+Queue wait, worker start-up, batching and memory admission are not
+modelled, so the makespan is the time spent running. The critical path is
+the longest chain of dependent tasks (or elements), a lower bound that no
+number of workers beats.
+"""
+import math
+import os
+
+from ..core.exceptions import RemakeError
+from .multiproc_executor import _blockers, _default_nproc
+from .scheduling import (
+    critical_path,
+    dependents,
+    elementwise_groups,
+    priority_keys,
+    rule_groups,
+    schedule,
+    task_durations,
+)
+from .slurm_executor import (
+    DEFAULT_SLURM_CONFIG,
+    _bundles,
+    _SubmittedRule,
+)
+
+MODELS = ('singleproc', 'multiproc', 'dask', 'slurm')
+
+
+class Estimate:
+    """A simulated run. `rules` has one row per rule: its tasks, array
+    elements (= tasks outside slurm), summed work, first start and last end,
+    the workers it could use at once (`slots`: None = unlimited) and
+    `utilisation`, the share of those slot-seconds between its start and end
+    spent working. `path` is the critical path, one entry per task or
+    element: rule, kwargs (of an element's first task), ntasks, seconds."""
+
+    def __init__(self, model, nslots, ntasks, nmeasured, makespan, critical_path_s,
+                 path, rules, deferred=()):
+        self.model = model
+        self.nslots = nslots
+        self.ntasks = ntasks
+        self.nmeasured = nmeasured
+        self.makespan = makespan
+        self.critical_path_s = critical_path_s
+        self.path = path
+        self.rules = rules
+        self.deferred = list(deferred)
+
+    def to_dict(self):
+        return {
+            'model': self.model,
+            'nslots': self.nslots,
+            'ntasks': self.ntasks,
+            'nmeasured': self.nmeasured,
+            'makespan_s': round(self.makespan, 3),
+            'critical_path_s': round(self.critical_path_s, 3),
+            'critical_path': self.path,
+            'rules': self.rules,
+            'deferred': self.deferred,
+        }
+
+
+def estimate(rmk, tasks, model='multiproc', nproc=None, deferred=()):
+    """Simulate running `tasks` (plan order, as plan() returns them) under
+    `model` (see the module docstring). Returns an Estimate; `deferred` rule
+    names are only carried along, their tasks being unknowable yet."""
+    if model not in MODELS:
+        raise RemakeError(f'Unknown estimate model {model!r}: use one of {list(MODELS)}')
+    groups = rule_groups(tasks)
+    durations, nmeasured = task_durations(rmk, groups)
+    limits = None
+    if model == 'slurm':
+        units, durations, task_waits, group_waits, limits = _slurm_model(
+            rmk, groups, durations)
+        nslots = nproc or math.inf
+        keys = {(g, i): () for g, walls in enumerate(durations) for i in range(len(walls))}
+    else:
+        units = [[[task] for task in rule_tasks] for _, rule_tasks in groups]
+        section = {'singleproc': None, 'multiproc': 'multiproc', 'dask': 'dask'}[model]
+        config = rmk.config.get(section, {}) if section else {}
+        pipeline = model == 'multiproc' and config.get('pipeline', True)
+        task_waits, group_waits = _blockers(groups, pipeline)
+        if model == 'singleproc':
+            nslots = 1
+        else:
+            nslots = nproc or config.get('nproc') or (
+                _default_nproc() if model == 'multiproc' else os.cpu_count())
+    ranks = critical_path(durations, *dependents(task_waits, group_waits))
+    if model in ('multiproc', 'dask'):
+        keys = priority_keys(rmk, groups, durations, ranks, model)
+    elif model == 'singleproc':
+        keys = {tid: () for tid in ranks}
+    times = schedule(durations, task_waits, group_waits, nslots, keys, limits)
+
+    rows = []
+    for g, (rule, rule_tasks) in enumerate(groups):
+        spans = [times[g, i] for i in range(len(durations[g]))]
+        start = min(s for s, _ in spans)
+        end = max(e for _, e in spans)
+        work = sum(durations[g])
+        slots = min(nslots, len(spans), (limits[g] if limits else None) or math.inf)
+        rows.append({
+            'rule': rule.name,
+            'tasks': len(rule_tasks),
+            'elements': len(spans),
+            'work_s': round(work, 3),
+            'start_s': round(start, 3),
+            'end_s': round(end, 3),
+            'slots': None if slots == math.inf else slots,
+            'utilisation': (
+                round(work / ((end - start) * slots), 3)
+                if end > start and slots != math.inf else None
+            ),
+        })
+    makespan = max((end for _, end in times.values()), default=0.0)
+    path = _path(groups, units, durations, task_waits, group_waits, ranks)
+    return Estimate(
+        model, None if nslots == math.inf else nslots, len(tasks), nmeasured,
+        makespan, max(ranks.values(), default=0.0), path, rows, deferred,
+    )
+
+
+def _slurm_model(rmk, groups, durations):
+    """Array elements in place of tasks: (units: per group, the tasks of
+    each element; element durations; task_waits; group_waits; throttle per
+    group), as SlurmExecutor.run_tasks would bundle and chain them."""
+    slurm_config = {**DEFAULT_SLURM_CONFIG, **rmk.config.get('slurm', {})}
+    submitted = {}
+    group_of = {}
+    units, element_durations, task_waits, group_waits, limits = [], [], [], [], []
+    for g, (rule, rule_tasks) in enumerate(groups):
+        bundles = _bundles(rmk, slurm_config, rule, rule_tasks, submitted)
+        sub = _SubmittedRule(rule, rule_tasks, [], bundles)
+        bundles = bundles or [[i] for i in range(len(rule_tasks))]
+        units.append(sub.groups())
+        element_durations.append([sum(durations[g][i] for i in b) for b in bundles])
+        waits = [[] for _ in bundles]
+        whole = []
+        for dep in rule.depends_on:
+            if dep not in submitted:
+                continue  # nothing of it runs
+            d = group_of[dep]
+            if elementwise_groups(submitted[dep].groups(), sub.groups()):
+                for i, waits_i in enumerate(waits):
+                    waits_i.append((d, i))
+            else:
+                whole.append(d)
+        task_waits.append(waits)
+        group_waits.append(whole)
+        config = {**slurm_config, **rule.config.get('slurm', {})}
+        limits.append(config.get('array_throttle') or None)
+        submitted[rule] = sub
+        group_of[rule] = g
+    return units, element_durations, task_waits, group_waits, limits
+
+
+def _path(groups, units, durations, task_waits, group_waits, ranks):
+    """The critical path: from the highest-ranked task (or element), follow
+    whichever dependent carries the rest of its rank."""
+    if not ranks:
+        return []
+    task_dependents, group_dependents = dependents(task_waits, group_waits)
+    tid = min(ranks, key=lambda t: (-ranks[t], t))
+    path = []
+    while tid is not None:
+        g, i = tid
+        path.append({
+            'rule': groups[g][0].name,
+            'kwargs': units[g][i][0].kwargs,
+            'ntasks': len(units[g][i]),
+            'seconds': round(durations[g][i], 3),
+        })
+        candidates = [*task_dependents.get(tid, ()), *group_dependents.get(g, ())]
+        tid = min(candidates, key=lambda t: (-ranks[t], t)) if candidates else None
+    return path
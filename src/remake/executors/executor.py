@@ -14,6 +14,11 @@ class Executor(abc.ABC):
     # continued — set by `remake run -X` so the debugger gets the original
     # traceback. Only meaningful for in-process executors (singleproc).
     raise_on_failure = False
+    # Worker processes started, and the seconds they spent loading the
+    # remakefile, over this executor's lifetime; reported (per run) in the
+    # `run_summary` event. Stay 0 for in-process executors.
+    worker_starts = 0
+    worker_startup_s = 0.0
 
     def __init__(self, rmk):
         self.rmk = rmk
@@ -22,3 +27,15 @@ class Executor(abc.ABC):
     def run_tasks(self, tasks):
         """Run tasks; return the number that failed (None counts as 0 —
         asynchronous executors don't know yet at submission time)."""
+
+    def predict_makespan(self, tasks):
+        """(seconds, seconds of the longest dependency chain) this executor
+        is expected to take over `tasks` (plan order), estimated from
+        recorded durations; None where it cannot tell (nothing measured
+        yet, or an executor that does not schedule tasks itself)."""
+        return None
+
+    def close(self):
+        """Release anything kept across run_tasks calls (e.g. a worker pool).
+        Remake.run calls it once the run ends; the executor stays usable and
+        recreates what it needs on the next run_tasks."""
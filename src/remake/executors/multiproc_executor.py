@@ -7,25 +7,69 @@ task_from_spec (rule functions can't be pickled); results are recorded as
 sidecar files by the workers — no concurrent SQLite writers — and
 ingested by the parent after each rule and by every plan().
 
-Ordering: per-rule barriers. All tasks of a rule finish before the next
-rule's start. Dependencies are rule-level (remake has no task DAG), so
-this is exactly the ordering remake promises; the cost vs SLURM's
-aftercorr is that same-matrix chains don't pipeline element-wise.
+Ordering: element-wise pipelining, the local equivalent of SLURM's
+aftercorr. A task whose upstream rule provably pairs with it element by
+element (same matrix, and `elementwise` — each task reads only its
+counterpart's outputs) starts as soon as that counterpart succeeds; any
+other dependency waits for the whole upstream rule, the ordering remake
+promises (dependencies are rule-level; there is no task DAG). With
+`config={'multiproc': {'pipeline': False}}`, strict per-rule barriers
+instead: all tasks of a rule finish before the next rule's start.
 
 Per-task logs are written by the workers to the usual
 .remake/tasks/log/<rule>/... locations.
+
+Tasks of one rule can be shipped to workers in batches (executors/
+scheduling.py), `config={'multiproc': {'batch_size': ...}}` or
+`{'batch_seconds': ...}`; each task in a batch still gets its own log,
+sidecar result and failure handling.
+
+With a memory budget (`config={'multiproc': {'mem_budget': 'auto'}}` or a
+size, see executors/scheduling.py) a task is only started while the
+expected peaks of everything running, its own included, fit the budget;
+queued tasks are admitted as running ones finish. A task expected to need
+more than the whole budget still runs, alone.
+
+Among ready tasks, the next to start is chosen by `priority` (executors/
+scheduling.py): by default the one with the longest recorded chain of work
+ahead of it, element-wise successors included.
+
+The pool outlives run_tasks: Remake.run calls run_tasks once per replanning
+wave, and a dynamic pipeline would otherwise respawn every worker — and
+re-import the remakefile and its heavy dependencies — on each wave. It is
+shut down by close() (Remake.run does this when the run ends), and restarted
+when the remakefile changes on disk between waves, so workers never run
+code the parent did not plan with for longer than one wave.
 """
+import heapq
+import math
 import os
-from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 from multiprocessing import get_context
+from time import perf_counter
 
 from loguru import logger
 
 from ..core.exceptions import RemakeError
-from ..core.planner import upstream_failed
+from ..core.planner import same_matrix, upstream_failed
 from .executor import Executor
+from .scheduling import (
+    batch_size,
+    critical_path,
+    dependents,
+    elementwise,
+    priority_keys,
+    resolve_mem_budget,
+    rule_groups,
+    simulate,
+    task_durations,
+    task_mem,
+)
 
 _worker_rmk = None
+# Seconds this worker spent loading the remakefile; reported with its first
+# result (an initializer cannot return anything), then cleared.
+_worker_startup_s = None
 
 
 def _default_nproc():
@@ -41,16 +85,27 @@ def _default_nproc():
 
 
 def _worker_init(remakefile):
-    global _worker_rmk
+    global _worker_rmk, _worker_startup_s
     from ..loader import load_remake
     from ..metadata.sidecar import SidecarWriter
 
+    start = perf_counter()
     logger.remove()  # workers log to per-task files only
     _worker_rmk = load_remake(remakefile, finalize=False)
     _worker_rmk.metadata = SidecarWriter()
+    _worker_startup_s = perf_counter() - start
+
+
+def _worker_run(specs):
+    """Run a batch of task specs in order. Returns ([succeeded per spec],
+    startup seconds or None)."""
+    global _worker_startup_s
 
+    startup, _worker_startup_s = _worker_startup_s, None
+    return [_run_spec(spec) for spec in specs], startup
 
-def _worker_run(spec):
+
+def _run_spec(spec):
     from ..util import task_log_path
 
     rule_name, kwargs = spec
@@ -67,8 +122,61 @@ def _worker_run(spec):
         logger.remove(sink_id)
 
 
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def _pipeline_pairs(rule, rule_tasks, dep, dep_tasks):
+    """Indices into `dep_tasks` pairing each of `rule_tasks` with its
+    element-wise counterpart, or None when the dependency must be waited on
+    as a whole. Pairs by kwargs (same matrix, and the same task set on both
+    sides this wave), then requires the `elementwise` proof on the pairs —
+    equal kwargs alone would pipeline a stencil rule into unwritten inputs."""
+    if not same_matrix(rule, dep) or len(rule_tasks) != len(dep_tasks):
+        return None
+    index = {frozenset(t.kwargs.items()): i for i, t in enumerate(dep_tasks)}
+    pairs = [index.get(frozenset(t.kwargs.items())) for t in rule_tasks]
+    if None in pairs or not elementwise([dep_tasks[i] for i in pairs], rule_tasks):
+        return None
+    return pairs
+
+
+def _blockers(groups, pipeline):
+    """What each task waits on, as (task_waits, group_waits): per group,
+    for each task the upstream task ids it waits on individually, and the
+    upstream group indices whose every task it waits on. Task ids are
+    (group index, task index). `pipeline`: False for strict per-rule
+    barriers."""
+    group_of = {rule: g for g, (rule, _) in enumerate(groups)}
+    task_waits = []
+    group_waits = []
+    for g, (rule, rule_tasks) in enumerate(groups):
+        waits = [[] for _ in rule_tasks]
+        whole = []
+        if not pipeline:
+            # Strict barriers: every rule waits for the one before it.
+            whole = [g - 1] if g else []
+        else:
+            for dep in rule.depends_on:
+                if dep not in group_of:
+                    continue  # nothing of it runs this wave
+                d = group_of[dep]
+                pairs = _pipeline_pairs(rule, rule_tasks, dep, groups[d][1])
+                if pairs is None:
+                    whole.append(d)
+                else:
+                    for waits_i, j in zip(waits, pairs):
+                        waits_i.append((d, j))
+        task_waits.append(waits)
+        group_waits.append(whole)
+    return task_waits, group_waits
+
+
 class MultiprocExecutor(Executor):
-    def __init__(self, rmk, nproc=None):
+    def __init__(self, rmk, nproc=None, pipeline=None, mem_budget=None):
         super().__init__(rmk)
         self.remakefile = rmk.remakefile
         if self.remakefile is None:
@@ -79,56 +187,175 @@ class MultiprocExecutor(Executor):
         self.nproc = (
             nproc or rmk.config.get('multiproc', {}).get('nproc') or _default_nproc()
         )
+        if pipeline is None:
+            pipeline = rmk.config.get('multiproc', {}).get('pipeline', True)
+        self.pipeline = pipeline
+        # Bytes, or None: admit on nproc alone.
+        self.mem_budget = resolve_mem_budget(
+            mem_budget or rmk.config.get('multiproc', {}).get('mem_budget'))
+        self._pool = None
+        self._pool_mtime = None  # remakefile mtime the pool's workers loaded
+
+    def _get_pool(self):
+        """The warm pool, (re)started if there is none or the remakefile
+        changed since its workers loaded it."""
+        mtime = _mtime(self.remakefile)
+        if self._pool is not None and mtime != self._pool_mtime:
+            logger.info('remakefile changed: restarting worker pool')
+            self.close()
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.nproc,
+                mp_context=get_context('spawn'),
+                initializer=_worker_init,
+                initargs=(self.remakefile,),
+            )
+            self._pool_mtime = mtime
+        return self._pool
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def _schedule(self, groups):
+        """Waits, estimated durations and priority keys of `groups`:
+        (task_waits, group_waits, durations, measured, ranks, keys)."""
+        task_waits, group_waits = _blockers(groups, self.pipeline)
+        durations, measured = task_durations(self.rmk, groups)
+        ranks = critical_path(durations, *dependents(task_waits, group_waits))
+        keys = priority_keys(self.rmk, groups, durations, ranks, 'multiproc')
+        return task_waits, group_waits, durations, measured, ranks, keys
+
+    def predict_makespan(self, tasks):
+        groups = rule_groups(tasks)
+        task_waits, group_waits, durations, measured, ranks, keys = self._schedule(groups)
+        if not measured:
+            return None
+        makespan = simulate(durations, task_waits, group_waits, self.nproc, keys)
+        return makespan, max(ranks.values(), default=0.0)
 
     def run_tasks(self, tasks):
-        # Group consecutive same-rule tasks; plan order is rule-topological.
-        groups = []
-        for task in tasks:
-            if groups and groups[-1][0] is task.rule:
-                groups[-1][1].append(task)
-            else:
-                groups.append((task.rule, [task]))
+        groups = rule_groups(tasks)
+        task_waits, group_waits, durations, measured, ranks, keys = self._schedule(groups)
+        sizes = [
+            batch_size(self.rmk, rule, rule_tasks, self.nproc, 'multiproc')
+            for rule, rule_tasks in groups
+        ]
+        # Expected peak per task of each group (a batch runs its tasks one
+        # after another, so it needs as much as one of them).
+        mems = [
+            task_mem(self.rmk, rule, 'multiproc') if self.mem_budget else 0
+            for rule, _ in groups
+        ]
+        # Countdowns: a task is ready when it has no outstanding waits; a
+        # group is finished when all its tasks are.
+        nwaiting = {}
+        task_dependents, group_dependents = dependents(task_waits, group_waits)
+        group_left = [len(rule_tasks) for _, rule_tasks in groups]
+        ready = []  # heap of (priority key, task id); ties in plan order
+        for g, (rule, rule_tasks) in enumerate(groups):
+            for i in range(len(rule_tasks)):
+                tid = (g, i)
+                nwaiting[tid] = len(task_waits[g][i]) + len(group_waits[g])
+                if not nwaiting[tid]:
+                    ready.append((keys[tid], tid))
+            paired = [groups[d][0].name for d in {d for w in task_waits[g] for d, _ in w}]
+            logger.debug(
+                '{}: {} task(s) in batches of {}, {} MB each, element-wise after {}, '
+                'after all of {}',
+                rule.name, len(rule_tasks), sizes[g], mems[g] // 2**20,
+                sorted(paired) or '-',
+                sorted(groups[d][0].name for d in group_waits[g]) or '-',
+            )
+        heapq.heapify(ready)
+
+        def finished(tid):
+            g, _ = tid
+            released = list(task_dependents.get(tid, []))
+            group_left[g] -= 1
+            if not group_left[g]:
+                released.extend(group_dependents.get(g, []))
+            for dependent in released:
+                nwaiting[dependent] -= 1
+                if not nwaiting[dependent]:
+                    heapq.heappush(ready, (keys[dependent], dependent))
 
         ntasks = len(tasks)
         nfailed = 0
         nskipped = 0
         done = 0
         failures = {}  # rule -> set of frozenset(kwargs.items())
-        with ProcessPoolExecutor(
-            max_workers=self.nproc,
-            mp_context=get_context('spawn'),
-            initializer=_worker_init,
-            initargs=(self.remakefile,),
-        ) as pool:
-            for rule, rule_tasks in groups:
-                # The per-rule barrier means upstream failures are fully
-                # known here: skip tasks they taint rather than running
-                # them into missing inputs (left pending for a later run).
-                to_run = []
-                for task in rule_tasks:
-                    if upstream_failed(task, failures):
-                        failures.setdefault(rule, set()).add(frozenset(task.kwargs.items()))
-                        nskipped += 1
+        budget = f', memory budget {self.mem_budget / 2**30:.1f}G' if self.mem_budget else ''
+        logger.info(f'{ntasks} task(s) on {self.nproc} proc(s){budget}')
+        if measured:
+            makespan = simulate(durations, task_waits, group_waits, self.nproc, keys)
+            logger.info(f'predicted makespan {makespan:.1f}s '
+                        f'(critical path {max(ranks.values()):.1f}s)')
+        in_use = 0  # expected bytes of everything running
+        pool = self._get_pool()
+        try:
+            futures = {}
+            while ready or futures:
+                # Submit no more than the pool can run: the rest stay in
+                # the heap, so a newly released downstream task can overtake
+                # queued work from later rules.
+                while ready and len(futures) < self.nproc:
+                    # A batch: the next ready tasks, while they are of the
+                    # same rule.
+                    g = ready[0][1][0]
+                    # Admit in priority order: when the next task does not fit,
+                    # wait for running ones to free memory rather than let
+                    # smaller tasks overtake it (and starve it).
+                    if futures and in_use + mems[g] > (self.mem_budget or math.inf):
+                        break
+                    rule, rule_tasks = groups[g]
+                    batch = []
+                    while ready and ready[0][1][0] == g and len(batch) < sizes[g]:
+                        _, tid = heapq.heappop(ready)
+                        task = rule_tasks[tid[1]]
+                        # Everything this task waits on has finished, so the
+                        # failures that concern it are known: skip tasks they
+                        # taint rather than running them into missing inputs
+                        # (left pending for a later run).
+                        if upstream_failed(task, failures):
+                            failures.setdefault(rule, set()).add(frozenset(task.kwargs.items()))
+                            nskipped += 1
+                            done += 1
+                            logger.warning(f'{done}/{ntasks} skipped (upstream failed): {task}')
+                            finished(tid)
+                            continue
+                        batch.append(tid)
+                    if batch:
+                        specs = [(rule.name, rule_tasks[i].kwargs) for _, i in batch]
+                        futures[pool.submit(_worker_run, specs)] = batch
+                        in_use += mems[g]
+                if not futures:
+                    continue  # everything popped was skipped; more may be ready
+                completed, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in completed:
+                    batch = futures.pop(future)
+                    in_use -= mems[batch[0][0]]
+                    results, startup = future.result()
+                    if startup is not None:
+                        self.worker_starts += 1
+                        self.worker_startup_s += startup
+                    for tid, succeeded in zip(batch, results):
+                        rule, rule_tasks = groups[tid[0]]
+                        task = rule_tasks[tid[1]]
                         done += 1
-                        logger.warning(f'{done}/{ntasks} skipped (upstream failed): {task}')
-                    else:
-                        to_run.append(task)
-                if not to_run:
-                    continue
-                logger.info(f'{rule.name}: {len(to_run)} task(s) on {self.nproc} proc(s)')
-                futures = {
-                    pool.submit(_worker_run, (rule.name, t.kwargs)): t for t in to_run
-                }
-                # Barrier: drain this rule before starting the next.
-                for future in as_completed(futures):
-                    done += 1
-                    task = futures[future]
-                    if future.result():
-                        logger.info(f'{done}/{ntasks}: {task}')
-                    else:
-                        failures.setdefault(rule, set()).add(frozenset(task.kwargs.items()))
-                        nfailed += 1
-                        logger.error(f'{done}/{ntasks} failed: {task}')
+                        if succeeded:
+                            logger.info(f'{done}/{ntasks}: {task}')
+                        else:
+                            failures.setdefault(rule, set()).add(frozenset(task.kwargs.items()))
+                            nfailed += 1
+                            logger.error(f'{done}/{ntasks} failed: {task}')
+                        finished(tid)
+        except BaseException:
+            # A broken pool (a worker died) or an interrupt: don't carry the
+            # pool into another wave.
+            self.close()
+            raise
         if nfailed:
             skipped = f' ({nskipped} downstream task(s) skipped)' if nskipped else ''
             logger.error(f'{nfailed}/{ntasks} tasks failed{skipped}')
@@ -25,6 +25,22 @@ File layout (all relative to the working directory, like the metadata DB):
     .remake/submit.sh                master script; `remake resubmit`
                                      re-executes it without replanning
 
+Bundling (`config={'slurm': {'bundle_seconds': ...}}`): each array element
+runs a group of tasks instead of one, packed from the tasks' recorded
+`wall_s` against the target element duration (`bundle_size` tasks per
+element when nothing is recorded yet). Each spec then carries its `element`
+and `run-array-task --bundled` runs every task of that element, recording
+a result per task. aftercorr is kept only where the bundles themselves pair
+element by element (scheduling.elementwise_groups); otherwise afterok.
+
+Right-sizing (`config={'slurm': {'auto_resources': True}}`, or a dict of
+AUTO_RESOURCES overrides): a rule's --mem and --time are derived from a high
+percentile of its recorded wall_s/max_rss_bytes plus headroom, falling back
+to the configured values while it has too little history. A mem/time set in
+the rule's own `slurm` config is never overridden. The choice and
+its basis are logged at generation (so `--dry-run` shows them) and noted in
+the sbatch script.
+
 Task kwargs must be JSON-serialisable (they round-trip through the job
 specs). Already-queued detection is per rule: if any element of a rule's
 previous submission is still pending/running, the whole rule is skipped
@@ -33,6 +49,7 @@ tasks are picked up by a later run.
 """
 import getpass
 import json
+import math
 import re
 import shlex
 import subprocess as sp
@@ -42,7 +59,9 @@ from pathlib import Path
 from loguru import logger
 
 from ..core.exceptions import RemakeError
+from ..core.task import prime_keys
 from .executor import Executor
+from .scheduling import elementwise, elementwise_groups, pack_durations
 
 DEFAULT_SLURM_CONFIG = {
     'partition': 'standard',
@@ -51,6 +70,18 @@ DEFAULT_SLURM_CONFIG = {
     'mem': '4G',
 }
 
+# auto_resources policy: per-rule --mem/--time from the `percentile`-th
+# percentile of recorded successful executions, times `headroom`, once a
+# rule has at least `min_samples` measurements (each resource separately).
+# Floors keep a run of trivially short/small tasks from requesting nothing.
+AUTO_RESOURCES = {
+    'percentile': 95,
+    'headroom': 1.5,
+    'min_samples': 5,
+    'min_mem_mb': 256,
+    'min_time_min': 5,
+}
+
 # Every rule is submitted as one array job, even for a single task
 # (--array=0-0): one submission mode means one sbatch template, one submit
 # line shape and one sidecar encoding (review finding C2).
@@ -60,9 +91,9 @@ ARRAY_SBATCH_TPL = """#!/bin/bash
 #SBATCH -o {output_dir}/%a.out
 #SBATCH -e {output_dir}/%a.err
 #SBATCH --kill-on-invalid-dep=yes
-{opts}
+{opts}{resources_note}
 echo "SLURM RUNNING {rule_name} $SLURM_ARRAY_TASK_ID"
-remake run-array-task {remakefile} {rule_name} $SLURM_ARRAY_TASK_ID --specs {specs}
+remake run-array-task {remakefile} {rule_name} $SLURM_ARRAY_TASK_ID --specs {specs}{packed}{bundled}
 rc=$?
 echo "SLURM COMPLETED {rule_name} $SLURM_ARRAY_TASK_ID (rc=$rc)"
 exit $rc
@@ -82,6 +113,54 @@ def _sbatch_opts(config):
     return '\n'.join(f'#SBATCH --{k}={v}' for k, v in config.items() if v)
 
 
+def _percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list."""
+    values = sorted(values)
+    return values[max(0, math.ceil(pct / 100 * len(values)) - 1)]
+
+
+def _format_minutes(minutes):
+    """SLURM --time as D-HH:MM:SS / HH:MM:SS."""
+    days, rest = divmod(int(minutes), 24 * 60)
+    hours, mins = divmod(rest, 60)
+    hms = f'{hours:02d}:{mins:02d}:00'
+    return f'{days}-{hms}' if days else hms
+
+
+def auto_resources(history, policy, tasks_per_element=1, explicit=()):
+    """({'mem': ..., 'time': ...}, basis) sized from `history` —
+    [(wall_s, max_rss_bytes)], see MetadataManager.get_resource_history —
+    under `policy` (AUTO_RESOURCES keys). A resource with fewer than
+    min_samples measurements, or named in `explicit` (set in the rule's own
+    config), is left out (the configured value stands) and the basis says
+    so. `tasks_per_element` scales the time for bundled elements, which run
+    their tasks one after another."""
+    pct, headroom = policy['percentile'], policy['headroom']
+    sized = {}
+    basis = []
+    walls = [w for w, _ in history if w is not None]
+    rsss = [r for _, r in history if r is not None]
+    if 'mem' in explicit:
+        basis.append('mem from rule config')
+    elif len(rsss) >= policy['min_samples']:
+        mb = max(policy['min_mem_mb'], math.ceil(_percentile(rsss, pct) * headroom / 2**20))
+        sized['mem'] = f'{mb}M'
+        basis.append(f'mem {mb}M = p{pct} of {len(rsss)} x {headroom}')
+    else:
+        basis.append(f'mem from config ({len(rsss)} < {policy["min_samples"]} measured)')
+    if 'time' in explicit:
+        basis.append('time from rule config')
+    elif len(walls) >= policy['min_samples']:
+        seconds = _percentile(walls, pct) * headroom * tasks_per_element
+        minutes = max(policy['min_time_min'], math.ceil(seconds / 60))
+        sized['time'] = _format_minutes(minutes)
+        per = f' x {tasks_per_element} task(s)' if tasks_per_element > 1 else ''
+        basis.append(f'time {sized["time"]} = p{pct} of {len(walls)} x {headroom}{per}')
+    else:
+        basis.append(f'time from config ({len(walls)} < {policy["min_samples"]} measured)')
+    return sized, '; '.join(basis)
+
+
 class SqueueError(RemakeError):
     """squeue could not be run, so the queue state is unknown. Distinct from
     an empty queue: treating "unknown" as "empty" would green-light
@@ -312,44 +391,53 @@ def last_submission(rule_name, task_key=None):
     specs_path = spec_path(rule_name, recorded.get('run_seq'))
     if task_key is not None and specs_path.exists():
         specs = json.loads(specs_path.read_text())
-        index = next((i for i, s in enumerate(specs) if s['task_key'] == task_key), None)
+        # A bundled spec names its array element; otherwise it is the position.
+        index = next((s.get('element', i) for i, s in enumerate(specs)
+                      if s['task_key'] == task_key), None)
     return jobids, index
 
 
-def _elementwise(upstream_tasks, tasks):
-    """True iff element i of `tasks` reads, among all the upstream outputs,
-    only those produced by upstream element i — the condition for SLURM's
-    aftercorr (element N starts when upstream element N finishes). Equal
-    kwargs lists are NOT sufficient: a stencil rule (task t reads upstream
-    t-1, t, t+1) has an identical matrix, yet aftercorr would start element
-    t while its neighbours' inputs are unwritten — silent partial data
-    (review finding 7). Derived from resolved task inputs/outputs, plain
-    paths available at generation time."""
-    if len(upstream_tasks) != len(tasks):
-        return False
-    up_outputs = [{str(p) for p in t.outputs.values()} for t in upstream_tasks]
-    all_up = set().union(*up_outputs)
-    if sum(len(outs) for outs in up_outputs) != len(all_up):
-        # Elements share an output (e.g. one zarr store region-written by
-        # all): "element i's file" is every element's file, so the subset
-        # test below would pass vacuously while element i's data is still
-        # being written by its siblings.
-        return False
-    reads = [{str(p) for p in task.inputs.values()} & all_up for task in tasks]
-    # Every element must actually read from its counterpart (an empty
-    # intersection — ordering-only depends_on — proves nothing).
-    return all(read and read <= up_outputs[i] for i, read in enumerate(reads))
-
-
 class _SubmittedRule:
     """How submit.sh refers to one rule's job(s)."""
 
-    def __init__(self, rule, tasks, jobid_refs):
+    def __init__(self, rule, tasks, jobid_refs, bundles=None):
         self.rule = rule
         self.tasks = tasks
         # Shell var ('$JOB_extract') for rules submitted this run, or
         # literal job ids for already-queued rules.
         self.jobid_refs = jobid_refs
+        # Indices into tasks run by each array element; None = one task each.
+        self.bundles = bundles
+
+    def groups(self):
+        """The tasks each array element runs."""
+        if self.bundles is None:
+            return [[task] for task in self.tasks]
+        return [[self.tasks[i] for i in bundle] for bundle in self.bundles]
+
+
+def _bundles(rmk, slurm_config, rule, tasks, submitted):
+    """Indices into `tasks` for each array element, or None when bundling
+    is off for the rule (one task per element). `submitted`: rule ->
+    _SubmittedRule of the upstream rules generated so far."""
+    config = {**slurm_config, **rule.config.get('slurm', {})}
+    seconds = config.get('bundle_seconds')
+    size = config.get('bundle_size')
+    if not seconds and not size:
+        return None
+    # Follow an element-wise upstream's bundles, so that the elements
+    # still pair up and aftercorr stays valid.
+    for dep in rule.depends_on:
+        sub = submitted.get(dep)
+        if (sub is not None and sub.bundles is not None
+                and elementwise(sub.tasks, tasks)):
+            return sub.bundles
+    records = rmk.metadata.get_tasks_status(tasks) if seconds else {}
+    durations = [
+        rec.wall_s if (rec := records.get(task.key)) is not None else None
+        for task in tasks
+    ]
+    return pack_durations(durations, seconds, size)
 
 
 class SlurmExecutor(Executor):
@@ -422,16 +510,24 @@ class SlurmExecutor(Executor):
                 # Downstream rules depend on the queued jobs by literal id.
                 submitted[rule] = _SubmittedRule(rule, None, queued_ids)
                 continue
-            self._write_job_specs(rule, tasks_for_rule, run_seq)
-            logger.info(f'{rule.name}: submitting {len(tasks_for_rule)} task(s)')
+            bundles = _bundles(self.rmk, self.slurm_config, rule, tasks_for_rule, submitted)
+            sub = _SubmittedRule(rule, tasks_for_rule, [f'$JOB_{rule.name}'], bundles)
+            self._write_job_specs(rule, tasks_for_rule, run_seq, bundles)
+            if bundles is None:
+                logger.info(f'{rule.name}: submitting {len(tasks_for_rule)} task(s)')
+            else:
+                logger.info(f'{rule.name}: submitting {len(tasks_for_rule)} task(s) '
+                            f'in {len(bundles)} array element(s)')
             for task in tasks_for_rule:
                 logger.trace('  {}: {} {}', rule.name, task.key, task.kwargs)
-            self._write_sbatch(rule, tasks_for_rule, run_seq)
-            dependency = self._dependency(rule, tasks_for_rule, submitted)
+            resources = self._auto_resources(rule, sub)
+            self._write_sbatch(rule, len(sub.groups()), run_seq,
+                               bundled=bundles is not None, resources=resources)
+            dependency = self._dependency(rule, sub, submitted)
             lines.extend(self._submit_lines(rule, dependency, run_seq))
             lines.append('')
             nsubmit += len(tasks_for_rule)
-            submitted[rule] = _SubmittedRule(rule, tasks_for_rule, [f'$JOB_{rule.name}'])
+            submitted[rule] = sub
 
         if deferred_rules:
             names = ', '.join(rule.name for rule in deferred_rules)
@@ -465,13 +561,35 @@ class SlurmExecutor(Executor):
             return
         self.submit()
 
-    def _write_job_specs(self, rule, tasks, run_seq):
+    def _auto_resources(self, rule, sub):
+        """(sized mem/time, basis) when auto_resources is on for the rule,
+        else None."""
+        rule_config = rule.config.get('slurm', {})
+        setting = {**self.slurm_config, **rule_config}.get('auto_resources')
+        if not setting:
+            return None
+        policy = {**AUTO_RESOURCES, **(setting if isinstance(setting, dict) else {})}
+        tasks_per_element = max(len(group) for group in sub.groups())
+        # A rule's own mem/time beat sizing from history, as they beat the
+        # pipeline-wide values.
+        explicit = {key for key in ('mem', 'time') if key in rule_config}
+        sized, basis = auto_resources(
+            self.rmk.metadata.get_resource_history(rule), policy, tasks_per_element,
+            explicit)
+        logger.info(f'{rule.name}: auto_resources: {basis}')
+        return sized, basis
+
+    def _write_job_specs(self, rule, tasks, run_seq, bundles=None):
         self.jobs_dir.mkdir(parents=True, exist_ok=True)
+        prime_keys(tasks)
         specs = [
             {'task_key': task.key, 'rule': rule.name, 'kwargs': task.kwargs,
              'run_seq': run_seq}
             for task in tasks
         ]
+        for element, bundle in enumerate(bundles or ()):
+            for i in bundle:
+                specs[i]['element'] = element
         path = spec_path(rule.name, run_seq)
         if path.exists():
             # Queued arrays pin this exact file (--specs): rewriting it is
@@ -481,39 +599,50 @@ class SlurmExecutor(Executor):
             raise RemakeError(f'{path} already exists — job specs are write-once')
         path.write_text(json.dumps(specs, indent=1))
 
-    def _write_sbatch(self, rule, tasks, run_seq):
+    def _write_sbatch(self, rule, nelements, run_seq, bundled=False, resources=None):
         config = {**self.slurm_config, **rule.config.get('slurm', {})}
+        config.pop('auto_resources', None)
+        if resources is not None:
+            config.update(resources[0])
         config.pop('array_threshold', None)
         throttle = config.pop('array_throttle', None)
+        packed = config.pop('packed_results', False)
+        config.pop('bundle_seconds', None)
+        config.pop('bundle_size', None)
         output_dir = self.output_dir / rule.name
         output_dir.mkdir(parents=True, exist_ok=True)
         script = ARRAY_SBATCH_TPL.format(
             rule_name=rule.name,
-            max_index=len(tasks) - 1,
+            max_index=nelements - 1,
             array_throttle=f'%{throttle}' if throttle else '',
             output_dir=output_dir,
             opts=_sbatch_opts(config),
+            resources_note=f'\n# remake auto_resources: {resources[1]}' if resources else '',
             # The remakefile is a user-typed path (spaces in home/group dirs
             # word-split on the compute node); other interpolations are
             # rule-name-derived .remake/ paths, safe unquoted.
             remakefile=shlex.quote(str(self.remakefile)),
             specs=shlex.quote(str(spec_path(rule.name, run_seq))),
+            packed=' --packed' if packed else '',
+            bundled=' --bundled' if bundled else '',
         )
         self.slurm_dir.mkdir(parents=True, exist_ok=True)
         (self.slurm_dir / f'{rule.name}.sbatch').write_text(script)
 
-    def _dependency(self, rule, tasks, submitted):
-        """--dependency=... for this rule, or '' if no upstream jobs."""
+    def _dependency(self, rule, this, submitted):
+        """--dependency=... for this rule (`this`: its _SubmittedRule), or ''
+        if no upstream jobs."""
         parts = []
         for dep in rule.depends_on:
             sub = submitted.get(dep)
             if sub is None:
                 continue  # upstream rule has no jobs this run (complete)
-            # aftercorr only when provably element-wise (see _elementwise);
-            # otherwise — including rules queued from a previous submission
-            # (sub.tasks is None), whose element order is unknowable here —
-            # wait for the whole upstream job.
-            if sub.tasks is not None and _elementwise(sub.tasks, tasks):
+            # aftercorr only when provably element-wise (see elementwise),
+            # element by element as bundled; otherwise — including rules
+            # queued from a previous submission (sub.tasks is None), whose
+            # element order is unknowable here — wait for the whole
+            # upstream job.
+            if sub.tasks is not None and elementwise_groups(sub.groups(), this.groups()):
                 parts.append(f'aftercorr:{":".join(sub.jobid_refs)}')
             else:
                 parts.append(f'afterok:{":".join(sub.jobid_refs)}')
@@ -534,6 +663,10 @@ class SlurmExecutor(Executor):
         # Replanning only, regardless of what per-rule mem/time would say.
         config = dict(self.slurm_config)
         config.pop('array_throttle', None)
+        config.pop('packed_results', None)
+        config.pop('bundle_seconds', None)
+        config.pop('bundle_size', None)
+        config.pop('auto_resources', None)
         config['time'] = '00:10:00'
         config['mem'] = '1G'
         script = CONTINUATION_SBATCH_TPL.format(
@@ -0,0 +1,121 @@
+"""Thread executor — in-process parallelism for I/O-bound rules.
+
+For rules that spend their time in network or parallel-filesystem I/O with
+the GIL released (NetCDF reads, object-store uploads), a process per worker
+is mostly start-up cost: every multiproc worker re-imports the remakefile
+and its dependencies. Here tasks run in this process, on a thread pool, so
+there is nothing to start; CPU-bound rules gain nothing (the GIL) and
+belong on multiproc.
+
+Per-rule barriers with upstream-failure skipping, as in dask; within a
+rule, tasks are submitted in `priority` order (executors/scheduling.py).
+Worker count: `-j`, or `config={'threads': {'nproc': ...}}`, by default
+that of concurrent.futures (min(32, cpus + 4)).
+
+Results: the SQLite connection belongs to the thread that opened it, and
+one writer never contends with itself, so worker threads do not write.
+While run_tasks runs, rmk.metadata is a stand-in that queues each
+update_task; the run_tasks thread performs the queued writes as tasks
+complete. Resource capture records what it can: overlapping tasks share
+one process, so a task that ran alongside another gets its wall time but
+no CPU time or peak memory (util/resources.py).
+"""
+import os
+import queue
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from loguru import logger
+
+from ..core.planner import upstream_failed
+from .executor import Executor
+from .scheduling import priority_keys, rule_groups, task_durations
+
+
+class _QueuedWrites:
+    """Stands in for rmk.metadata while worker threads run tasks: their
+    update_task calls are queued for flush() on the run_tasks thread.
+    Anything else is passed through."""
+
+    def __init__(self, metadata):
+        self.metadata = metadata
+        self.pending = queue.SimpleQueue()
+
+    def update_task(self, task, status, exception='', resources=None):
+        self.pending.put((task, status, exception, resources))
+
+    def flush(self):
+        """Write everything queued so far."""
+        while True:
+            try:
+                task, status, exception, resources = self.pending.get_nowait()
+            except queue.Empty:
+                return
+            self.metadata.update_task(task, status, exception, resources=resources)
+
+    def __getattr__(self, name):
+        return getattr(self.metadata, name)
+
+
+class ThreadExecutor(Executor):
+    def __init__(self, rmk, nproc=None):
+        super().__init__(rmk)
+        self.nproc = (
+            nproc or rmk.config.get('threads', {}).get('nproc')
+            or min(32, (os.cpu_count() or 1) + 4)
+        )
+
+    def run_tasks(self, tasks):
+        groups = rule_groups(tasks)
+        durations, _ = task_durations(self.rmk, groups)
+        # No pipelining: every task of a rule waits for the rules before it,
+        # so a task's chain ahead is its own duration plus a per-rule constant.
+        ranks = {(g, i): seconds for g, walls in enumerate(durations)
+                 for i, seconds in enumerate(walls)}
+        keys = priority_keys(self.rmk, groups, durations, ranks, 'threads')
+
+        ntasks = len(tasks)
+        nfailed = 0
+        nskipped = 0
+        done = 0
+        failures = {}  # rule -> set of frozenset(kwargs.items())
+        logger.info(f'{ntasks} task(s) on {self.nproc} thread(s)')
+        metadata = self.rmk.metadata
+        writes = self.rmk.metadata = _QueuedWrites(metadata)
+        pool = ThreadPoolExecutor(max_workers=self.nproc, thread_name_prefix='remake')
+        try:
+            for g, (rule, rule_tasks) in enumerate(groups):
+                futures = {}
+                order = sorted(range(len(rule_tasks)), key=lambda i: (keys[g, i], i))
+                for task in (rule_tasks[i] for i in order):
+                    if upstream_failed(task, failures):
+                        failures.setdefault(rule, set()).add(frozenset(task.kwargs.items()))
+                        nskipped += 1
+                        done += 1
+                        logger.warning(f'{done}/{ntasks} skipped (upstream failed): {task}')
+                    else:
+                        futures[pool.submit(self.rmk.run_task, task)] = task
+                # Barrier: drain this rule before starting the next.
+                while futures:
+                    completed, _ = wait(futures, return_when=FIRST_COMPLETED)
+                    # run_task queues its result before returning.
+                    writes.flush()
+                    for future in completed:
+                        task = futures.pop(future)
+                        done += 1
+                        if future.exception() is None:
+                            logger.info(f'{done}/{ntasks}: {task}')
+                        else:
+                            # Recorded (and logged) by run_task.
+                            failures.setdefault(rule, set()).add(frozenset(task.kwargs.items()))
+                            nfailed += 1
+                            logger.error(f'{done}/{ntasks} failed: {task}')
+        finally:
+            # Interrupted: let running tasks finish (threads cannot be
+            # killed) and keep their results; start nothing more.
+            pool.shutdown(wait=True, cancel_futures=True)
+            self.rmk.metadata = metadata
+            writes.flush()
+        if nfailed:
+            skipped = f' ({nskipped} downstream task(s) skipped)' if nskipped else ''
+            logger.error(f'{nfailed}/{ntasks} tasks failed{skipped}')
+        return nfailed
@@ -35,16 +35,25 @@ def load_module(local_filename: Union[str, Path], module_attrs=None):
     return module
 
 
-def load_remake(filename, finalize=True):
-    """Load a pipeline file and return its Remake instance."""
+def load_remake(filename, finalize=True, checked_rules=None):
+    """Load a pipeline file and return its Remake instance.
+
+    checked_rules: names of the rules to validate and scope-check while the
+    file loads (None: all). Checks of other rules are deferred to finalize.
+    """
     # Avoids circular import.
     from ..core.exceptions import RemakeLoadError
     from ..core.remake import Remake
+    from ..core.rule import checks_only_for
 
     filename = Path(filename)
     if not filename.suffix:
         filename = filename.with_suffix('.py')
-    remake_module = load_module(filename)
+    if checked_rules is None:
+        remake_module = load_module(filename)
+    else:
+        with checks_only_for(checked_rules):
+            remake_module = load_module(filename)
     remakes = [o for o in vars(remake_module).values() if isinstance(o, Remake)]
     if len(remakes) > 1:
         raise RemakeLoadError(f'More than one Remake defined in {filename}')
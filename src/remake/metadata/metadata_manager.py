@@ -2,6 +2,8 @@ import abc
 from dataclasses import dataclass
 from typing import Optional
 
+from ..core.task import task_keys
+
 TASK_STATUS_PENDING = 0
 TASK_STATUS_SUCCESS = 1
 TASK_STATUS_FAILED = 2
@@ -59,7 +61,9 @@ class RecordCache:
 
     Never carry one across a write (run/set-state): records go stale. The
     read-only commands create a fresh cache per call. Everything except
-    get_tasks_status passes through to the wrapped backend.
+    get_tasks_status and store_plan_snapshots passes through to the wrapped
+    backend; plan snapshots are read but not stored, so planning through a
+    cache leaves the DB as it found it.
     """
 
     def __init__(self, metadata):
@@ -69,15 +73,24 @@ class RecordCache:
     def __getattr__(self, name):
         return getattr(self._metadata, name)
 
+    def store_plan_snapshots(self, snapshots):
+        pass  # read-only: the next `run`/`plan` stores its own
+
     def get_tasks_status(self, tasks):
-        missing = [t for t in tasks if t.key not in self._records]
+        keys = task_keys(tasks)
+        missing = [i for i, key in enumerate(keys) if key not in self._records]
         if missing:
-            found = self._metadata.get_tasks_status(missing)
-            for t in missing:
-                self._records[t.key] = found.get(t.key)
+            if len(missing) == len(keys):
+                found = self._metadata.get_tasks_status(tasks)
+            elif hasattr(tasks, 'take'):
+                found = self._metadata.get_tasks_status(tasks.take(missing))
+            else:
+                found = self._metadata.get_tasks_status([tasks[i] for i in missing])
+            for i in missing:
+                self._records[keys[i]] = found.get(keys[i])
         return {
-            t.key: rec for t in tasks
-            if (rec := self._records[t.key]) is not None
+            key: rec for key in keys
+            if (rec := self._records[key]) is not None
         }
 
 
@@ -90,7 +103,9 @@ class MetadataManager(abc.ABC):
 
     @abc.abstractmethod
     def get_tasks_status(self, tasks) -> dict:
-        """{task.key: TaskRecord} for tasks that have a stored record."""
+        """{task.key: TaskRecord} for tasks that have a stored record.
+        `tasks` is a list of Tasks or a TaskBatch: read keys via
+        `task_keys(tasks)`, which computes a batch's in bulk."""
 
     def get_codes(self, code_ids) -> dict:
         """{code_id: text} for the given ids (a TaskRecord's
@@ -98,6 +113,13 @@ class MetadataManager(abc.ABC):
         have nothing to resolve; None ids are ignored."""
         return {}
 
+    def get_code_digests(self, code_ids) -> dict:
+        """{code_id: AST digest} (util.code_compare.ast_digest of the text) for
+        those of the given ids whose digest is stored. Ids missing from the
+        result are compared by parsing their text; backends without a code
+        store return {}."""
+        return {}
+
     def get_uses_manifest(self, uses_code_id) -> dict:
         """{name: (raw-rendering, kind)} for the helpers behind a stored uses
         version (a TaskRecord's uses_code_id) — see scope.raw_uses_parts for
@@ -105,6 +127,32 @@ class MetadataManager(abc.ABC):
         or records predating the manifest table)."""
         return {}
 
+    def get_resource_history(self, rule) -> list:
+        """[(wall_s, max_rss_bytes)] from the last successful execution of
+        each of the rule's recorded tasks that has any measurement (either
+        value may be None). Backends without a store return []."""
+        return []
+
+    def find_tasks_by_key(self, key, limit=2) -> list:
+        """[(key, rule name, kwargs)] for up to `limit` recorded tasks whose
+        key starts with `key` (a full key or a prefix). kwargs is None for
+        records that predate storing them. Backends without a store return
+        [], and callers fall back to scanning the rules' matrices."""
+        return []
+
+    def get_plan_snapshots(self, rules) -> dict:
+        """{rule.name: (task_gen, fingerprint, snapshot)} for these rules —
+        the planner's per-rule stored result (see planner._plan_fingerprint).
+        `task_gen` is the rule's task-write generation, bumped by every write
+        to its task records; fingerprint/snapshot are None when nothing is
+        stored. Backends without a store return {}: every rule is then
+        planned in full."""
+        return {}
+
+    def store_plan_snapshots(self, snapshots):
+        """Persist {rule.name: (fingerprint, snapshot)} computed by the planner.
+        A no-op for backends without a store."""
+
     def begin_invocation(self):
         """Start a new logical invocation: allocate a fresh run_seq so tasks
         committed from here share one stamp, distinct from earlier invocations.
@@ -11,31 +11,207 @@ transaction (`Sqlite3Backend.ingest_sidecars`) and deletes them.
 
 Sharded like the per-task logs (design_docs/per_task_logging.md), but
 self-cleaning: sidecars are deleted on ingest.
+
+Each rule's results directory carries a marker saying whether anything is
+new, so that ingest (run before every plan) does not list every shard of
+every rule: a writer creates `.pending` after each result; ingest claims it
+(renames it to `.claimed`) before scanning and leaves `.idle` once everything
+it found is committed. A directory that is `.idle` with no `.pending` is
+skipped without being listed (bar its packed logs, see below).
+
+Packed mode (`SidecarWriter(pack=...)`, SLURM `packed_results`) appends
+results to a few per-node log files under `<rule>/packed/` instead of
+creating one file per result: each record is written with a single O_APPEND
+write and framed as magic, payload length, crc32, JSON payload, so a torn or
+interleaved write is detected and skipped rather than misread. Ingest reads
+each log sequentially from the byte offset it last committed, and deletes a
+log once it is fully ingested and untouched for
+`Sqlite3Backend.PACKED_LOG_RETIRE_S` — checked on every ingest, whatever the
+marker says, since a log is usually still too young to retire when its last
+records are ingested.
 """
 import json
+import os
+import socket
+import struct
 import time
+import zlib
 from pathlib import Path
 
-from ..core.scope import io_hash as compute_io_hash
-from ..core.scope import uses_hash as compute_uses_hash
+from loguru import logger
+
 from .metadata_manager import MetadataManager
 
 RESULTS_ROOT = Path('.remake/tasks/results')
 
+PENDING_MARKER = '.pending'
+CLAIMED_MARKER = '.claimed'
+IDLE_MARKER = '.idle'
+
+PACKED_DIR = 'packed'
+# Never valid inside a JSON payload (json.dumps escapes control characters),
+# so a resync after a torn record cannot land mid-payload.
+PACKED_MAGIC = b'RMK\x01'
+_PACKED_HEADER = struct.Struct('>4sII')  # magic, payload length, payload crc32
+# Bytes read from a packed log at a time: ingest memory does not grow with
+# the size of the log.
+PACKED_READ_CHUNK = 1 << 20
+
 
 def task_result_path(rule_name, key):
     return RESULTS_ROOT / rule_name / key[:2] / f'{key[2:]}.json'
 
 
+def _touch(path):
+    # O_CREAT on an existing file changes nothing on disk: after the first
+    # result of a batch, every later mark is a plain lookup.
+    os.close(os.open(path, os.O_CREAT | os.O_WRONLY, 0o644))
+
+
+def mark_pending(rule_dir):
+    _touch(rule_dir / PENDING_MARKER)
+
+
+def claim_results(rule_dir):
+    """Might `rule_dir` hold results not yet ingested? Claims the pending
+    marker if there is one. False (nothing to scan) only when the last ingest
+    completed and nothing was written since; a claimed marker left by a
+    crashed or concurrent ingest, or a directory from before markers existed,
+    is scanned."""
+    try:
+        os.replace(rule_dir / PENDING_MARKER, rule_dir / CLAIMED_MARKER)
+        return True
+    except FileNotFoundError:
+        pass
+    if (rule_dir / CLAIMED_MARKER).exists():
+        return True
+    return not (rule_dir / IDLE_MARKER).exists() and rule_dir.is_dir()
+
+
+def release_results(rule_dir):
+    """Mark `rule_dir` fully ingested (after claim_results and a complete,
+    committed scan). A result written meanwhile re-created the pending
+    marker, so the next ingest still finds it."""
+    try:
+        os.replace(rule_dir / CLAIMED_MARKER, rule_dir / IDLE_MARKER)
+    except FileNotFoundError:
+        _touch(rule_dir / IDLE_MARKER)
+
+
+def iter_result_paths(rule_dir):
+    """Yield (key, path) for each sidecar under `rule_dir`, streamed one shard
+    directory at a time (never the whole listing at once)."""
+    with os.scandir(rule_dir) as shards:
+        shard_names = [entry.name for entry in shards
+                       if entry.is_dir() and entry.name != PACKED_DIR]
+    for shard in shard_names:
+        try:
+            with os.scandir(rule_dir / shard) as entries:
+                names = [entry.name for entry in entries if entry.name.endswith('.json')]
+        except FileNotFoundError:
+            continue
+        for name in names:
+            yield shard + name[:-len('.json')], rule_dir / shard / name
+
+
+def read_result(path):
+    """A sidecar's payload, or None if it is gone (another process ingested
+    it first) or unreadable."""
+    try:
+        return json.loads(path.read_text())
+    except FileNotFoundError:
+        return None
+    except json.JSONDecodeError:
+        logger.warning(f'Skipping unreadable sidecar: {path}')
+        return None
+
+
+def default_pack_name():
+    """One packed log per array job per node: O_APPEND is only atomic
+    between writers sharing a client, and a new submission never appends to
+    a log an earlier one may be retiring."""
+    return f'{os.environ.get("SLURM_ARRAY_JOB_ID", "local")}.{socket.gethostname()}'
+
+
+def pack_record(payload):
+    data = json.dumps(payload).encode()
+    return _PACKED_HEADER.pack(PACKED_MAGIC, len(data), zlib.crc32(data)) + data
+
+
+def iter_packed_logs(rule_dir):
+    packed = rule_dir / PACKED_DIR
+    if not packed.is_dir():
+        return []
+    return sorted(packed.glob('*.log'))
+
+
+def read_packed(path, offset=0, final=False):
+    """(payloads, end) for the complete records of a packed log from byte
+    `offset`: one sequential pass, read PACKED_READ_CHUNK bytes at a time.
+    `end` is the offset just past the last record consumed; an incomplete
+    record at the tail (still being written) is left for the next read unless
+    `final` (the log has no live writer), when it is skipped as torn. Corrupt
+    or torn records are skipped, with a warning, by resyncing at the next
+    magic."""
+    payloads = []
+    end = offset  # file offset of data[0]
+    data = b''
+    skipping = False  # mid-way through a corrupt run that spans chunks
+    eof = False
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        while not eof:
+            chunk = f.read(PACKED_READ_CHUNK)
+            eof = not chunk
+            data += chunk
+            pos = 0
+            while pos + _PACKED_HEADER.size <= len(data):
+                magic, length, crc = _PACKED_HEADER.unpack_from(data, pos)
+                start = pos + _PACKED_HEADER.size
+                stop = start + length
+                if magic == PACKED_MAGIC and stop <= len(data) and zlib.crc32(data[start:stop]) == crc:
+                    try:
+                        payloads.append(json.loads(data[start:stop]))
+                    except json.JSONDecodeError:
+                        logger.warning(f'Skipping unreadable record in {path} at byte {end + pos}')
+                    pos = stop
+                    skipping = False
+                    continue
+                resync = data.find(PACKED_MAGIC, pos + 1)
+                if magic == PACKED_MAGIC and stop > len(data) and resync == -1 and not (eof and final):
+                    break  # the rest is in the next chunk, or still being appended
+                if not skipping:
+                    logger.warning(f'Skipping torn record in {path} at byte {end + pos}')
+                if resync != -1:
+                    pos = resync
+                    skipping = False
+                elif eof:
+                    pos = len(data)
+                else:
+                    # Keep what could be the start of a magic split across chunks.
+                    pos = max(pos + 1, len(data) - len(PACKED_MAGIC) + 1)
+                    skipping = True
+            end += pos
+            data = data[pos:]
+    if final and data:
+        logger.warning(f'Skipping torn record in {path} at byte {end}')
+        end += len(data)
+    return payloads, end
+
+
 class SidecarWriter(MetadataManager):
     """Metadata backend for per-task array processes: records results as
-    sidecar files and opens no DB connection at all."""
+    sidecar files and opens no DB connection at all.
 
-    def __init__(self, run_seq=None):
+    `pack`: the name of a packed log to append results to (see
+    default_pack_name), or None for one JSON file per result."""
+
+    def __init__(self, run_seq=None, pack=None):
         # Assigned on the submit node and read from the job spec, so every
         # array element of one submission records the same run_seq regardless
         # of which compute node ran it (no node-clock dependence).
         self.run_seq = run_seq
+        self.pack = pack
 
     def ensure_rules(self, rules, remakefile=None):
         pass
@@ -47,25 +223,48 @@ class SidecarWriter(MetadataManager):
         return self.run_seq
 
     def update_task(self, task, status, exception='', resources=None):
-        path = task_result_path(task.rule.name, task.key)
-        path.parent.mkdir(parents=True, exist_ok=True)
         payload = {
             'status': status,
             'exception': exception,
             # Measured on the compute node; written to the DB at ingest.
             # Absent in pre-0.9 sidecars, which ingest as NULLs.
             'resources': resources or {},
-            'uses_hash': compute_uses_hash(task.rule.uses),
-            'io_hash': compute_io_hash(task.rule),
+            'uses_hash': task.rule.uses_hash,
+            'io_hash': task.rule.io_hash,
             # Run source as it exists on the compute node: ingest must record
             # what actually ran, not what the ingesting process has on disk
             # (design_docs/bugs/05_slurm_sidecar_run_code_not_recorded.md).
             'run_hash': task.rule.source['run'],
             'run_seq': self.run_seq,
+            # For key lookups (Sqlite3Backend.find_tasks_by_key); absent in
+            # older sidecars, which ingest with no stored kwargs.
+            'kwargs': task.kwargs,
             # Matches the format sqlite's datetime('now') stores (UTC).
             'timestamp': time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime()),
         }
+        if self.pack is not None:
+            self._append_packed(task, payload)
+            return
+        path = task_result_path(task.rule.name, task.key)
+        path.parent.mkdir(parents=True, exist_ok=True)
         # Write-then-rename so ingestion never reads a torn write.
         tmp = path.with_suffix('.json.tmp')
         tmp.write_text(json.dumps(payload))
         tmp.rename(path)
+        mark_pending(path.parent.parent)
+
+    def _append_packed(self, task, payload):
+        rule_dir = RESULTS_ROOT / task.rule.name
+        log = rule_dir / PACKED_DIR / f'{self.pack}.log'
+        log.parent.mkdir(parents=True, exist_ok=True)
+        record = pack_record({'key': task.key, **payload})
+        # One write() per record: with O_APPEND it lands whole or, on a
+        # failure part-way, as a torn record the reader skips.
+        fd = os.open(log, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            written = os.write(fd, record)
+        finally:
+            os.close(fd)
+        if written != len(record):
+            raise OSError(f'Short write to {log} ({written} of {len(record)} bytes)')
+        mark_pending(rule_dir)
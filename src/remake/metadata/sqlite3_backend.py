@@ -11,24 +11,38 @@ place by `_add_missing_columns`.
 import json
 import random
 import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import sha1
+from itertools import islice
 from pathlib import Path
-from time import perf_counter, sleep
+from time import perf_counter, sleep, time
 
 from loguru import logger
 
-from ..core.scope import io_hash as compute_io_hash
 from ..core.scope import raw_uses_parts
-from ..core.scope import uses_hash as compute_uses_hash
-from ..util.code_compare import CodeComparer
-from .metadata_manager import MetadataManager, TaskRecord
+from ..core.task import TaskBatch, task_keys
+from ..util.code_compare import ast_digest
+from ..util.profile import phase
+from ..util.profile import record as profile_add
+from .metadata_manager import TASK_STATUS_SUCCESS, MetadataManager, TaskRecord
 
 SQL_SCHEMA = """
+-- digest: sha1 hex of `code`, so interning is an index probe rather than a
+-- comparison against every stored text. NULL only on rows that duplicate an
+-- earlier row's content (left by historic inserts; see _add_code_digests).
+-- ast_digest: util.code_compare.ast_digest of `code`, computed once at
+-- insert, so "changed only cosmetically?" is digest equality, not a parse.
+-- NULL only on rows written by versions predating it after the backfill.
 CREATE TABLE code (
     id INTEGER NOT NULL,
     code TEXT NOT NULL,
+    digest VARCHAR(40),
+    ast_digest VARCHAR(40),
     PRIMARY KEY (id)
 );
 
+CREATE UNIQUE INDEX code_digest_index ON code(digest);
+
 CREATE TABLE rule (
     id INTEGER NOT NULL,
     name VARCHAR(200) NOT NULL,
@@ -41,6 +55,10 @@ CREATE TABLE rule (
     -- rule with different code last written by a *different* remakefile is a
     -- collision, not an edit. NULL = unknown (programmatic use / pre-upgrade).
     remakefile TEXT,
+    -- Task-write generation: bumped by every write to this rule's task
+    -- records (run, ingest, set-state). Part of the plan-snapshot
+    -- fingerprint, so any change to the rule's recorded state invalidates it.
+    task_gen INTEGER NOT NULL DEFAULT 0,
     PRIMARY KEY (id),
     FOREIGN KEY(inputs_code_id) REFERENCES code (id),
     FOREIGN KEY(outputs_code_id) REFERENCES code (id),
@@ -60,6 +78,10 @@ CREATE TABLE task (
     uses_code_id INTEGER,
     io_code_id INTEGER,
     run_seq INTEGER,
+    -- The task's kwargs as JSON: with rule_id, enough to rebuild the Task
+    -- from a key (find_tasks_by_key) without scanning matrices. NULL for
+    -- pre-upgrade records until they are next written.
+    kwargs TEXT,
     last_run_timestamp TIMESTAMP,
     last_run_status INTEGER,
     exception TEXT,
@@ -82,6 +104,8 @@ CREATE TABLE task (
     FOREIGN KEY(io_code_id) REFERENCES code (id)
 );
 
+-- Also serves key-prefix lookups: keys are lowercase hex, so a prefix p is
+-- the range [p, p + 'g').
 CREATE UNIQUE INDEX task_key_index ON task(key);
 
 -- Per-helper raw source for a `uses` version, for display (readable diffs in
@@ -101,6 +125,26 @@ CREATE TABLE uses_manifest (
     FOREIGN KEY(code_id) REFERENCES code (id)
 );
 
+-- The planner's per-rule result, reused while the rule's fingerprint (matrix,
+-- current code, task_gen, upstream fingerprints — planner._plan_fingerprint)
+-- is unchanged. snapshot: JSON {'rerun': [kwargs, ...], 'counts': [[status,
+-- rerun, n], ...]}. A cache: deleting rows only costs one full plan.
+CREATE TABLE plan_snapshot (
+    rule_id INTEGER NOT NULL,
+    fingerprint VARCHAR(40) NOT NULL,
+    snapshot TEXT NOT NULL,
+    PRIMARY KEY (rule_id),
+    FOREIGN KEY(rule_id) REFERENCES rule (id)
+);
+
+-- Packed sidecar logs (sidecar.py, packed mode): how far each log has been
+-- ingested, committed in the same transaction as the records it covers.
+CREATE TABLE sidecar_log (
+    path TEXT NOT NULL,
+    ingested_bytes INTEGER NOT NULL,
+    PRIMARY KEY (path)
+);
+
 -- Key/value store. run_seq: a monotonic counter, one value allocated per
 -- `remake run`/`set-state` invocation, stamped onto every task that
 -- invocation commits. The planner reruns a task when an upstream's stamp is
@@ -129,16 +173,24 @@ def retry_lock_commit(fn):
                 return ret
             except sqlite3.OperationalError as oe:
                 logger.debug(f'OperationalError: {oe}')
+                self._rolled_back()
+            except BaseException:
+                self._rolled_back()
+                raise
             nattempts += 1
             sleep(2**nattempts * random.random())
 
     return inner
 
 
+def code_digest(code):
+    """The `code.digest` of a text."""
+    return sha1(code.encode()).hexdigest()
+
+
 class Sqlite3Backend(MetadataManager):
     def __init__(self, dbloc='.remake/remake.db'):
         self.dbloc = str(dbloc)
-        self.code_comparer = CodeComparer()
         in_memory = self.dbloc == ':memory:'
         create_db = in_memory or not Path(self.dbloc).exists()
         if create_db and not in_memory:
@@ -147,6 +199,11 @@ class Sqlite3Backend(MetadataManager):
         # No detect_types: timestamps are read as plain strings (TaskRecord
         # .timestamp), and the implicit converter is deprecated in 3.12.
         self.conn = sqlite3.connect(self.dbloc)
+        # code text -> code.id, for every text interned by this backend. Ids
+        # are content-addressed and code rows are never deleted, so entries
+        # stay valid across transactions; only a rolled-back insert has to be
+        # forgotten (_rolled_back).
+        self._code_ids = {}
         if create_db:
             self.conn.executescript(SQL_SCHEMA)
         else:
@@ -181,6 +238,11 @@ class Sqlite3Backend(MetadataManager):
             except Exception:
                 pass
 
+    def _rolled_back(self):
+        """The current transaction was rolled back: ids interned in it may not
+        exist. Rare (lock contention, errors), so drop the whole memo."""
+        self._code_ids.clear()
+
     def _add_missing_columns(self):
         """Lightweight forward-compat for columns added after a DB was first
         created (still no general migration support — see the module docstring).
@@ -193,6 +255,11 @@ class Sqlite3Backend(MetadataManager):
             self.conn.execute('ALTER TABLE task ADD COLUMN run_seq INTEGER')
         if 'uses_code_id' not in cols:
             self._migrate_inline_hashes_to_code_ids(cols)
+        if 'kwargs' not in cols:
+            # Not backfillable from the key; lookups fall back to a matrix
+            # scan for these records until they are rewritten.
+            logger.info('Adding task.kwargs column to existing DB')
+            self.conn.execute('ALTER TABLE task ADD COLUMN kwargs TEXT')
         # Resource-capture columns (0.9.0). Additive and nullable: an existing
         # DB gains NULLs and nothing reruns.
         for col, coltype in (('wall_s', 'REAL'), ('cpu_s', 'REAL'),
@@ -204,6 +271,10 @@ class Sqlite3Backend(MetadataManager):
         if 'remakefile' not in rule_cols:
             logger.info('Adding rule.remakefile column to existing DB')
             self.conn.execute('ALTER TABLE rule ADD COLUMN remakefile TEXT')
+        if 'task_gen' not in rule_cols:
+            logger.info('Adding rule.task_gen column to existing DB')
+            self.conn.execute(
+                'ALTER TABLE rule ADD COLUMN task_gen INTEGER NOT NULL DEFAULT 0')
         tables = {row[0] for row in self.conn.execute(
             "SELECT name FROM sqlite_master WHERE type='table'")}
         if 'uses_manifest' not in tables:
@@ -215,12 +286,61 @@ class Sqlite3Backend(MetadataManager):
                 '    uses_code_id INTEGER NOT NULL, name VARCHAR(200) NOT NULL, '
                 '    code_id INTEGER NOT NULL, kind VARCHAR(10) NOT NULL, '
                 '    PRIMARY KEY (uses_code_id, name))')
+        if 'plan_snapshot' not in tables:
+            logger.info('Adding plan_snapshot table to existing DB')
+            self.conn.execute(
+                'CREATE TABLE plan_snapshot ('
+                '    rule_id INTEGER NOT NULL PRIMARY KEY, '
+                '    fingerprint VARCHAR(40) NOT NULL, snapshot TEXT NOT NULL)')
+        if 'sidecar_log' not in tables:
+            logger.info('Adding sidecar_log table to existing DB')
+            self.conn.execute(
+                'CREATE TABLE sidecar_log ('
+                '    path TEXT NOT NULL PRIMARY KEY, ingested_bytes INTEGER NOT NULL)')
         if 'meta' not in tables:
             logger.info('Adding meta table to existing DB')
             self.conn.execute(
                 'CREATE TABLE meta (key TEXT NOT NULL PRIMARY KEY, value INTEGER NOT NULL)')
             self.conn.execute("INSERT INTO meta(key, value) VALUES ('run_seq', 0)")
             self.conn.commit()
+        # After the inline-hash migration, which interns into `code` by text.
+        code_cols = {row[1] for row in self.conn.execute('PRAGMA table_info(code)')}
+        if 'digest' not in code_cols:
+            self._add_code_digests()
+        if 'ast_digest' not in code_cols:
+            self._add_code_ast_digests()
+
+    def _add_code_digests(self):
+        """One-time in-place migration: add and backfill `code.digest` and its
+        unique index. Before it, interning compared the candidate text against
+        every stored text (no index on `code.code`), so each ensure_rules and
+        ingest slowed as code history grew. Rows duplicating an earlier row's
+        content keep a NULL digest: the lowest id stays canonical, as the old
+        `min(id)` lookup had it."""
+        logger.info('Adding code.digest column and index to existing DB')
+        self.conn.execute('ALTER TABLE code ADD COLUMN digest VARCHAR(40)')
+        seen = set()
+        updates = []
+        for code_id, code in self.conn.execute('SELECT id, code FROM code ORDER BY id'):
+            digest = code_digest(code)
+            if digest not in seen:
+                seen.add(digest)
+                updates.append((digest, code_id))
+        self.conn.executemany('UPDATE code SET digest = ? WHERE id = ?', updates)
+        self.conn.execute('CREATE UNIQUE INDEX code_digest_index ON code(digest)')
+        self.conn.commit()
+
+    def _add_code_ast_digests(self):
+        """One-time in-place migration: add and backfill `code.ast_digest`.
+        Parses every stored text once, so that no later finalize or plan
+        has to."""
+        logger.info('Adding code.ast_digest column to existing DB')
+        self.conn.execute('ALTER TABLE code ADD COLUMN ast_digest VARCHAR(40)')
+        self.conn.executemany(
+            'UPDATE code SET ast_digest = ? WHERE id = ?',
+            [(ast_digest(code), code_id)
+             for code_id, code in self.conn.execute('SELECT id, code FROM code')])
+        self.conn.commit()
 
     def _migrate_inline_hashes_to_code_ids(self, cols):
         """One-time in-place migration: the old task.uses_hash/io_hash columns
@@ -288,20 +408,47 @@ class Sqlite3Backend(MetadataManager):
             self._run_seq = self._allocate_run_seq()
         return self._run_seq
 
-    def _insert_code(self, code):
-        cur = self.conn.execute('INSERT INTO code(code) VALUES (?)', (code,))
-        return cur.lastrowid
+    def _find_code(self, code):
+        """The id of the row whose content is exactly `code`, or None."""
+        code_id = self._code_ids.get(code)
+        if code_id is not None:
+            return code_id
+        row = self.conn.execute(
+            'SELECT id FROM code WHERE digest = ?', (code_digest(code),)).fetchone()
+        if row is not None:
+            self._code_ids[code] = row[0]
+            return row[0]
+        return None
 
-    def _intern_code(self, code):
+    def _intern_code(self, code, code_ast_digest=None):
         """Find-or-insert: the id of the row whose content is exactly `code`.
         Content-addressing makes ids canonical — the same string always
-        resolves to the same id, so unchanged-ness is id equality. (min(id)
-        because historic inserts may have left duplicate content.)"""
-        (existing,) = self.conn.execute(
-            'SELECT min(id) FROM code WHERE code = ?', (code,)).fetchone()
-        if existing is not None:
-            return existing
-        return self._insert_code(code)
+        resolves to the same id, so unchanged-ness is id equality. Looked up
+        by digest (an index probe), and memoised per backend: ensure_rules,
+        the uses manifests and sidecar ingest intern the same few texts over
+        and over. A new row's ast_digest is computed here (pass it if already
+        known) — the only place code is parsed."""
+        code_id = self._find_code(code)
+        if code_id is not None:
+            return code_id
+        if code_ast_digest is None:
+            code_ast_digest = ast_digest(code)
+        code_id = self.conn.execute(
+            'INSERT INTO code(code, digest, ast_digest) VALUES (?, ?, ?)',
+            (code, code_digest(code), code_ast_digest)).lastrowid
+        self._code_ids[code] = code_id
+        return code_id
+
+    def get_code_digests(self, code_ids):
+        ids = sorted({cid for cid in code_ids if cid is not None})
+        digests = {}
+        for i in range(0, len(ids), self.SELECT_CHUNK):
+            chunk = ids[i:i + self.SELECT_CHUNK]
+            placeholders = ','.join('?' * len(chunk))
+            digests.update(self.conn.execute(
+                f'SELECT id, ast_digest FROM code WHERE id IN ({placeholders}) '
+                f'AND ast_digest IS NOT NULL', chunk))
+        return digests
 
     def _ensure_uses_manifest(self, uses_code_id, uses):
         """Record the per-helper raw sources behind a uses version, once.
@@ -338,8 +485,8 @@ class Sqlite3Backend(MetadataManager):
         # Current uses/io state, interned once per rule per invocation: tasks
         # committed this invocation point at these ids, and the planner
         # detects change by comparing a record's stored ids against them.
-        uses_code_id = self._intern_code(compute_uses_hash(rule.uses))
-        io_code_id = self._intern_code(compute_io_hash(rule))
+        uses_code_id = self._intern_code(rule.uses_hash)
+        io_code_id = self._intern_code(rule.io_hash)
         self._ensure_uses_manifest(uses_code_id, rule.uses)
         if row is None:
             code_ids = {part: self._intern_code(source[part]) for part in source}
@@ -356,14 +503,25 @@ class Sqlite3Backend(MetadataManager):
         rule_id, *code_id_list, stored_remakefile = row
         code_ids = dict(zip(['inputs', 'outputs', 'run'], code_id_list))
         changed = False
+        stored_digests = None
         for part in ['inputs', 'outputs', 'run']:
-            (stored,) = self.conn.execute(
-                'SELECT code FROM code WHERE id = ?', (code_ids[part],)
-            ).fetchone()
-            if not self.code_comparer(stored, source[part]):
+            # Unchanged text is found by digest: no parsing. A changed text
+            # is parsed once here, then compared by AST digest against the
+            # stored row's; a cosmetic edit keeps the stored id.
+            if self._find_code(source[part]) == code_ids[part]:
+                continue
+            if stored_digests is None:
+                stored_digests = self.get_code_digests(code_ids.values())
+            current = ast_digest(source[part])
+            stored = stored_digests.get(code_ids[part])
+            if stored is None:  # row written by a version predating ast_digest
+                (text,) = self.conn.execute(
+                    'SELECT code FROM code WHERE id = ?', (code_ids[part],)).fetchone()
+                stored = ast_digest(text)
+            if stored != current:
                 # Intern rather than blind-insert: reverting an edit maps back
                 # to the original row, so old task records compare equal again.
-                code_ids[part] = self._intern_code(source[part])
+                code_ids[part] = self._intern_code(source[part], current)
                 changed = True
         # Duplicate-rule-name guard: in a shared .remake/ store, a same-named
         # rule whose code differs and was last written by a *different* known
@@ -423,21 +581,38 @@ class Sqlite3Backend(MetadataManager):
         # ids; callers resolve the few distinct ones via get_codes.
         start = perf_counter()
         records = {}
-        keys = [task.key for task in tasks]
-        nchunks = (len(keys) + self.SELECT_CHUNK - 1) // self.SELECT_CHUNK
-        for i in range(0, len(keys), self.SELECT_CHUNK):
-            chunk = keys[i:i + self.SELECT_CHUNK]
-            placeholders = ','.join('?' * len(chunk))
-            rows = self.conn.execute(
-                'SELECT key, last_run_status, last_run_timestamp, '
-                '       run_code_id, uses_code_id, io_code_id, run_seq, exception, '
-                '       wall_s, cpu_s, max_rss_bytes, rss_method '
-                f'FROM task WHERE key IN ({placeholders})',
-                chunk,
-            ).fetchall()
+        keys = task_keys(tasks)
+        columns = (
+            'SELECT key, last_run_status, last_run_timestamp, '
+            '       run_code_id, uses_code_id, io_code_id, run_seq, exception, '
+            '       wall_s, cpu_s, max_rss_bytes, rss_method FROM task '
+        )
+        rule_id = self._batch_rule_id(tasks)
+        if rule_id is not None:
+            # A whole rule's worth of keys: one pass over the rule's rows
+            # beats ~len/900 IN-list lookups; rows outside the batch (a
+            # query-filtered batch, or stale tasks of an old matrix) are
+            # dropped below.
+            nchunks = 1
+            wanted = set(keys)
+            chunks = [self.conn.execute(
+                columns + 'WHERE rule_id = ?', (rule_id,)).fetchall()]
+        else:
+            nchunks = (len(keys) + self.SELECT_CHUNK - 1) // self.SELECT_CHUNK
+            wanted = None
+            chunks = (
+                self.conn.execute(
+                    columns + f'WHERE key IN ({",".join("?" * len(chunk))})', chunk,
+                ).fetchall()
+                for chunk in (keys[i:i + self.SELECT_CHUNK]
+                              for i in range(0, len(keys), self.SELECT_CHUNK))
+            )
+        for rows in chunks:
             for (key, status, timestamp, run_code_id, uses_code_id,
                  io_code_id, run_seq, exception,
                  wall_s, cpu_s, max_rss_bytes, rss_method) in rows:
+                if wanted is not None and key not in wanted:
+                    continue
                 records[key] = TaskRecord(
                     key=key,
                     status=status,
@@ -467,68 +642,170 @@ class Sqlite3Backend(MetadataManager):
             'queried status of {} task(s) in {} chunk(s), {} found, in {:.3f}s',
             len(keys), nchunks, len(records), elapsed,
         )
+        profile_add('status_query', elapsed, len(keys))
         return records
 
+    def get_resource_history(self, rule):
+        if rule.name in self.rule_ids:
+            rule_id = self.rule_ids[rule.name][0]
+        else:
+            row = self.conn.execute(
+                'SELECT id FROM rule WHERE name = ?', (rule.name,)).fetchone()
+            if row is None:
+                return []
+            rule_id = row[0]
+        return self.conn.execute(
+            'SELECT wall_s, max_rss_bytes FROM task '
+            'WHERE rule_id = ? AND last_run_status = ? '
+            '  AND (wall_s IS NOT NULL OR max_rss_bytes IS NOT NULL)',
+            (rule_id, TASK_STATUS_SUCCESS)).fetchall()
+
+    # Below this many keys a TaskBatch is looked up by key, like a task list.
+    RULE_SCAN_MIN_KEYS = 10 * SELECT_CHUNK
+
+    def _batch_rule_id(self, tasks):
+        """The rule id to scan for a large TaskBatch (all one rule's tasks),
+        or None to look keys up individually."""
+        if not isinstance(tasks, TaskBatch) or len(tasks) < self.RULE_SCAN_MIN_KEYS:
+            return None
+        ids = self.rule_ids.get(tasks.rule.name)
+        return ids[0] if ids is not None else None
+
     def get_codes(self, code_ids):
         ids = sorted({cid for cid in code_ids if cid is not None})
         codes = {}
-        for i in range(0, len(ids), self.SELECT_CHUNK):
-            chunk = ids[i:i + self.SELECT_CHUNK]
-            placeholders = ','.join('?' * len(chunk))
-            rows = self.conn.execute(
-                f'SELECT id, code FROM code WHERE id IN ({placeholders})', chunk)
-            codes.update(dict(rows))
+        with phase('code_fetch', len(ids)):
+            for i in range(0, len(ids), self.SELECT_CHUNK):
+                chunk = ids[i:i + self.SELECT_CHUNK]
+                placeholders = ','.join('?' * len(chunk))
+                rows = self.conn.execute(
+                    f'SELECT id, code FROM code WHERE id IN ({placeholders})', chunk)
+                codes.update(dict(rows))
         return codes
 
+    # Sidecars parsed and committed per transaction: bounds ingest memory,
+    # and the pool overlaps the per-file reads (each a metadata round-trip
+    # on NFS/Lustre).
+    INGEST_BATCH = 2000
+    INGEST_THREADS = 16
+    # A fully ingested packed log is deleted once no record has been appended
+    # for this long: its array job is done writing on that node.
+    PACKED_LOG_RETIRE_S = 3600
+
     def ingest_sidecars(self, rules):
         """Absorb pending sidecar results (written by run-array-task) into
-        the DB — one batched transaction for the lot, sidecars deleted
-        after commit. Cheap when there is nothing to ingest."""
-        from .sidecar import RESULTS_ROOT
+        the DB, streamed: up to INGEST_BATCH sidecars are read on a thread
+        pool, committed in one transaction and deleted, then the next batch.
+        A rule whose results directory is marked as fully ingested is not
+        listed at all (see sidecar.claim_results), so this is cheap when there
+        is nothing to ingest. Packed logs are read from their committed
+        offsets, and retired once old enough, in every rule directory that
+        has them (_ingest_packed)."""
+        from .sidecar import (
+            RESULTS_ROOT,
+            claim_results,
+            iter_result_paths,
+            read_result,
+            release_results,
+        )
 
         start = perf_counter()
-        pending = []
-        for rule in rules:
-            rule_dir = RESULTS_ROOT / rule.name
-            if not rule_dir.is_dir():
-                continue
-            for path in sorted(rule_dir.glob('*/*.json')):
-                key = path.parent.name + path.stem
-                try:
-                    payload = json.loads(path.read_text())
-                except FileNotFoundError:
-                    continue  # another process ingested it first
-                except json.JSONDecodeError:
-                    logger.warning(f'Skipping unreadable sidecar: {path}')
+        ningested = 0
+        pool = None
+        try:
+            for rule in rules:
+                rule_dir = RESULTS_ROOT / rule.name
+                if not claim_results(rule_dir):
+                    # Nothing new, but a packed log is usually still too
+                    # young to retire at its final ingest: check it anyway.
+                    ningested += self._ingest_packed(rule, rule_dir)
                     continue
-                logger.trace('sidecar {} ({}): {}', key, rule.name, payload.get('status'))
-                pending.append((rule, key, payload, path))
-        if not pending:
+                if pool is None:
+                    pool = ThreadPoolExecutor(max_workers=self.INGEST_THREADS)
+                paths = iter_result_paths(rule_dir)
+                while batch := list(islice(paths, self.INGEST_BATCH)):
+                    payloads = pool.map(read_result, [path for _, path in batch])
+                    pending = []
+                    for (key, path), payload in zip(batch, payloads):
+                        if payload is None:
+                            continue
+                        logger.trace('sidecar {} ({}): {}', key, rule.name, payload.get('status'))
+                        pending.append((rule, key, payload, path))
+                    if not pending:
+                        continue
+                    self._ingest_records(pending)
+                    # Delete only after a successful commit; double ingestion
+                    # of a sidecar that survives a crash here is harmless
+                    # (upsert), and the claim is only released below.
+                    for *_, path in pending:
+                        path.unlink(missing_ok=True)
+                    ningested += len(pending)
+                ningested += self._ingest_packed(rule, rule_dir)
+                release_results(rule_dir)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        elapsed = perf_counter() - start
+        profile_add('ingest', elapsed, ningested)
+        if not ningested:
             return 0
 
-        self._ingest_records(pending)
-        # Delete only after a successful commit; double ingestion of a
-        # sidecar that survives a crash here is harmless (upsert).
-        for *_, path in pending:
-            path.unlink(missing_ok=True)
-        elapsed = perf_counter() - start
         logger.bind(
-            event='ingest', ningested=len(pending), seconds=round(elapsed, 6),
-        ).debug(f'Ingested {len(pending)} sidecar result(s) in {elapsed:.3f}s')
-        return len(pending)
+            event='ingest', ningested=ningested, seconds=round(elapsed, 6),
+        ).debug(f'Ingested {ningested} sidecar result(s) in {elapsed:.3f}s')
+        return ningested
 
-    @retry_lock_commit
-    def _ingest_records(self, pending):
-        # Sidecars carry the uses/io strings as text (the compute node has no
-        # DB to intern into); intern here, memoised — a batch's payloads are
-        # near-always identical within a rule.
-        intern_memo = {}
+    def _ingest_packed(self, rule, rule_dir):
+        from .sidecar import iter_packed_logs, read_packed
+
+        logs = iter_packed_logs(rule_dir)
+        if not logs:
+            return 0
+        offsets = dict(self.conn.execute('SELECT path, ingested_bytes FROM sidecar_log'))
+        ningested = 0
+        for log in logs:
+            offset = offsets.get(str(log), 0)
+            try:
+                # Untouched for the retire age: no writer is left to finish
+                # an incomplete tail record, so it is torn.
+                old = time() - log.stat().st_mtime > self.PACKED_LOG_RETIRE_S
+                payloads, end = read_packed(log, offset, final=old)
+            except FileNotFoundError:
+                continue
+            pending = []
+            for payload in payloads:
+                logger.trace('packed {} ({}): {}', payload['key'], rule.name, payload.get('status'))
+                pending.append((rule, payload['key'], payload, None))
+            # Earlier batches commit without the offset (a crash re-ingests
+            # them: harmless upserts); the last one commits it.
+            for i in range(0, len(pending), self.INGEST_BATCH):
+                batch = pending[i:i + self.INGEST_BATCH]
+                last = i + self.INGEST_BATCH >= len(pending)
+                self._ingest_records(batch, (str(log), end) if last else None)
+            if not pending and end != offset:
+                self._ingest_records([], (str(log), end))  # skipped torn records
+            ningested += len(pending)
+            try:
+                stat = log.stat()
+            except FileNotFoundError:
+                continue
+            if stat.st_size == end and time() - stat.st_mtime > self.PACKED_LOG_RETIRE_S:
+                # Forget the offset first: a log re-created under this name
+                # must be read from its start.
+                self._retire_packed_log(str(log))
+                log.unlink(missing_ok=True)
+        return ningested
 
-        def intern(text):
-            if text not in intern_memo:
-                intern_memo[text] = self._intern_code(text)
-            return intern_memo[text]
+    @retry_lock_commit
+    def _retire_packed_log(self, path):
+        self.conn.execute('DELETE FROM sidecar_log WHERE path = ?', (path,))
 
+    @retry_lock_commit
+    def _ingest_records(self, pending, log_offset=None):
+        # Sidecars carry the uses/io strings as text (the compute node has no
+        # DB to intern into); intern here — a batch's payloads are near-always
+        # identical within a rule, so all but the first are memo hits.
+        intern = self._intern_code
         for rule, key, payload, _ in pending:
             rule_id, run_code_id, _, cur_io_code_id = self.rule_ids[rule.name]
             io_text = payload.get('io_hash')
@@ -538,11 +815,12 @@ class Sqlite3Backend(MetadataManager):
             res = payload.get('resources') or {}
             self.conn.execute(
                 'INSERT INTO task(key, rule_id, run_code_id, uses_code_id, io_code_id, '
-                '                 run_seq, last_run_timestamp, last_run_status, exception, '
-                '                 wall_s, cpu_s, max_rss_bytes, rss_method) '
-                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) '
+                '                 run_seq, kwargs, last_run_timestamp, last_run_status, '
+                '                 exception, wall_s, cpu_s, max_rss_bytes, rss_method) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) '
                 'ON CONFLICT(key) DO UPDATE SET '
                 '    run_code_id = excluded.run_code_id, '
+                '    kwargs = COALESCE(excluded.kwargs, task.kwargs), '
                 '    uses_code_id = excluded.uses_code_id, '
                 '    io_code_id = excluded.io_code_id, '
                 '    run_seq = excluded.run_seq, '
@@ -563,12 +841,13 @@ class Sqlite3Backend(MetadataManager):
                     intern(run_text) if run_text else run_code_id,
                     intern(payload.get('uses_hash', '')),
                     # Pre-io_hash sidecar: fall back to the rule's current io
-                    # state (was compute_io_hash(rule), interned at ensure).
+                    # state (was rule.io_hash, interned at ensure).
                     intern(io_text) if io_text else cur_io_code_id,
                     # run_seq is allocated on the submit node and threaded
                     # through the job spec into the sidecar, so all array
                     # elements of one submission share it regardless of node.
                     payload.get('run_seq'),
+                    json.dumps(payload['kwargs']) if 'kwargs' in payload else None,
                     payload.get('timestamp'),
                     payload['status'],
                     payload.get('exception', ''),
@@ -578,6 +857,12 @@ class Sqlite3Backend(MetadataManager):
                     res.get('rss_method'),
                 ),
             )
+        self._bump_task_gen({rule.name for rule, *_ in pending})
+        if log_offset is not None:
+            self.conn.execute(
+                'INSERT INTO sidecar_log(path, ingested_bytes) VALUES (?, ?) '
+                'ON CONFLICT(path) DO UPDATE SET ingested_bytes = excluded.ingested_bytes',
+                log_offset)
 
     def update_task(self, task, status, exception='', resources=None):
         # Allocate run_seq (own txn) before opening the upsert's EXCLUSIVE txn.
@@ -593,6 +878,7 @@ class Sqlite3Backend(MetadataManager):
         # set-state, migration adoption).
         for task in tasks:
             self._upsert_task(task, status, exception, run_seq, resources)
+        self._bump_task_gen({task.rule.name for task in tasks})
 
     @retry_lock_commit
     def delete_tasks(self, tasks):
@@ -601,11 +887,66 @@ class Sqlite3Backend(MetadataManager):
             chunk = keys[i:i + self.SELECT_CHUNK]
             placeholders = ','.join('?' * len(chunk))
             self.conn.execute(f'DELETE FROM task WHERE key IN ({placeholders})', chunk)
+        self._bump_task_gen({task.rule.name for task in tasks})
+
+    def _bump_task_gen(self, rule_names):
+        # Inside the caller's transaction: the records and the generation that
+        # invalidates any plan snapshot built from the old records commit
+        # together. Once per rule per write batch, not per task.
+        for name in sorted(rule_names):
+            self.conn.execute(
+                'UPDATE rule SET task_gen = task_gen + 1 WHERE name = ?', (name,))
+
+    def find_tasks_by_key(self, key, limit=2):
+        # A range scan of the unique key index: keys are lowercase hex, so
+        # every key starting with `key` sorts in [key, key + 'g').
+        rows = self.conn.execute(
+            'SELECT task.key, rule.name, task.kwargs '
+            'FROM task JOIN rule ON rule.id = task.rule_id '
+            'WHERE task.key >= ? AND task.key < ? ORDER BY task.key LIMIT ?',
+            (key, key + 'g', limit),
+        )
+        return [
+            (task_key, rule_name, json.loads(kwargs) if kwargs is not None else None)
+            for task_key, rule_name, kwargs in rows
+        ]
+
+    def get_plan_snapshots(self, rules):
+        names = [rule.name for rule in rules]
+        snapshots = {}
+        for i in range(0, len(names), self.SELECT_CHUNK):
+            chunk = names[i:i + self.SELECT_CHUNK]
+            placeholders = ','.join('?' * len(chunk))
+            rows = self.conn.execute(
+                'SELECT rule.name, rule.task_gen, plan_snapshot.fingerprint, '
+                '       plan_snapshot.snapshot '
+                'FROM rule LEFT JOIN plan_snapshot ON plan_snapshot.rule_id = rule.id '
+                f'WHERE rule.name IN ({placeholders})',
+                chunk,
+            )
+            for name, task_gen, fingerprint, snapshot in rows:
+                snapshots[name] = (
+                    task_gen, fingerprint,
+                    json.loads(snapshot) if snapshot is not None else None,
+                )
+        return snapshots
+
+    @retry_lock_commit
+    def store_plan_snapshots(self, snapshots):
+        for name, (fingerprint, snapshot) in snapshots.items():
+            self.conn.execute(
+                'INSERT INTO plan_snapshot(rule_id, fingerprint, snapshot) '
+                'SELECT id, ?, ? FROM rule WHERE name = ? '
+                'ON CONFLICT(rule_id) DO UPDATE SET '
+                '    fingerprint = excluded.fingerprint, '
+                '    snapshot = excluded.snapshot',
+                (fingerprint, json.dumps(snapshot), name),
+            )
 
     def _upsert_task(self, task, status, exception='', run_seq=None, resources=None):
         # The uses/io ids were computed and interned once per rule at
         # ensure_rules time — no per-task hashing or text writes (the old
-        # per-task compute_uses_hash was 1e6 AST renders on a big run).
+        # per-task uses_hash was 1e6 AST renders on a big run).
         rule_id, run_code_id, uses_code_id, io_code_id = self.rule_ids[task.rule.name]
         res = resources or {}
         # An execution replaces all four resource columns verbatim, NULLs
@@ -621,11 +962,12 @@ class Sqlite3Backend(MetadataManager):
         ) if resources is not None else ''
         self.conn.execute(
             'INSERT INTO task(key, rule_id, run_code_id, uses_code_id, io_code_id, '
-            '                 run_seq, last_run_timestamp, last_run_status, exception, '
-            '                 wall_s, cpu_s, max_rss_bytes, rss_method) '
-            "VALUES (?, ?, ?, ?, ?, ?, datetime('now'), ?, ?, ?, ?, ?, ?) "
+            '                 run_seq, kwargs, last_run_timestamp, last_run_status, '
+            '                 exception, wall_s, cpu_s, max_rss_bytes, rss_method) '
+            "VALUES (?, ?, ?, ?, ?, ?, ?, datetime('now'), ?, ?, ?, ?, ?, ?) "
             'ON CONFLICT(key) DO UPDATE SET '
             '    run_code_id = excluded.run_code_id, '
+            '    kwargs = excluded.kwargs, '
             '    uses_code_id = excluded.uses_code_id, '
             '    io_code_id = excluded.io_code_id, '
             '    run_seq = excluded.run_seq, '
@@ -640,6 +982,7 @@ class Sqlite3Backend(MetadataManager):
                 uses_code_id,
                 io_code_id,
                 run_seq,
+                json.dumps(task.kwargs),
                 status,
                 exception,
                 res.get('wall_s'),
@@ -14,6 +14,7 @@ from pathlib import Path
 from loguru import logger
 
 from .core import RemakeError
+from .core.tokens import listing_cache
 from .loader import load_remake
 from .util import (
     Arg,
@@ -24,9 +25,10 @@ from .util import (
 )
 from .version import __version__
 
-# Heavy/optional imports (networkx, the executor stack, squeue) stay local to
-# the methods that need them so `remake version`/`task-log` don't pay to import
+# Heavy/optional imports (the executor stack, squeue) stay local to the
+# methods that need them so `remake version`/`task-log` don't pay to import
 # them; cheap stdlib (json, ...) is hoisted where it is used widely.
+# tests/unit/test_imports.py holds the start-up path to this.
 
 _TB_FRAME = re.compile(r'  File "(.+?)", line (\d+), in (.+)')
 
@@ -100,7 +102,7 @@ def _add_task_log_sink(task):
     unlike the shared log."""
     logfile = _task_log_path(task)
     logfile.parent.mkdir(parents=True, exist_ok=True)
-    logger.add(logfile, level='DEBUG', mode='w')
+    return logger.add(logfile, level='DEBUG', mode='w')
 
 
 def _make_executor(name, rmk, nproc=None):
@@ -109,17 +111,23 @@ def _make_executor(name, rmk, nproc=None):
     import importlib
 
     from .executors import (
+        AsyncioExecutor,
         DaskExecutor,
         Executor,
         MultiprocExecutor,
         SingleprocExecutor,
         SlurmExecutor,
+        ThreadExecutor,
     )
 
     if name == 'multiproc':
         return MultiprocExecutor(rmk, nproc=nproc)
     if name == 'dask':
         return DaskExecutor(rmk, nproc=nproc)
+    if name == 'threads':
+        return ThreadExecutor(rmk, nproc=nproc)
+    if name == 'asyncio':
+        return AsyncioExecutor(rmk, concurrency=nproc)
     builtin = {'singleproc': SingleprocExecutor, 'slurm': SlurmExecutor}
     if name in builtin:
         return builtin[name](rmk)
@@ -131,7 +139,7 @@ def _make_executor(name, rmk, nproc=None):
     else:
         raise RemakeError(
             f'Unknown executor {name!r}: use one of '
-            f"{sorted([*builtin, 'multiproc', 'dask'])} or a "
+            f"{sorted([*builtin, 'multiproc', 'dask', 'threads', 'asyncio'])} or a "
             f'dotted path like mymodule:MyExecutor'
         )
     cls = getattr(importlib.import_module(module_name), cls_name)
@@ -179,11 +187,12 @@ class RemakeCLI:
             'args': [
                 Arg('remakefile'),
                 Arg('--executor', '-E', default='singleproc',
-                    help='singleproc, multiproc, slurm, or dotted path to an '
-                         'Executor subclass (mymodule:MyExecutor)'),
+                    help='singleproc, multiproc, threads, asyncio, slurm, or '
+                         'dotted path to an Executor subclass (mymodule:MyExecutor)'),
                 Arg('--nproc', '-j', type=int,
                     help='Worker processes for the multiproc executor '
-                         '(default: all cores)'),
+                         '(default: all cores), threads for threads, '
+                         'concurrent tasks for asyncio'),
                 Arg('--query', '-Q', help='Filter tasks based on a kwargs query'),
                 Arg('--force', '-f', help='Force rerun of matched tasks', action='store_true'),
                 Arg('--ignore-code-changes',
@@ -221,6 +230,12 @@ class RemakeCLI:
                 Arg('--specs', default=None,
                     help="Job-spec file to read (defaults to the rule's "
                          'last submission)'),
+                Arg('--packed', action='store_true',
+                    help="Append the result to this node's packed log instead "
+                         'of writing a sidecar file'),
+                Arg('--bundled', action='store_true',
+                    help='INDEX is an array element: run every task bundled '
+                         'into it, recording a result per task'),
             ],
         },
         'resubmit': {
@@ -274,6 +289,31 @@ class RemakeCLI:
                 Arg('--json', help='Machine-readable output', action='store_true'),
             ],
         },
+        'profile-plan': {
+            'help': 'Plan once and report where the time went, per rule and phase',
+            'args': [
+                Arg('remakefile'),
+                Arg('--query', '-Q', help='Filter tasks based on a kwargs query'),
+                Arg('--json', help='Machine-readable output', action='store_true'),
+            ],
+        },
+        'estimate': {
+            'help': 'Estimate makespan, critical path and per-rule utilisation '
+                    'from recorded task durations',
+            'args': [
+                Arg('remakefile'),
+                Arg('--executor', '-E', default='multiproc',
+                    help='Execution model: singleproc, multiproc, dask or slurm'),
+                Arg('--nproc', '-j', type=int,
+                    help='Workers (multiproc/dask; default as for run), or the '
+                         'most array elements running at once (slurm; default '
+                         'unlimited)'),
+                Arg('--query', '-Q', help='Filter tasks based on a kwargs query'),
+                Arg('--force', '-f', help='Estimate a forced rerun of matched tasks',
+                    action='store_true'),
+                Arg('--json', help='Machine-readable output', action='store_true'),
+            ],
+        },
         'ls-tasks': {
             'help': 'List tasks (key prefix + name), materialising the matrices',
             'args': [
@@ -284,8 +324,8 @@ class RemakeCLI:
                 Arg('--outputs', '-o', action='store_true',
                     help='Show each task\'s output files (indented under it)'),
                 Arg('--check', action='store_true',
-                    help='With -i/-o, stat each file and mark exists/complete '
-                         '(one stat per file — slow for large selections)'),
+                    help='With -i/-o, check each file and mark exists/complete '
+                         "(a rule's files are checked in one batched pass)"),
                 Arg('--json', help='Machine-readable output (full keys)', action='store_true'),
             ],
         },
@@ -384,7 +424,9 @@ class RemakeCLI:
     def dispatch(self):
         args = self.args
         method_name = 'remake_' + args.subcmd_name.replace('-', '_')
-        return getattr(self, method_name)(args)
+        # One command, one invocation: output checks share directory listings.
+        with listing_cache():
+            return getattr(self, method_name)(args)
 
     def _load(self, args):
         rmk = load_remake(args.remakefile)
@@ -422,6 +464,11 @@ class RemakeCLI:
                 for task in runnable:
                     print(task)
                 print(f'{len(runnable)} task(s) would run')
+                predicted = executor.predict_makespan(runnable)
+                if predicted is not None:
+                    makespan, path = predicted
+                    print(f'predicted makespan {makespan:.1f}s on {executor.nproc} '
+                          f'proc(s) (critical path {path:.1f}s)')
                 for rule in deferred:
                     print(f'{rule.name}: deferred (matrix not ready)')
                 return
@@ -447,46 +494,82 @@ class RemakeCLI:
             rmk.run_task(task)
 
     def remake_run_array_task(self, args):
-        from .executors.slurm_executor import submitted_spec_path
-        from .metadata.sidecar import SidecarWriter
+        from .metadata.sidecar import SidecarWriter, default_pack_name
         from .util.resources import one_task_per_process
 
         # Hundreds of concurrent array elements must not touch the shared
         # SQLite DB (livelock on shared filesystems): load without
         # finalizing (no ensure_rules, no DB connection) and record the
         # result as a sidecar file, ingested by the next plan/info.
-        rmk = load_remake(args.remakefile, finalize=False)
+        # Only this rule is validated and scope-checked as the file loads:
+        # the submitting `remake run` checked them all.
+        rmk = load_remake(args.remakefile, finalize=False, checked_rules=[args.rule])
         # Generated sbatch scripts pin their submission's spec file via
         # --specs; the fallback (manual retries, in-flight jobs submitted by
         # pre-0.9 scripts) must resolve the last SUBMITTED spec — a dry run
         # writes a newer spec file that no job is running.
-        specs_path = Path(args.specs) if args.specs else submitted_spec_path(args.rule)
+        if args.specs:
+            specs_path = Path(args.specs)
+        else:
+            from .executors.slurm_executor import submitted_spec_path
+
+            specs_path = submitted_spec_path(args.rule)
         if specs_path is None or not specs_path.exists():
             raise RemakeError(
                 f'No job specs for rule {args.rule} — generate them with: '
                 f'remake run {args.remakefile} --executor slurm'
             )
         specs = json.loads(specs_path.read_text())
-        spec = specs[args.index]
+        if args.bundled:
+            specs = [spec for spec in specs if spec.get('element') == args.index]
+            if not specs:
+                raise RemakeError(f'{args.rule}: no tasks bundled into element {args.index}')
+        else:
+            specs = [specs[args.index]]
         # run_seq was fixed at submission; carry it into the sidecar so its
         # stamp matches the rest of this submission's tasks (older job specs
         # without the field fall back to None — durable check just won't fire).
-        rmk.metadata = SidecarWriter(run_seq=spec.get('run_seq'))
-        task = rmk.task_from_spec(spec['rule'], spec['kwargs'])
-        if task.key != spec['task_key']:
-            # Kwargs didn't survive the JSON round-trip (should have been
-            # caught at spec-write time): running would record the result
-            # under a key the planner never reads — pending forever.
-            raise RemakeError(
-                f'{args.rule}[{args.index}]: rebuilt task key {task.key} != '
-                f'submitted key {spec["task_key"]} — kwargs changed in the '
-                f'JSON round-trip through {specs_path}'
-            )
-        _add_task_log_sink(task)
-        logger.info(f'Running {task}')
-        # As run-task: one array element = one task = one process.
-        with one_task_per_process():
-            rmk.run_task(task)
+        rmk.metadata = SidecarWriter(
+            run_seq=specs[0].get('run_seq'),
+            pack=default_pack_name() if args.packed else None,
+        )
+        tasks = []
+        for spec in specs:
+            task = rmk.task_from_spec(spec['rule'], spec['kwargs'])
+            if task.key != spec['task_key']:
+                # Kwargs didn't survive the JSON round-trip (should have been
+                # caught at spec-write time): running would record the result
+                # under a key the planner never reads — pending forever.
+                raise RemakeError(
+                    f'{args.rule}[{args.index}]: rebuilt task key {task.key} != '
+                    f'submitted key {spec["task_key"]} — kwargs changed in the '
+                    f'JSON round-trip through {specs_path}'
+                )
+            tasks.append(task)
+        if not args.bundled:
+            (task,) = tasks
+            _add_task_log_sink(task)
+            logger.info(f'Running {task}')
+            # As run-task: one array element = one task = one process.
+            with one_task_per_process():
+                rmk.run_task(task)
+            return
+        # A bundle: each task logs to its own file and records its own
+        # result; a failure does not stop the rest, but fails the element
+        # (so afterok dependents don't start on missing outputs).
+        nfailed = 0
+        for task in tasks:
+            sink_id = _add_task_log_sink(task)
+            logger.info(f'Running {task}')
+            try:
+                rmk.run_task(task)
+            except Exception:
+                nfailed += 1  # recorded (sidecar + log) by run_task
+            finally:
+                logger.remove(sink_id)
+        if nfailed:
+            logger.error(f'{nfailed}/{len(tasks)} bundled task(s) failed')
+            return 1
 
     def remake_resubmit(self, args):
         import subprocess as sp
@@ -634,52 +717,141 @@ class RemakeCLI:
                     more = f' (+{len(others) - 5} more)' if len(others) > 5 else ''
                     print(f'+ {len(others)} more:\n{shown}{more}')
 
+    def remake_profile_plan(self, args):
+        rmk = self._load(args)
+        runnable, deferred, profile = rmk.profile_plan(query=args.query)
+        rows = profile.rows()
+        if args.json:
+            print(json.dumps({
+                'seconds': round(profile.seconds, 6),
+                'nrunnable': len(runnable),
+                'ndeferred': len(deferred),
+                'phases': rows,
+                'phase_totals': {k: round(v, 6) for k, v in profile.phase_totals().items()},
+            }, indent=1))
+            return
+
+        paint = Painter(args.colour)
+        header = ('rule', 'phase', 'seconds', 'calls', 'items')
+        table = [
+            (r['rule'] or '-', r['phase'], f'{r["seconds"]:.4f}', r['calls'], r['items'])
+            for r in rows
+        ]
+        widths = [max(len(str(r[i])) for r in table + [header]) for i in range(len(header))]
+        print('  '.join(f'{str(v):<{w}}' for v, w in zip(header, widths)))
+        for row in table:
+            print('  '.join(f'{str(v):<{w}}' for v, w in zip(row, widths)))
+        print()
+        for name, seconds in profile.phase_totals().items():
+            print(f'{name:<{widths[1]}}  {seconds:.4f}s')
+        print(paint(f'plan: {len(runnable)} runnable, {len(deferred)} deferred in '
+                    f'{profile.seconds:.3f}s', 'bold'))
+
+    def remake_estimate(self, args):
+        rmk = self._load(args)
+        est = rmk.estimate(executor=args.executor, nproc=args.nproc,
+                           query=args.query, force=args.force)
+        if args.json:
+            print(json.dumps(est.to_dict(), indent=1))
+            return
+
+        paint = Painter(args.colour)
+        slots = f'{est.nslots} worker(s)' if est.nslots else 'unlimited workers'
+        print(f'{est.model} on {slots}: {est.ntasks} task(s), '
+              f'{est.nmeasured} with recorded durations')
+        if est.ntasks and not est.nmeasured:
+            print(paint('nothing measured yet: every task counted as 1s', 'yellow'))
+        header = ('rule', 'tasks', 'elements', 'work_s', 'start_s', 'end_s', 'slots', 'util')
+        table = [
+            (r['rule'], r['tasks'], r['elements'], f'{r["work_s"]:.1f}',
+             f'{r["start_s"]:.1f}', f'{r["end_s"]:.1f}', r['slots'] or '-',
+             '-' if r['utilisation'] is None else f'{r["utilisation"]:.0%}')
+            for r in est.rules
+        ]
+        if table:
+            widths = [max(len(str(r[i])) for r in table + [header]) for i in range(len(header))]
+            for row in [header, *table]:
+                print('  '.join(f'{str(v):<{w}}' for v, w in zip(row, widths)).rstrip())
+            print()
+            print('critical path:')
+            for step in est.path:
+                kwargs = ', '.join(f'{k}={v}' for k, v in step['kwargs'].items())
+                bundle = f' (+{step["ntasks"] - 1} bundled)' if step['ntasks'] > 1 else ''
+                print(f'  {step["rule"]}({kwargs}){bundle}  {step["seconds"]:.1f}s')
+        for name in est.deferred:
+            print(f'{name}: deferred (matrix not ready), not estimated')
+        print(paint(f'makespan {est.makespan:.1f}s, critical path '
+                    f'{est.critical_path_s:.1f}s', 'bold'))
+
     def remake_ls_tasks(self, args):
         from .core.dag import iter_expand_rule
         from .core.exceptions import Defer
         from .core.planner import make_predicate
+        from .core.tokens import FileToken, check_complete
 
         rmk = self._load(args)
         rmk.finalize()
         predicate = make_predicate(args.query) if args.query else None
         paint = Painter(args.colour)
 
-        def input_files(task):
+        def input_files(task, checked):
             for name, value in task.inputs.items():
                 info = {'name': name, 'path': str(value)}
                 if args.check:
-                    info['exists'] = Path(value).exists()
+                    info['exists'] = checked[task.key, 'in', name]
                 yield info
 
-        def output_files(task):
+        def output_files(task, checked):
             for name, token in task.outputs.items():
                 info = {'name': name, 'path': str(token)}
                 if args.check:
-                    info['complete'] = token.is_complete()
+                    info['complete'] = checked[task.key, 'out', name]
                 yield info
 
+        def check_files(tasks):
+            # A rule's files are checked in one batched call (stats overlap on
+            # a thread pool, shared directories are listed once) rather than
+            # one stat per file as each line is printed.
+            where, tokens = [], []
+            for task in tasks:
+                if args.inputs:
+                    for name, value in task.inputs.items():
+                        where.append((task.key, 'in', name))
+                        tokens.append(FileToken(os.fspath(value)))
+                if args.outputs:
+                    for name, token in task.outputs.items():
+                        where.append((task.key, 'out', name))
+                        tokens.append(token)
+            return dict(zip(where, check_complete(tokens)))
+
         rows = []
         for rule in rmk.rules:
             try:
-                # Stream in text mode: constant memory however big the matrix.
-                for task in iter_expand_rule(rule, predicate):
+                # Stream in text mode: constant memory however big the matrix
+                # (--check materialises one rule's tasks to batch its checks).
+                tasks = iter_expand_rule(rule, predicate)
+                checked = {}
+                if args.check and (args.inputs or args.outputs):
+                    tasks = list(tasks)
+                    checked = check_files(tasks)
+                for task in tasks:
                     if args.json:
                         row = {'key': task.key, 'rule': rule.name, 'kwargs': task.kwargs}
                         if args.inputs:
-                            row['inputs'] = list(input_files(task))
+                            row['inputs'] = list(input_files(task, checked))
                         if args.outputs:
-                            row['outputs'] = list(output_files(task))
+                            row['outputs'] = list(output_files(task, checked))
                         rows.append(row)
                         continue
                     print(task)
                     if args.inputs:
-                        for f in input_files(task):
+                        for f in input_files(task, checked):
                             mark = '' if not args.check else (
                                 paint(' [exists]', 'green') if f['exists']
                                 else paint(' [missing]', 'red', 'bold'))
                             print(f'  in  {f["name"]}: {f["path"]}{mark}')
                     if args.outputs:
-                        for f in output_files(task):
+                        for f in output_files(task, checked):
                             mark = '' if not args.check else (
                                 paint(' [complete]', 'green') if f['complete']
                                 else paint(' [missing]', 'red', 'bold'))
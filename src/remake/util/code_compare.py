@@ -1,6 +1,7 @@
 import ast
 import os
 import textwrap
+from hashlib import sha1
 from itertools import zip_longest
 from typing import Union
 
@@ -38,6 +39,18 @@ def _compare_ast(
         return node1 == node2
 
 
+def ast_digest(code):
+    """sha1 of code's AST-normalised form: two texts CodeComparer finds equal
+    share a digest. Positions are not part of ast.dump's output, so cosmetic
+    edits (whitespace, comments, indentation) do not change it; unparseable
+    text digests as itself, and so matches only an identical text."""
+    try:
+        normalised = ast.dump(ast.parse(dedent(code)))
+    except Exception:
+        normalised = code
+    return sha1(normalised.encode()).hexdigest()
+
+
 class CodeComparer:
     def __init__(self):
         self.compare_cache = {}
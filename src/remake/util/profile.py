@@ -0,0 +1,93 @@
+"""Planner cost profiling — the data behind `remake profile-plan`.
+
+plan() and the layers under it (dag expansion, the metadata backend) mark
+their phases with `phase(name)`. Outside a `profiling()` block a phase costs
+one global read, so the marks stay in place permanently; inside one, each
+phase's wall time, call count and item count are accumulated against the
+rule being planned (`profile_rule`). Phases are per rule, never per task, so
+profiling a 1e6-task plan does not distort it.
+"""
+from collections import defaultdict
+from contextlib import contextmanager
+from time import perf_counter
+
+_active = None  # the PlanProfile being filled, or None
+
+
+class PlanProfile:
+    """Accumulated phase timings: (rule name, phase) -> seconds/calls/items.
+    Rule None is plan-level work outside any one rule (ingest, snapshot
+    load/store)."""
+
+    def __init__(self):
+        self.rule = None
+        self.seconds = 0.0  # wall time of the whole profiled block
+        self._phases = defaultdict(lambda: [0.0, 0, 0])
+
+    def add(self, name, seconds, items):
+        entry = self._phases[self.rule, name]
+        entry[0] += seconds
+        entry[1] += 1
+        entry[2] += items
+
+    def rows(self):
+        """[{rule, phase, seconds, calls, items}] in first-seen order."""
+        return [
+            {'rule': rule, 'phase': name, 'seconds': round(seconds, 6),
+             'calls': calls, 'items': items}
+            for (rule, name), (seconds, calls, items) in self._phases.items()
+        ]
+
+    def phase_totals(self):
+        """{phase: seconds} summed over rules, slowest first."""
+        totals = defaultdict(float)
+        for (_, name), (seconds, _, _) in self._phases.items():
+            totals[name] += seconds
+        return dict(sorted(totals.items(), key=lambda kv: -kv[1]))
+
+
+class _Phase:
+    __slots__ = ('items',)
+
+    def __init__(self, items):
+        self.items = items
+
+
+@contextmanager
+def profiling():
+    """Collect phase timings for the block; yields the PlanProfile."""
+    global _active
+    profile = _active = PlanProfile()
+    start = perf_counter()
+    try:
+        yield profile
+    finally:
+        profile.seconds = perf_counter() - start
+        _active = None
+
+
+def profile_rule(name):
+    """Attribute the phases that follow to rule `name` (None: plan-level)."""
+    if _active is not None:
+        _active.rule = name
+
+
+def record(name, seconds, items=0):
+    """Add an already-timed phase (for code that measures itself anyway)."""
+    if _active is not None:
+        _active.add(name, seconds, items)
+
+
+@contextmanager
+def phase(name, items=0):
+    """Time the block as phase `name`. Yields a handle whose `items` may be
+    set inside the block when the count is only known there."""
+    if _active is None:
+        yield _Phase(items)
+        return
+    handle = _Phase(items)
+    start = perf_counter()
+    try:
+        yield handle
+    finally:
+        _active.add(name, perf_counter() - start, handle.items)
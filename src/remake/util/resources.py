@@ -282,17 +282,18 @@ def one_task_per_process():
         ONE_TASK_PER_PROCESS = previous
 
 
-def capture_for_config(config):
+def capture_for_config(config, sample_rss=True):
     """Build a `ResourceCapture` from a Remake config's `resources` block:
 
         config={'resources': {'capture': True, 'rss_interval': 0.1}}
 
     `capture` (default True) turns the RSS sampler on/off; wall and CPU time
-    are free and always measured.
+    are free and always measured. `sample_rss=False` turns it off whatever
+    the config says (callers whose tasks always overlap).
     """
     cfg = (config or {}).get('resources', {})
     return ResourceCapture(
         interval=cfg.get('rss_interval', 0.1),
-        sample_rss=cfg.get('capture', True),
+        sample_rss=sample_rss and cfg.get('capture', True),
         one_task_per_process=ONE_TASK_PER_PROCESS,
     )
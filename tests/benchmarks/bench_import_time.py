@@ -0,0 +1,66 @@
+"""Start-up time: how long `import remake.remake_cmd` takes, against a budget.
+
+Every `remake` call pays this before doing anything — `remake version`,
+`task-log`, and each SLURM array element, which then runs a single task.
+networkx and the executors are imported on first use for this reason
+(core/dag.py, executors/__init__.py); tests/unit/test_imports.py pins which
+modules stay out, and this script times what is left.
+
+Each repeat is a fresh interpreter run with `-X importtime`. Reports the
+median total and the modules with the largest cumulative times in the
+median run, and exits 1 if the median is over --budget-ms.
+
+Run manually: PYTHONPATH=src python tests/benchmarks/bench_import_time.py
+(not collected by pytest — no test_ prefix).
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+
+
+def import_times(module):
+    """{module: cumulative microseconds} for one fresh import of module."""
+    stderr = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        capture_output=True, text=True, check=True,
+    ).stderr
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        # import time: <self us> | <cumulative us> | <indented module name>
+        _, cumulative, name = line.split('|')
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--module', default='remake.remake_cmd')
+    parser.add_argument('--repeat', type=int, default=7)
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--budget-ms', type=float, default=300.0)
+    args = parser.parse_args(argv)
+
+    runs = [import_times(args.module) for _ in range(args.repeat)]
+    runs.sort(key=lambda times: times[args.module])
+    median_run = runs[len(runs) // 2]
+    totals_ms = [times[args.module] / 1000 for times in runs]
+    median_ms = statistics.median(totals_ms)
+
+    print(f'import {args.module}: median {median_ms:.1f} ms '
+          f'(min {totals_ms[0]:.1f}, max {totals_ms[-1]:.1f}, {args.repeat} runs)')
+    print('largest cumulative times (median run):')
+    top = sorted(median_run.items(), key=lambda item: -item[1])[:args.top]
+    for name, us in top:
+        print(f'  {us / 1000:8.1f} ms  {name}')
+    if median_ms > args.budget_ms:
+        print(f'OVER BUDGET: {median_ms:.1f} ms > {args.budget_ms:.1f} ms')
+        return 1
+    print(f'within budget ({args.budget_ms:.1f} ms)')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
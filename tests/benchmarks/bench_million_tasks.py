@@ -49,3 +49,6 @@ print(f'peak RSS:             {rss:8.2f} GB')
 # After batching + lazy lookup (2026-06-12): plan(never, empty DB) 6.2s;
 #   plan(never, fully populated DB) 13.9s; task_from_key worst case 3.0s
 #   (constant memory); task_from_spec 0.04ms.
+# After TaskBatch columnar expansion (2026-10-17, slower host: this script's
+#   plan(never, empty DB) 9.9s here): plan(never, fully populated DB) 31.5s
+#   -> 17.5s, peak RSS 1.46 -> 0.93 GB; only runnable tasks become Task objects.
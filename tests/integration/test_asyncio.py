@@ -0,0 +1,104 @@
+"""Asyncio executor and `async def` rules."""
+import json
+from pathlib import Path
+
+import pytest
+
+from remake.remake_cmd import remake_cmd
+
+# Every fetch task waits until all three have started: they only finish if
+# they really run at the same time on the loop.
+PIPELINE = '''
+import asyncio
+from pathlib import Path
+from remake import Remake, rule
+
+STARTED = []
+
+@rule(outputs={'raw': 'data/raw_{n}.txt'}, matrix={'n': [1, 2, 3]})
+async def fetch(outputs, n):
+    STARTED.append(n)
+    async with asyncio.timeout(10):
+        while len(STARTED) < 3:
+            await asyncio.sleep(0.01)
+    if n == 2:
+        raise ValueError('boom from n=2')
+    Path(outputs['raw']).write_text(str(n))
+
+@rule(inputs=fetch.outputs, outputs={'out': 'data/out_{n}.txt'},
+      matrix=fetch.matrix, depends_on=[fetch])
+def process(inputs, outputs, n):
+    Path(outputs['out']).write_text(Path(inputs['raw']).read_text() * 2)
+
+rmk = Remake()
+rmk.rules_from_current_module()
+'''
+
+
+def cli(*args):
+    return remake_cmd(['remake', *args])
+
+
+@pytest.fixture
+def pipeline_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    Path('pipeline.py').write_text(PIPELINE)
+    return tmp_path
+
+
+def test_asyncio_runs_coroutines_concurrently(pipeline_dir, capsys):
+    assert cli('run', 'pipeline.py', '-E', 'asyncio') == 1
+    assert Path('data/raw_1.txt').read_text() == '1'
+    assert Path('data/out_1.txt').read_text() == '11'
+    assert Path('data/out_3.txt').exists()
+    assert not Path('data/out_2.txt').exists()  # upstream failed: skipped
+
+    capsys.readouterr()
+    cli('info', 'pipeline.py', '-F')
+    assert 'ValueError: boom from n=2' in capsys.readouterr().out
+    cli('info', 'pipeline.py', '--tasks', '--json')
+    key = json.loads(capsys.readouterr().out)['tasks'][0]['key']
+    cli('task-info', 'pipeline.py', key, '--json')
+    resources = json.loads(capsys.readouterr().out)['resources']
+    assert resources['wall_s'] > 0
+    assert resources['max_rss_bytes'] is None  # no sampling on the loop
+
+
+def test_asyncio_concurrency_limit(tmp_path, monkeypatch):
+    import asyncio
+
+    from remake import AsyncioExecutor, Remake, rule
+
+    monkeypatch.chdir(tmp_path)
+    running = []
+    peak = []
+
+    @rule(outputs={'o': 'out_{n}.txt'}, matrix={'n': list(range(10))})
+    async def transfer(outputs, n):
+        running.append(n)
+        peak.append(len(running))
+        await asyncio.sleep(0.01)
+        running.remove(n)
+        Path(outputs['o']).write_text(str(n))
+
+    rmk = Remake(rules=[transfer])
+    assert rmk.run(executor=AsyncioExecutor(rmk, concurrency=3)) == 0
+    assert max(peak) == 3
+    assert rmk.plan()[0] == []
+
+
+def test_async_rule_runs_under_singleproc(tmp_path, monkeypatch):
+    import asyncio
+
+    from remake import Remake, rule
+
+    monkeypatch.chdir(tmp_path)
+
+    @rule(outputs={'o': 'out.txt'})
+    async def download(outputs):
+        await asyncio.sleep(0)
+        Path(outputs['o']).write_text('ok')
+
+    rmk = Remake(rules=[download])
+    assert rmk.run() == 0
+    assert Path('out.txt').read_text() == 'ok'
@@ -763,3 +763,32 @@ def test_run_query_force(pipeline_dir, capsys):
     cli('run', 'pipeline.py', '--force', '-Q', 'n == 1')
     assert (pipeline_dir / 'data/out_1.txt').read_text() == '11'
     assert (pipeline_dir / 'data/out_2.txt').exists()
+
+
+def test_profile_plan_json_reports_phases_per_rule(pipeline_dir, capsys):
+    cli('profile-plan', 'pipeline.py', '--json')
+    data = json.loads(capsys.readouterr().out)
+    assert data['nrunnable'] == 4 and data['ndeferred'] == 0
+    phases = {(r['rule'], r['phase']): r for r in data['phases']}
+    for name in ('generate', 'process'):
+        assert phases[name, 'expand']['items'] == 2
+        assert phases[name, 'status_query']['items'] == 2
+        assert phases[name, 'classify']['calls'] == 1
+    assert (None, 'ingest') in phases
+    assert set(data['phase_totals']) == {r['phase'] for r in data['phases']}
+
+
+def test_estimate_json_reports_makespan_and_rules(pipeline_dir, capsys):
+    assert cli('run', 'pipeline.py') == 0
+    capsys.readouterr()
+    cli('estimate', 'pipeline.py', '-j', '3')
+    out = capsys.readouterr().out
+    assert 'multiproc on 3 worker(s): 0 task(s)' in out  # all up to date
+    assert 'makespan 0.0s' in out
+    cli('estimate', 'pipeline.py', '-E', 'slurm', '--force', '--json')
+    data = json.loads(capsys.readouterr().out)
+    assert data['model'] == 'slurm' and data['nslots'] is None
+    assert data['ntasks'] == data['nmeasured'] == 4
+    assert [r['rule'] for r in data['rules']] == ['generate', 'process']
+    assert [s['rule'] for s in data['critical_path']] == ['generate', 'process']
+    assert data['makespan_s'] == data['critical_path_s']  # no throttle, aftercorr
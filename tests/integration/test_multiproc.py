@@ -1,4 +1,4 @@
-"""Multiproc executor — spawned workers, sidecar results, per-rule barriers."""
+"""Multiproc executor — spawned workers, sidecar results, element-wise pipelining."""
 import json
 from pathlib import Path
 
@@ -43,8 +43,8 @@ def pipeline_dir(tmp_path, monkeypatch):
 
 
 def test_multiproc_end_to_end(pipeline_dir, capsys):
-    # Per-rule barriers make the chain correct: process reads generate's
-    # outputs, agg fans in across all of process.
+    # The chain is correct: process[n] waits for generate[n], agg fans in
+    # across all of process.
     assert cli('run', 'pipeline.py', '-E', 'multiproc', '-j', '2') == 0
     assert Path('data/agg.txt').read_text() == '11,22,33'
 
@@ -75,6 +75,17 @@ def test_multiproc_records_resources_via_sidecars(pipeline_dir, capsys):
     assert resources['max_rss_bytes'] > 0
 
 
+def test_multiproc_dry_run_predicts_makespan(pipeline_dir, capsys):
+    cli('run', 'pipeline.py', '-E', 'multiproc', '-j', '2', '--dry-run')
+    assert 'predicted makespan' not in capsys.readouterr().out  # nothing measured
+    assert cli('run', 'pipeline.py', '-E', 'multiproc', '-j', '2') == 0
+    capsys.readouterr()
+    cli('run', 'pipeline.py', '-E', 'multiproc', '-j', '2', '--dry-run', '--force')
+    out = capsys.readouterr().out
+    assert '7 task(s) would run' in out
+    assert 'predicted makespan' in out and 'on 2 proc(s)' in out
+
+
 def test_multiproc_failure_exit_code_and_traceback(pipeline_dir, capsys):
     Path('failing.py').write_text('''
 from pathlib import Path
@@ -96,7 +107,7 @@ rmk.rules_from_current_module()
 ''')
     assert cli('run', 'failing.py', '-E', 'multiproc', '-j', '2') == 1
     assert Path('data/f_1.txt').exists()  # independent task still ran
-    # Downstream of the failure: g[n=2] skipped at the rule barrier,
+    # Downstream of the failure: g[n=2] skipped once f[n=2] failed,
     # g[n=1] (untainted element) ran.
     assert Path('data/g_1.txt').exists()
     assert not Path('data/g_2.txt').exists()
@@ -113,6 +124,175 @@ rmk.rules_from_current_module()
     assert 'boom from n=2' in data['failures'][0]['example']['exception']
 
 
+PIPELINED = '''
+import time
+from pathlib import Path
+from remake import Remake, rule
+
+@rule(outputs={'o': 'data/a_{n}.txt'}, matrix={'n': [1, 2]})
+def a(outputs, n):
+    if n == 1:
+        # Only finishes once b[2] has run: proves b[2] did not wait for all of a.
+        deadline = time.time() + 20
+        while not Path('data/b_2.txt').exists():
+            if time.time() > deadline:
+                raise RuntimeError('b[2] never started while a[1] ran')
+            time.sleep(0.05)
+    Path(outputs['o']).write_text(str(n))
+
+@rule(inputs=a.outputs, outputs={'o': 'data/b_{n}.txt'}, matrix=a.matrix, depends_on=[a])
+def b(inputs, outputs, n):
+    Path(outputs['o']).write_text(Path(inputs['o']).read_text())
+
+rmk = Remake()
+rmk.rules_from_current_module()
+'''
+
+
+def test_multiproc_pipelines_elementwise_chain(pipeline_dir):
+    Path('pipelined.py').write_text(PIPELINED)
+    assert cli('run', 'pipelined.py', '-E', 'multiproc', '-j', '2') == 0
+    assert Path('data/b_1.txt').read_text() == '1'
+
+
+def test_multiproc_batches_isolate_failures_per_task(pipeline_dir, capsys):
+    Path('batched.py').write_text('''
+from pathlib import Path
+from remake import Remake, rule
+
+@rule(outputs={'o': 'data/t_{n}.txt'}, matrix={'n': list(range(6))})
+def t(outputs, n):
+    if n == 2:
+        raise ValueError('boom from n=2')
+    Path(outputs['o']).write_text(str(n))
+
+rmk = Remake(config={'multiproc': {'batch_size': 3}})
+rmk.rules_from_current_module()
+''')
+    assert cli('run', 'batched.py', '-E', 'multiproc', '-j', '2') == 1
+    # The failure did not take down the rest of its batch.
+    assert sorted(p.name for p in Path('data').iterdir()) == [
+        f't_{n}.txt' for n in (0, 1, 3, 4, 5)]
+    assert len(list(Path('.remake/tasks/log').rglob('*.log'))) == 6
+    capsys.readouterr()
+    cli('info', 'batched.py', '--json')
+    (data,) = json.loads(capsys.readouterr().out)['rules']
+    assert data['up_to_date'] == 5 and data['failed'] == 1
+
+
+def test_multiproc_memory_budget_serialises_large_tasks(pipeline_dir):
+    # 3G tasks against a 4G budget: never two at once, despite -j 3.
+    Path('big.py').write_text('''
+import time
+from pathlib import Path
+from remake import Remake, rule
+
+@rule(outputs={'o': 'data/big_{n}.txt'}, matrix={'n': [1, 2, 3]},
+      config={'multiproc': {'task_mem': '3G'}})
+def big(outputs, n):
+    Path('data').mkdir(exist_ok=True)
+    running = Path(f'data/running_{n}')
+    running.touch()
+    time.sleep(0.3)
+    others = [p.name for p in Path('data').glob('running_*') if p != running]
+    running.unlink()
+    if others:
+        raise RuntimeError(f'ran alongside {others}')
+    Path(outputs['o']).write_text(str(n))
+
+rmk = Remake(config={'multiproc': {'mem_budget': '4G'}})
+rmk.rules_from_current_module()
+''')
+    assert cli('run', 'big.py', '-E', 'multiproc', '-j', '3') == 0
+    assert len(list(Path('data').glob('big_*.txt'))) == 3
+
+
+DYNAMIC = '''
+import json, os
+from pathlib import Path
+from remake import Defer, Remake, deferrable, rule
+
+with open('loads.txt', 'a') as f:  # one line per process that loads this file
+    f.write(f'{os.getpid()}\\n')
+
+@rule(outputs={'o': 'data/ids.json'})
+def find(outputs):
+    Path(outputs['o']).write_text(json.dumps([1, 2]))
+
+@deferrable
+def ids():
+    if not Path('data/ids.json').exists():
+        raise Defer('data/ids.json')
+    return [{'n': n} for n in json.loads(Path('data/ids.json').read_text())]
+
+@rule(outputs={'o': 'data/x_{n}.txt'}, matrix=ids, depends_on=[find])
+def each(outputs, n):
+    Path(outputs['o']).write_text(str(n))
+
+rmk = Remake()
+rmk.rules_from_current_module()
+'''
+
+
+def test_multiproc_pool_stays_warm_across_waves(pipeline_dir):
+    Path('dynamic.py').write_text(DYNAMIC)
+    assert cli('run', 'dynamic.py', '-E', 'multiproc', '-j', '1') == 0
+    assert Path('data/x_2.txt').read_text() == '2'
+    # The parent plus one worker serving both waves (not one per wave).
+    assert len(Path('loads.txt').read_text().split()) == 2
+    records = [json.loads(line)['record']['extra']
+               for line in Path('.remake/remake.jsonl').read_text().splitlines()]
+    (summary,) = [r for r in records if r.get('event') == 'run_summary']
+    assert summary['nwaves'] == 2
+    assert summary['worker_starts'] == 1 and summary['worker_startup_s'] > 0
+
+
+def test_multiproc_restarts_pool_when_remakefile_changes(pipeline_dir):
+    import os
+
+    from remake import MultiprocExecutor, load_remake
+
+    rmk = load_remake('pipeline.py')
+    executor = MultiprocExecutor(rmk, nproc=1)
+    pool = executor._get_pool()
+    assert executor._get_pool() is pool
+    stat = os.stat('pipeline.py')
+    os.utime('pipeline.py', ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert executor._get_pool() is not pool
+    executor.close()
+    assert executor._pool is None
+
+
+def test_pipeline_pairs_requires_elementwise_proof(tmp_path):
+    from remake import rule
+    from remake.core.dag import expand_rule
+    from remake.executors.multiproc_executor import _pipeline_pairs
+
+    @rule(outputs={'o': str(tmp_path / 'a_{n}')}, matrix={'n': [1, 2, 3]})
+    def a(outputs, n):
+        pass
+
+    @rule(inputs=a.outputs, outputs={'o': str(tmp_path / 'b_{n}')},
+          matrix=a.matrix, depends_on=[a])
+    def b(inputs, outputs, n):
+        pass
+
+    def neighbours(n):
+        return {str(m): str(tmp_path / f'a_{m}') for m in (n - 1, n, n + 1)}
+
+    @rule(inputs=neighbours, outputs={'o': str(tmp_path / 's_{n}')},
+          matrix=a.matrix, depends_on=[a])
+    def stencil(inputs, outputs, n):
+        pass
+
+    a_tasks = expand_rule(a)
+    assert _pipeline_pairs(b, expand_rule(b)[::-1], a, a_tasks) == [2, 1, 0]
+    # Same matrix, but element n reads its neighbours: wait for all of a.
+    assert _pipeline_pairs(stencil, expand_rule(stencil), a, a_tasks) is None
+    # Different task sets this wave: no pairing either.
+    assert _pipeline_pairs(b, expand_rule(b)[:2], a, a_tasks) is None
+
+
 def test_multiproc_needs_remakefile():
     from remake import MultiprocExecutor, Remake, RemakeError
 
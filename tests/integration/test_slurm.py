@@ -2,6 +2,7 @@
 submission flow runs against fake sbatch/squeue shims on PATH, so the whole
 flow short of real cluster behaviour is covered locally."""
 import json
+import math
 import os
 from pathlib import Path
 
@@ -479,6 +480,25 @@ def test_run_array_task_executes_spec(slurm_dir):
     assert {'n': 3} not in [spec['kwargs'] for spec in specs]
 
 
+def test_run_array_task_checks_only_its_rule(slurm_dir, monkeypatch):
+    import importlib
+
+    rule_module = importlib.import_module('remake.core.rule')  # not remake.core.rule()
+    cli('run', 'pipeline.py', '-E', 'slurm', '--dry-run')
+    checked = []
+    check_scope = rule_module.check_scope
+
+    def recording_check_scope(fn, uses, strict):
+        checked.append(fn.__name__)
+        return check_scope(fn, uses, strict)
+
+    monkeypatch.setattr(rule_module, 'check_scope', recording_check_scope)
+    cli('run-array-task', 'pipeline.py', 'gen', '3', '--specs', str(specs_file('gen')))
+    # proc and agg are loaded, but only the rule being run is checked.
+    assert checked == ['gen']
+    assert Path('data/gen_3.txt').read_text() == '3'
+
+
 def test_run_array_task_writes_sidecar_not_db(slurm_dir):
     cli('run', 'pipeline.py', '-E', 'slurm', '--dry-run')
     db_before = Path('.remake/remake.db').read_bytes()
@@ -504,6 +524,112 @@ def test_run_array_task_writes_sidecar_not_db(slurm_dir):
     assert {'n': 3} not in [spec['kwargs'] for spec in specs]
 
 
+def test_packed_results_append_to_a_node_log(slurm_dir):
+    Path('pipeline.py').write_text(PIPELINE.replace(
+        "'mem': '2G'}", "'mem': '2G', 'packed_results': True}"))
+    cli('run', 'pipeline.py', '-E', 'slurm', '--dry-run')
+    gen = Path('.remake/slurm/gen.sbatch').read_text()
+    assert '--packed' in gen and 'packed_results' not in gen
+
+    cli('run-array-task', 'pipeline.py', 'gen', '2', '--packed')
+    cli('run-array-task', 'pipeline.py', 'gen', '3', '--packed')
+    results = Path('.remake/tasks/results/gen')
+    assert not list(results.rglob('*.json'))
+    assert len(list((results / 'packed').glob('*.log'))) == 1
+
+    cli('run', 'pipeline.py', '-E', 'slurm', '--dry-run')
+    kwargs = [spec['kwargs'] for spec in read_specs('gen')]
+    assert {'n': 2} not in kwargs and {'n': 3} not in kwargs
+
+
+def test_bundled_elements_run_groups_and_keep_aftercorr(slurm_dir, capsys):
+    Path('pipeline.py').write_text(PIPELINE.replace(
+        "'mem': '2G'}", "'mem': '2G', 'bundle_size': 5}"))
+    cli('run', 'pipeline.py', '-E', 'slurm', '--dry-run')
+    gen = Path('.remake/slurm/gen.sbatch').read_text()
+    assert '#SBATCH --array=0-2\n' in gen and '--bundled' in gen
+    assert 'bundle_size' not in gen
+    # proc follows gen's bundles element-wise, so aftercorr still holds.
+    assert [spec['element'] for spec in read_specs('proc')] == [0] * 5 + [1] * 5 + [2] * 2
+    submit = Path('.remake/submit.sh').read_text()
+    assert '--dependency=aftercorr:$JOB_gen' in submit
+    assert '--dependency=afterok:$JOB_proc' in submit
+
+    assert cli('run-array-task', 'pipeline.py', 'gen', '1', '--bundled') is None
+    assert sorted(p.name for p in Path('data').iterdir()) == [
+        f'gen_{n}.txt' for n in range(5, 10)]
+    assert len(list(Path('.remake/tasks/log/gen').rglob('*.log'))) == 5
+    cli('run', 'pipeline.py', '-E', 'slurm')
+    kwargs = [spec['kwargs'] for spec in read_specs('gen')]
+    assert len(kwargs) == 7 and {'n': 5} not in kwargs
+
+    # task-info reports the array element a bundled task ran in.
+    capsys.readouterr()
+    cli('task-info', 'pipeline.py', read_specs('gen')[6]['task_key'], '--json')
+    assert json.loads(capsys.readouterr().out)['slurm']['array_index'] == 1
+
+
+def test_differently_bundled_downstream_gets_afterok(slurm_dir):
+    # gen bundled 4 per element, proc opted out (bundle_size 0): the elements
+    # no longer pair up, so proc waits for the whole of gen.
+    Path('pipeline.py').write_text(PIPELINE.replace(
+        "matrix=gen.matrix, depends_on=[gen])",
+        "matrix=gen.matrix, depends_on=[gen], config={'slurm': {'bundle_size': 0}})",
+    ).replace(
+        "@rule(outputs={'o': 'data/gen_{n}.txt'}, matrix={'n': list(range(12))})",
+        "@rule(outputs={'o': 'data/gen_{n}.txt'}, matrix={'n': list(range(12))},\n"
+        "      config={'slurm': {'bundle_size': 4}})"))
+    cli('run', 'pipeline.py', '-E', 'slurm', '--dry-run')
+    assert '#SBATCH --array=0-2\n' in Path('.remake/slurm/gen.sbatch').read_text()
+    assert '#SBATCH --array=0-11\n' in Path('.remake/slurm/proc.sbatch').read_text()
+    submit = Path('.remake/submit.sh').read_text()
+    assert '--dependency=afterok:$JOB_gen' in submit
+    assert 'aftercorr' not in submit
+
+
+def test_auto_resources_sizes_from_recorded_history(slurm_dir, capsys):
+    Path('pipeline.py').write_text(PIPELINE.replace(
+        "'mem': '2G'}", "'mem': '2G', 'auto_resources': {'min_samples': 10}}"))
+    cli('run', 'pipeline.py')  # locally: records wall_s/max_rss_bytes
+    cli('run', 'pipeline.py', '-E', 'slurm', '--dry-run', '-f')
+    gen = Path('.remake/slurm/gen.sbatch').read_text()
+    # 12 measured tasks: sized (tiny tasks hit the floors), basis noted.
+    assert '#SBATCH --mem=2G' not in gen and '#SBATCH --time=00:05:00' in gen
+    assert '# remake auto_resources: mem ' in gen and 'p95 of 12 x 1.5' in gen
+    assert 'auto_resources' not in gen.replace('# remake auto_resources', '')
+    # agg has one measurement: too little history, config values stand.
+    agg = Path('.remake/slurm/agg.sbatch').read_text()
+    assert '#SBATCH --mem=8G' in agg and '#SBATCH --time=4:00:00' in agg
+    assert 'time from config (1 < 10 measured)' in agg
+
+
+def test_auto_resources_percentile_and_headroom():
+    from remake.executors.slurm_executor import AUTO_RESOURCES, auto_resources
+
+    history = [(60.0 * n, 2**30 * n) for n in range(1, 21)] + [(None, None)]
+    sized, basis = auto_resources(history, AUTO_RESOURCES)
+    # p95 of 1..20 is 19: 19 GiB x 1.5, 19 min x 1.5.
+    assert sized == {'mem': f'{math.ceil(19 * 1.5 * 1024)}M', 'time': '00:29:00'}
+    sized, basis = auto_resources(history, AUTO_RESOURCES, tasks_per_element=100)
+    assert sized['time'] == '1-23:30:00'
+    assert auto_resources(history[:3], AUTO_RESOURCES)[0] == {}
+
+
+def test_auto_resources_keeps_rule_mem_and_time(slurm_dir):
+    # Pipeline-wide auto_resources sizes only what a rule leaves unset: agg's
+    # own mem stands, its time (set pipeline-wide) is sized.
+    Path('pipeline.py').write_text(PIPELINE.replace(
+        "'mem': '2G'}", "'mem': '2G', 'time': '4:00:00', "
+        "'auto_resources': {'min_samples': 1}}"))
+    cli('run', 'pipeline.py')
+    cli('run', 'pipeline.py', '-E', 'slurm', '--dry-run', '-f')
+    agg = Path('.remake/slurm/agg.sbatch').read_text()
+    assert '#SBATCH --mem=8G' in agg and '#SBATCH --time=00:05:00' in agg
+    assert 'mem from rule config' in agg
+    gen = Path('.remake/slurm/gen.sbatch').read_text()
+    assert '#SBATCH --mem=2G' not in gen
+
+
 def test_ingest_after_edit_detects_code_change(slurm_dir):
     # Bug 05: the sidecar must carry the run source that executed, so that
     # ingesting under *edited* source (run overnight, tweak in the morning)
@@ -0,0 +1,100 @@
+"""Thread executor — in-process thread pool, queued DB writes, per-rule barriers."""
+import json
+from pathlib import Path
+
+import pytest
+
+from remake.remake_cmd import remake_cmd
+
+# generate's tasks wait for each other at a barrier: they only get past it
+# if they really run at the same time.
+PIPELINE = '''
+import threading
+from pathlib import Path
+from remake import Remake, rule
+
+BARRIER = threading.Barrier(3, timeout=10)
+
+@rule(outputs={'raw': 'data/raw_{n}.txt'}, matrix={'n': [1, 2, 3]})
+def generate(outputs, n):
+    BARRIER.wait()
+    Path(outputs['raw']).write_text(str(n))
+
+@rule(inputs=generate.outputs, outputs={'out': 'data/out_{n}.txt'},
+      matrix=generate.matrix, depends_on=[generate])
+def process(inputs, outputs, n):
+    if n == 2:
+        raise ValueError('boom from n=2')
+    Path(outputs['out']).write_text(Path(inputs['raw']).read_text() * 2)
+
+@rule(inputs={'o': 'data/out_1.txt'}, outputs={'o': 'data/agg.txt'}, depends_on=[process])
+def agg(inputs, outputs):
+    Path(outputs['o']).write_text('never')
+
+rmk = Remake()
+rmk.rules_from_current_module()
+'''
+
+
+def cli(*args):
+    return remake_cmd(['remake', *args])
+
+
+@pytest.fixture
+def pipeline_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    Path('pipeline.py').write_text(PIPELINE)
+    return tmp_path
+
+
+def test_threads_run_concurrently_and_record_results(pipeline_dir, capsys):
+    assert cli('run', 'pipeline.py', '-E', 'threads', '-j', '3') == 1
+    assert [Path(f'data/raw_{n}.txt').read_text() for n in (1, 2, 3)] == ['1', '2', '3']
+    assert Path('data/out_1.txt').exists() and Path('data/out_3.txt').exists()
+    assert not Path('data/agg.txt').exists()  # fan-in after a failure: skipped
+
+    capsys.readouterr()
+    cli('info', 'pipeline.py', '--json')
+    counts = {r['rule']: r for r in json.loads(capsys.readouterr().out)['rules']}
+    assert counts['generate']['up_to_date'] == 3
+    assert counts['process']['up_to_date'] == 2
+    cli('info', 'pipeline.py', '-F')
+    assert 'ValueError: boom from n=2' in capsys.readouterr().out
+
+    # generate's tasks overlapped: their wall time is recorded, but not the
+    # process-wide CPU time and memory, which are not theirs alone.
+    cli('info', 'pipeline.py', '--tasks', '--json')
+    tasks = json.loads(capsys.readouterr().out)['tasks']
+    key = tasks[0]['key']  # plan order: generate first
+    cli('task-info', 'pipeline.py', key, '--json')
+    resources = json.loads(capsys.readouterr().out)['resources']
+    assert resources['wall_s'] is not None
+    assert resources['cpu_s'] is None and resources['max_rss_bytes'] is None
+
+
+def test_threads_restore_metadata_and_write_from_one_thread(tmp_path, monkeypatch):
+    import threading
+
+    from remake import Remake, ThreadExecutor, rule
+
+    monkeypatch.chdir(tmp_path)
+
+    @rule(outputs={'o': 'out_{n}.txt'}, matrix={'n': list(range(20))})
+    def write(outputs, n):
+        Path(outputs['o']).write_text(str(n))
+
+    rmk = Remake(rules=[write])
+    rmk.finalize()
+    metadata = rmk.metadata
+    writers = set()
+    update_task = metadata.update_task
+
+    def recording_update_task(*args, **kwargs):
+        writers.add(threading.get_ident())
+        return update_task(*args, **kwargs)
+
+    monkeypatch.setattr(metadata, 'update_task', recording_update_task)
+    assert rmk.run(executor=ThreadExecutor(rmk, nproc=4)) == 0
+    assert writers == {threading.get_ident()}
+    assert rmk.metadata is metadata
+    assert rmk.plan()[0] == []
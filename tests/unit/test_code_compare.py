@@ -30,3 +30,13 @@ def test_null_byte_source_degrades_to_changed():
     # cdb2e98, ported cleanly). The two strings differ, so rerun is safe.
     cc = CodeComparer()
     assert not cc('x = 1\x00\n', 'x = 1\n')
+
+
+def test_ast_digest_agrees_with_comparer():
+    from remake.util.code_compare import ast_digest
+
+    a = 'def f():\n    return 1\n'
+    assert ast_digest(a) == ast_digest('def f():\n    # a comment\n\n    return  1\n')
+    assert ast_digest(a) != ast_digest('def f():\n    return 2\n')
+    assert ast_digest('def f(:\n') == ast_digest('def f(:\n')  # unparseable: by text
+    assert ast_digest('def f(:\n') != ast_digest('def f( :\n')
@@ -1,8 +1,13 @@
-import networkx as nx
 import pytest
 
 from remake import Defer, deferrable, rule
-from remake.core.dag import build_rule_dag, expand_rule, resolve_matrix
+from remake.core.dag import (
+    RuleDag,
+    build_rule_dag,
+    expand_rule,
+    expand_rule_batch,
+    resolve_matrix,
+)
 from remake.core.exceptions import SignatureError
 
 
@@ -21,7 +26,22 @@ def make_chain():
 def test_build_rule_dag_topological():
     rule_a, rule_b = make_chain()
     dag = build_rule_dag([rule_b, rule_a])  # order-independent
-    assert list(nx.topological_sort(dag)) == [rule_a, rule_b]
+    assert dag.topological_order() == [rule_a, rule_b]
+    assert list(dag.successors(rule_a)) == [rule_b]
+
+
+def test_topological_order_matches_networkx():
+    import networkx as nx
+
+    dag = RuleDag()
+    for node in 'fedcba':
+        dag.add_node(node)
+    for upstream, node in ['ab', 'ac', 'bd', 'cd', 'ed', 'fe', 'ab']:
+        dag.add_edge(upstream, node)
+    assert dag.topological_order() == list(nx.topological_sort(dag.to_networkx()))
+    assert sorted(dag.to_networkx().edges) == sorted(
+        (u, v) for u in dag for v in dag.successors(u))
+    assert dag.find_cycle() == []
 
 
 def test_cycle_detected():
@@ -29,6 +49,10 @@ def test_cycle_detected():
     rule_a.depends_on = [rule_b]
     with pytest.raises(ValueError, match='cycle'):
         build_rule_dag([rule_a, rule_b])
+    dag = RuleDag()
+    for upstream, node in ['xa', 'ab', 'bc', 'cb']:
+        dag.add_edge(upstream, node)
+    assert dag.find_cycle() == [('b', 'c'), ('c', 'b')]
 
 
 def test_resolve_matrix_forms():
@@ -117,6 +141,62 @@ def test_expand_rule_predicate_filters_before_construction():
     assert [t.kwargs['n'] for t in tasks] == [0, 2, 4, 6, 8]
 
 
+def _batch_rules():
+    @rule(outputs={'o': '{model}_{year}.txt'},
+          matrix={'model': ['a', 'b'], 'year': [1, 2, 3]})
+    def product(outputs, model, year):
+        pass
+
+    @rule(outputs={'o': '{model}_{year}_{flag}.txt'},
+          matrix={'year': [2, 1], ('model', 'flag'): [('a', True), ('b', 1), ('c', 1.0)]})
+    def grouped(outputs, model, year, flag):
+        pass
+
+    @rule(outputs={'o': '{model}_{year}.txt'},
+          matrix=[{'model': 'a', 'year': 0.0}, {'year': -0.0, 'model': 'b'}])
+    def listed(outputs, model, year):
+        pass
+
+    @rule(outputs={'o': '{model}_{year}.txt'}, matrix={'model': [], 'year': [1]})
+    def empty(outputs, model, year):
+        pass
+
+    @rule(outputs={'o': 'o.txt'})
+    def single(outputs):
+        pass
+
+    return [product, grouped, listed, empty, single]
+
+
+@pytest.mark.parametrize('index', range(5))
+def test_task_batch_matches_expand_rule(index):
+    # The columnar expansion must yield exactly expand_rule's rows, in order,
+    # with bulk keys identical to Task.key — including values that are equal
+    # but repr differently (True/1/1.0, 0.0/-0.0).
+    r = _batch_rules()[index]
+    tasks = expand_rule(r)
+    batch = expand_rule_batch(r)
+    assert len(batch) == len(tasks)
+    assert batch.keys == [t.key for t in tasks]
+    assert [t.kwargs for t in batch] == [t.kwargs for t in tasks]
+    assert [batch[i].key for i in range(len(batch))] == [t.key for t in tasks]
+
+
+def test_task_batch_predicate_and_keys_as():
+    @rule(outputs={'o': '{n}.txt'}, matrix={'n': list(range(10))})
+    def r(outputs, n):
+        pass
+
+    @rule(inputs=r.outputs, outputs={'o': '{n}.out'}, matrix=r.matrix, depends_on=[r])
+    def s(inputs, outputs, n):
+        pass
+
+    batch = expand_rule_batch(s, predicate=lambda kw: kw['n'] > 6)
+    assert [t.kwargs['n'] for t in batch] == [7, 8, 9]
+    # keys_as gives the same-matrix upstream's counterpart keys.
+    assert batch.keys_as('r') == [t.key for t in expand_rule(r)[7:]]
+
+
 def test_no_matrix_is_single_task():
     @rule(outputs={'o': 'o.txt'})
     def r(outputs):
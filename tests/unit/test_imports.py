@@ -0,0 +1,53 @@
+"""Start-up imports: what `import remake` must not pull in.
+
+Every CLI call pays for these, including once per SLURM array element. See
+tests/benchmarks/bench_import_time.py for the timing itself.
+"""
+import subprocess
+import sys
+
+import pytest
+
+DEFERRED = [
+    'networkx',
+    'remake.executors.asyncio_executor',
+    'remake.executors.dask_executor',
+    'remake.executors.multiproc_executor',
+    'remake.executors.slurm_executor',
+    'remake.executors.thread_executor',
+]
+
+
+def loaded_after(code):
+    out = subprocess.run(
+        [sys.executable, '-c', f'{code}\nimport sys; print("\\n".join(sys.modules))'],
+        capture_output=True, text=True, check=True,
+    ).stdout
+    return set(out.split())
+
+
+@pytest.mark.parametrize('code', [
+    'import remake.remake_cmd',
+    'from remake import Remake, rule',
+])
+def test_startup_defers_heavy_imports(code):
+    assert loaded_after(code).isdisjoint(DEFERRED)
+
+
+def test_executors_load_on_first_use():
+    loaded = loaded_after('from remake import MultiprocExecutor, ThreadExecutor')
+    assert 'remake.executors.multiproc_executor' in loaded
+    assert 'remake.executors.thread_executor' in loaded
+    assert 'remake.executors.dask_executor' not in loaded
+    # The local executors share scheduling helpers, not the SLURM module.
+    assert 'remake.executors.slurm_executor' not in loaded
+
+
+def test_unknown_attribute_still_raises():
+    import remake
+    import remake.executors
+
+    with pytest.raises(AttributeError):
+        remake.NoSuchExecutor  # noqa: B018
+    with pytest.raises(AttributeError):
+        remake.executors.NoSuchExecutor  # noqa: B018
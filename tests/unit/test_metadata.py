@@ -174,6 +174,94 @@ def test_uses_change_after_migration_reruns(tmp_path):
     assert len(runnable) == 2  # both tasks: uses= changed
 
 
+def test_code_digest_migration_keeps_lowest_id_canonical(tmp_path):
+    from remake.metadata.sqlite3_backend import code_digest
+
+    from remake.core.dag import expand_rule
+
+    r = _migration_pipeline(tmp_path)
+    dbloc = tmp_path / 'remake.db'
+    _write_old_db(dbloc, r, expand_rule(r))
+    conn = sqlite3.connect(dbloc)
+    # Historic inserts could leave duplicate content; the old lookup took min(id).
+    run_id = conn.execute('SELECT run_code_id FROM rule').fetchone()[0]
+    dup_id = conn.execute(
+        'INSERT INTO code(code) VALUES (?)', (r.source['run'],)).lastrowid
+    conn.commit()
+    conn.close()
+
+    meta = Sqlite3Backend(dbloc)
+    digests = dict(meta.conn.execute('SELECT id, digest FROM code'))
+    assert digests[dup_id] is None
+    assert digests[run_id] == code_digest(r.source['run'])
+    assert meta._intern_code(r.source['run']) == run_id
+    meta.ensure_rules([r])
+    assert meta.rule_ids[r.name][1] == run_id
+
+
+def test_code_ast_digest_migration_backfills(tmp_path):
+    from remake.core.dag import expand_rule
+    from remake.util.code_compare import ast_digest
+
+    r = _migration_pipeline(tmp_path)
+    dbloc = tmp_path / 'remake.db'
+    _write_old_db(dbloc, r, expand_rule(r))
+
+    meta = Sqlite3Backend(dbloc)
+    rows = list(meta.conn.execute('SELECT code, ast_digest FROM code'))
+    assert rows and all(digest == ast_digest(code) for code, digest in rows)
+
+
+def test_unchanged_and_cosmetic_code_need_no_parsing(tmp_path, monkeypatch):
+    import ast
+
+    dbloc = tmp_path / 'remake.db'
+
+    @rule(outputs={'o': str(tmp_path / '{n}.txt')}, matrix={'n': [1, 2]})
+    def process(outputs, n):
+        Path(outputs['o']).write_text(str(n))
+
+    rmk = Remake(rules=[process], metadata=Sqlite3Backend(dbloc))
+    rmk.run()
+    run_code_id = rmk.metadata.rule_ids['process'][1]
+
+    parses = []
+    parse = ast.parse
+    monkeypatch.setattr(ast, 'parse', lambda *a, **kw: parses.append(1) or parse(*a, **kw))
+    rmk = Remake(rules=[process], metadata=Sqlite3Backend(dbloc))
+    assert rmk.plan() == ([], [])
+    assert parses == []
+
+    # A cosmetic edit: parsed once, matched by AST digest, nothing reruns
+    # and the stored code id is kept.
+    @rule(outputs={'o': str(tmp_path / '{n}.txt')}, matrix={'n': [1, 2]})
+    def process(outputs, n):  # noqa: F811
+        # Same code, new comment.
+        Path(outputs['o']).write_text(str(n))
+
+    rmk = Remake(rules=[process], metadata=Sqlite3Backend(dbloc))
+    assert rmk.plan() == ([], [])
+    assert rmk.metadata.rule_ids['process'][1] == run_code_id
+
+
+def test_intern_code_memo_forgets_rolled_back_inserts():
+    from remake.metadata.sqlite3_backend import retry_lock_commit
+
+    meta = Sqlite3Backend(':memory:')
+
+    @retry_lock_commit
+    def intern_then_fail(self):
+        self._intern_code('x = 1')
+        raise ValueError('boom')
+
+    with pytest.raises(ValueError):
+        intern_then_fail(meta)
+    assert meta.conn.execute('SELECT count(*) FROM code').fetchone()[0] == 0
+    with meta.conn:
+        code_id = meta._intern_code('x = 1')
+    assert meta.get_codes([code_id]) == {code_id: 'x = 1'}
+
+
 # --- status-query scaling regression (design_docs/logs_analysis §1.1/1.2) ---
 #
 # The field failure this guards against: get_tasks_status once returned the
@@ -290,3 +378,191 @@ def test_identical_shared_rule_does_not_warn(tmp_path):
     msgs = _capture_warnings(lambda: meta.ensure_rules([process], remakefile='b.py'))
 
     assert not any('defined in both' in m for m in msgs)
+
+
+def test_batch_rule_scan_matches_key_lookup(monkeypatch):
+    # A large TaskBatch is read with one scan of its rule's rows instead of
+    # IN-list chunks; both paths must return the same records, and the scan
+    # must drop rows outside the (query-filtered) batch.
+    from remake.core.dag import expand_rule, expand_rule_batch
+
+    @rule(outputs={'o': '{n}.txt'}, matrix={'n': list(range(40))})
+    def scanned(outputs, n):
+        pass
+
+    meta = Sqlite3Backend(':memory:')
+    meta.ensure_rules([scanned])
+    meta.update_tasks(expand_rule(scanned)[::2], TASK_STATUS_SUCCESS)
+    batch = expand_rule_batch(scanned, predicate=lambda kw: kw['n'] < 30)
+    by_key = meta.get_tasks_status(list(batch))
+
+    monkeypatch.setattr(Sqlite3Backend, 'RULE_SCAN_MIN_KEYS', 10)
+    assert meta._batch_rule_id(batch) is not None
+    assert meta.get_tasks_status(batch) == by_key
+    assert len(by_key) == 15
+
+
+def test_ingest_streams_batches_and_skips_idle_rules(tmp_path, monkeypatch):
+    # Sidecars are committed in fixed-size batches; once a rule's results are
+    # fully ingested its directory is not listed again until a writer marks
+    # new results pending.
+    from remake.core.dag import expand_rule
+    from remake.metadata import sidecar
+    from remake.metadata.sidecar import SidecarWriter
+
+    monkeypatch.chdir(tmp_path)
+
+    @rule(outputs={'o': '{n}.txt'}, matrix={'n': list(range(7))})
+    def streamed(outputs, n):
+        pass
+
+    meta = Sqlite3Backend(':memory:')
+    meta.ensure_rules([streamed])
+    tasks = expand_rule(streamed)
+    writer = SidecarWriter()
+    for task in tasks[:5]:
+        writer.update_task(task, TASK_STATUS_SUCCESS)
+
+    scans, commits = [], []
+    real_iter = sidecar.iter_result_paths
+    monkeypatch.setattr(sidecar, 'iter_result_paths',
+                        lambda rule_dir: scans.append(rule_dir) or real_iter(rule_dir))
+    real_ingest = meta._ingest_records
+    monkeypatch.setattr(meta, '_ingest_records',
+                        lambda pending: commits.append(len(pending)) or real_ingest(pending))
+    monkeypatch.setattr(Sqlite3Backend, 'INGEST_BATCH', 2)
+
+    assert meta.ingest_sidecars([streamed]) == 5
+    assert commits == [2, 2, 1] and len(scans) == 1
+    assert meta.ingest_sidecars([streamed]) == 0
+    assert len(scans) == 1  # idle: not listed
+
+    for task in tasks[5:]:
+        writer.update_task(task, TASK_STATUS_SUCCESS)
+    assert meta.ingest_sidecars([streamed]) == 2
+    assert len(meta.get_tasks_status(tasks)) == 7
+    assert not list(Path('.remake/tasks/results').rglob('*.json'))
+
+
+def test_ingest_scans_results_without_markers(tmp_path, monkeypatch):
+    # Sidecars written before markers existed (or left by an ingest that
+    # crashed after claiming) are still found.
+    from remake.core.dag import expand_rule
+    from remake.metadata.sidecar import PENDING_MARKER, SidecarWriter
+
+    monkeypatch.chdir(tmp_path)
+
+    @rule(outputs={'o': '{n}.txt'}, matrix={'n': [1, 2]})
+    def legacy(outputs, n):
+        pass
+
+    meta = Sqlite3Backend(':memory:')
+    meta.ensure_rules([legacy])
+    for task in expand_rule(legacy):
+        SidecarWriter().update_task(task, TASK_STATUS_SUCCESS)
+    (Path('.remake/tasks/results/legacy') / PENDING_MARKER).unlink()
+
+    assert meta.ingest_sidecars([legacy]) == 2
+    assert meta.ingest_sidecars([legacy]) == 0
+
+
+def test_packed_log_ingests_from_committed_offset(tmp_path, monkeypatch):
+    # Packed results are read from where the last ingest stopped; a torn
+    # record is skipped with a warning and an incomplete tail is left for
+    # the next ingest.
+    from remake.core.dag import expand_rule
+    from remake.metadata.sidecar import SidecarWriter, pack_record
+
+    monkeypatch.chdir(tmp_path)
+
+    @rule(outputs={'o': '{n}.txt'}, matrix={'n': list(range(4))})
+    def packed(outputs, n):
+        pass
+
+    meta = Sqlite3Backend(':memory:')
+    meta.ensure_rules([packed])
+    tasks = expand_rule(packed)
+    writer = SidecarWriter(pack='node1')
+    writer.update_task(tasks[0], TASK_STATUS_SUCCESS)
+    assert meta.ingest_sidecars([packed]) == 1
+
+    log = Path('.remake/tasks/results/packed/packed/node1.log')
+    writer.update_task(tasks[1], TASK_STATUS_SUCCESS)
+    with open(log, 'ab') as f:
+        f.write(pack_record({'key': 'torn'})[:-3])  # a write that died part-way
+    writer.update_task(tasks[2], TASK_STATUS_SUCCESS)
+    record = pack_record({'key': tasks[3].key, 'status': TASK_STATUS_SUCCESS})
+    with open(log, 'ab') as f:
+        f.write(record[:10])  # still being appended
+    msgs = _capture_warnings(lambda: meta.ingest_sidecars([packed]))
+    assert any('torn record' in msg for msg in msgs)
+    assert set(meta.get_tasks_status(tasks)) == {t.key for t in tasks[:3]}
+
+    with open(log, 'ab') as f:
+        f.write(record[10:])
+    Path('.remake/tasks/results/packed/.pending').touch()  # as a writer would
+    assert meta.ingest_sidecars([packed]) == 1
+    assert len(meta.get_tasks_status(tasks)) == 4
+
+
+def test_packed_log_retires_once_old_even_when_idle(tmp_path, monkeypatch):
+    # A log is usually too young to retire at its final ingest; a later
+    # ingest retires it although the rule's results are marked idle. A tail
+    # record whose writer died is skipped as torn once the log is old.
+    import os
+    from time import time
+
+    from remake.core.dag import expand_rule
+    from remake.metadata.sidecar import SidecarWriter, pack_record
+
+    monkeypatch.chdir(tmp_path)
+
+    @rule(outputs={'o': '{n}.txt'}, matrix={'n': list(range(2))})
+    def retired(outputs, n):
+        pass
+
+    meta = Sqlite3Backend(':memory:')
+    meta.ensure_rules([retired])
+    tasks = expand_rule(retired)
+    log = Path('.remake/tasks/results/retired/packed/node1.log')
+    old = time() - 2 * Sqlite3Backend.PACKED_LOG_RETIRE_S
+
+    SidecarWriter(pack='node1').update_task(tasks[0], TASK_STATUS_SUCCESS)
+    assert meta.ingest_sidecars([retired]) == 1
+    assert log.exists()  # young
+    os.utime(log, (old, old))
+    assert meta.ingest_sidecars([retired]) == 0
+    assert not log.exists()
+    assert not list(meta.conn.execute('SELECT * FROM sidecar_log'))
+
+    SidecarWriter(pack='node1').update_task(tasks[1], TASK_STATUS_SUCCESS)
+    with open(log, 'ab') as f:
+        f.write(pack_record({'key': 'torn'})[:-3])  # the writer died here
+    assert meta.ingest_sidecars([retired]) == 1
+    assert log.exists()  # the tail might still be being appended
+    os.utime(log, (old, old))
+    msgs = _capture_warnings(lambda: meta.ingest_sidecars([retired]))
+    assert any('torn record' in msg for msg in msgs)
+    assert not log.exists()
+    assert len(meta.get_tasks_status(tasks)) == 2
+
+
+def test_read_packed_in_small_chunks(tmp_path, monkeypatch):
+    # Reading a chunk at a time gives the same records and end offset as one
+    # read, whatever the chunk boundaries split.
+    from remake.metadata import sidecar
+    from remake.metadata.sidecar import pack_record, read_packed
+
+    log = tmp_path / 'node1.log'
+    records = [pack_record({'key': f'k{i}', 'pad': 'x' * i}) for i in range(6)]
+    records.insert(3, pack_record({'key': 'torn'})[:-3])
+    tail = pack_record({'key': 'tail'})[:9]
+    log.write_bytes(b''.join(records) + tail)
+
+    expected = read_packed(log)
+    assert [p['key'] for p in expected[0]] == [f'k{i}' for i in range(6)]
+    assert expected[1] == log.stat().st_size - len(tail)
+    for chunk in (1, 3, 7, 16, 50):
+        monkeypatch.setattr(sidecar, 'PACKED_READ_CHUNK', chunk)
+        assert read_packed(log) == expected
+        assert read_packed(log, final=True) == (expected[0], log.stat().st_size)
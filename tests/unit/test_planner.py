@@ -1,5 +1,7 @@
 from pathlib import Path
 
+import pytest
+
 from remake import Remake, Sqlite3Backend, rule
 from remake.core.planner import make_predicate
 from remake.metadata import TASK_STATUS_FAILED
@@ -212,7 +214,14 @@ def test_info_fetches_each_record_once(tmp_path, monkeypatch):
 
     fetched = _spy_record_fetches(monkeypatch)
     rmk.status_summary()
+    # Nothing changed since run()'s final plan: every rule is answered from
+    # its plan snapshot, with no record fetches at all.
+    assert fetched == []
+
+    rmk.metadata.delete_tasks(rmk.tasks())
+    rmk.status_summary()
     assert len(fetched) == len(set(fetched)) == n_tasks
+    rmk.run()
 
     fetched.clear()
     rmk.status_summary(reasons=True, list_tasks=True, list_failures=True)
@@ -496,12 +505,64 @@ def test_task_from_spec_and_key_lookup(tmp_path):
     assert rmk.task_from_key(direct.key) == direct
     assert rmk.task_from_key(direct.key[:12]) == direct
 
-    import pytest as _pytest
-
-    with _pytest.raises(Exception, match='No rule named'):
+    with pytest.raises(Exception, match='No rule named'):
         rmk.task_from_spec('nope', {})
 
 
+def test_task_from_key_resolves_recorded_tasks_from_the_db(tmp_path, monkeypatch):
+    import remake.core.remake as remake_module
+    from remake import RemakeError
+    from remake.metadata import TASK_STATUS_SUCCESS
+
+    @rule(outputs={'o': str(tmp_path / '{n}.txt')}, matrix={'n': list(range(50))})
+    def r(outputs, n):
+        pass
+
+    rmk = Remake(rules=[r], metadata=Sqlite3Backend(':memory:'))
+    tasks = rmk.tasks()
+    recorded, unrecorded = tasks[17], tasks[18]
+    rmk.metadata.update_task(recorded, TASK_STATUS_SUCCESS)
+    assert rmk.metadata.find_tasks_by_key(recorded.key[:8]) == [
+        (recorded.key, 'r', {'n': 17})]
+
+    scanned = []
+    real_expand = remake_module.expand_rule_batch
+    monkeypatch.setattr(remake_module, 'expand_rule_batch',
+                        lambda rule: scanned.append(rule) or real_expand(rule))
+    # Recorded: one indexed query, no matrix scan.
+    assert rmk.task_from_key(recorded.key[:8]) == recorded
+    assert rmk.task_from_key(recorded.key) == recorded
+    assert scanned == []
+    # Never recorded: falls back to the scan.
+    assert rmk.task_from_key(unrecorded.key[:8]) == unrecorded
+    assert scanned == [r]
+
+    # Two recorded matches are ambiguous without scanning.
+    rmk.metadata.update_tasks(tasks, TASK_STATUS_SUCCESS)
+    with pytest.raises(RemakeError, match='ambiguous'):
+        rmk.task_from_key('')
+
+
+def test_task_from_key_ignores_records_outside_the_matrix(tmp_path):
+    from remake import RemakeError
+    from remake.metadata import TASK_STATUS_SUCCESS
+
+    @rule(outputs={'o': str(tmp_path / '{year}.txt')}, matrix={'year': [2019, 2020]})
+    def r(outputs, year):
+        pass
+
+    rmk = Remake(rules=[r], metadata=Sqlite3Backend(':memory:'))
+    dropped, kept = rmk.tasks()
+    rmk.metadata.update_tasks([dropped, kept], TASK_STATUS_SUCCESS)
+    r.matrix = {'year': [2020]}  # 2019 dropped from the matrix
+
+    with pytest.raises(RemakeError, match='No task with key'):
+        rmk.task_from_key(dropped.key)
+    assert rmk.task_from_key(kept.key) == kept
+    # A prefix matching the live task and the stale record is not ambiguous.
+    assert rmk.task_from_key('') == kept
+
+
 # --- check_outputs modes ---
 
 
@@ -531,3 +592,93 @@ def test_always_mode_detects_deleted_output(tmp_path):
     rmk.check_outputs = 'always'
     runnable, _ = rmk.plan()
     assert {t.kwargs.get('n') for t in runnable if t.rule.name == 'rule_a'} == {1}
+
+
+def test_output_checks_batched_per_rule(tmp_path, monkeypatch):
+    import remake.core.planner as planner
+
+    rmk, *_ = make_pipeline(tmp_path)
+    rmk.run()
+    (tmp_path / 'b_2.txt').unlink()
+    calls = []
+    real_check = planner.check_complete
+
+    def counting_check(tokens):
+        tokens = list(tokens)
+        calls.append(len(tokens))
+        return real_check(tokens)
+
+    monkeypatch.setattr(planner, 'check_complete', counting_check)
+    rmk.check_outputs = 'always'
+    runnable, _ = rmk.plan()
+    # One call per rule; rule_c is tainted by rule_b[n=2] and never checked.
+    assert calls == [2, 2]
+    assert sorted(t.rule.name for t in runnable) == ['rule_b', 'rule_c']
+
+
+def test_run_invalidates_listing_cache(tmp_path):
+    from remake.core.tokens import listing_cache
+
+    rmk, *_ = make_pipeline(tmp_path, check_outputs='always')
+    with listing_cache():
+        assert len(rmk.plan()[0]) == 5  # caches tmp_path's listing: empty
+        assert rmk.run() == 0
+        runnable, _ = rmk.plan()
+    assert not runnable
+
+
+def test_unchanged_rules_replan_from_snapshot(tmp_path, monkeypatch):
+    import remake.core.planner as planner
+
+    rmk, *_ = make_pipeline(tmp_path)
+    rmk.run()
+    first = rmk.status_summary()
+    expanded = []
+    real_expand = planner.expand_rule_batch
+
+    def counting_expand(rule, predicate=None):
+        expanded.append(rule.name)
+        return real_expand(rule, predicate)
+
+    monkeypatch.setattr(planner, 'expand_rule_batch', counting_expand)
+    runnable, deferred = rmk.plan()
+    assert not runnable and not deferred
+    assert expanded == []
+    assert rmk.status_summary() == first
+
+
+def test_read_only_commands_store_no_plan_snapshots(tmp_path):
+    rmk, *_ = make_pipeline(tmp_path)
+    rmk.run()
+    rmk.metadata.conn.execute('DELETE FROM plan_snapshot')
+    rmk.status_summary()
+    list(rmk.explain_tasks())
+    assert rmk.metadata.conn.execute(
+        'SELECT count(*) FROM plan_snapshot').fetchone()[0] == 0
+    rmk.plan()
+    assert rmk.metadata.conn.execute(
+        'SELECT count(*) FROM plan_snapshot').fetchone()[0] == 3
+
+
+def test_plan_snapshot_invalidated_by_task_write(tmp_path):
+    rmk, rule_a, *_ = make_pipeline(tmp_path)
+    rmk.run()
+    assert rmk.plan() == ([], [])
+    task = next(t for t in rmk.tasks() if t.rule is rule_a and t.kwargs == {'n': 2})
+    rmk.metadata.update_task(task, TASK_STATUS_FAILED, exception='boom')
+    runnable, _ = rmk.plan()
+    assert [(t.rule.name, t.kwargs) for t in runnable] == [
+        ('rule_a', {'n': 2}), ('rule_b', {'n': 2}), ('rule_c', {})]
+    # Served from the snapshot the previous plan stored: same answer.
+    assert rmk.plan()[0] == runnable
+    summary = rmk.status_summary()['totals']
+    assert summary['failed'] == 1 and summary['stale'] == 2 and summary['to_run'] == 3
+
+
+def test_plan_snapshot_invalidated_by_code_change(tmp_path):
+    rmk, rule_a, rule_b, rule_c = make_pipeline(tmp_path)
+    rmk.run()
+    assert rmk.plan() == ([], [])
+    rule_b.uses = {'factor': 2}
+    runnable, _ = rmk.plan()
+    assert [t.rule.name for t in runnable] == ['rule_b', 'rule_b', 'rule_c']
@@ -0,0 +1,95 @@
+import pytest
+
+from remake import QueryError, rule
+from remake.core.dag import expand_rule, expand_rule_batch
+from remake.core.query import Query
+
+
+@rule(matrix={'year': list(range(2000, 2010)), 'model': ['era5', 'merra2', 'jra55'],
+              ('lat', 'lon'): [(0, 0), (10, 20), (-10, 5)]})
+def grid(year, model, lat, lon):
+    pass
+
+
+@pytest.mark.parametrize('query', [
+    "year == 2005",
+    "model in ['era5', 'jra55'] and year >= 2007",
+    "2001 < year <= 2003 and lat == 10",
+    "rule == 'grid' and model != 'era5' and lon > 0",
+    "rule == 'other'",
+    "year == 2005 and (model == 'era5' or lat < 0)",  # partly per row
+    "year % 2 == 0 and model == 'merra2'",  # arithmetic: per row
+    "year == lat",  # two names: per row
+    "missing == 1",  # no such kwarg: nothing
+    "missing == 1 or year == 2000",
+    "not year == 2000",
+    "True",
+])
+def test_pushdown_matches_per_row_evaluation(query):
+    def per_row(namespace):
+        return Query(query)(namespace)  # a plain callable: no pushdown
+
+    pushed = [t.kwargs for t in expand_rule(grid, Query(query))]
+    assert pushed == [t.kwargs for t in expand_rule(grid, per_row)]
+
+
+def test_query_split():
+    query = Query("rule == 'a' and 1990 < year < 2000 and x in (1, 2) and y == z")
+    assert sorted(query.conditions) == ['rule', 'x', 'year']
+    assert query.accepts('year', 1995) and not query.accepts('year', 2000)
+    assert query.residual_predicate()({'y': 1, 'z': 1})
+    assert Query("year == 2000 and model == 'a'").residual_predicate() is None
+
+
+@pytest.mark.parametrize('query', [
+    "().__class__.__bases__",
+    "__import__('os').system('true')",
+    "model.upper() == 'ERA5'",
+    "[x for x in range(3)]",
+    "(y := 1)",
+    "year ==",
+    "'x' * 1000 * 1000 * 1000 * 1000 == year",  # ~1 TB per row
+    "[0] * 1000000000000 == year",
+    "'%0500000000d' % year == 'x'",  # printf: ~500 MB per row
+])
+def test_disallowed_or_invalid_query_rejected(query):
+    with pytest.raises(QueryError):
+        Query(query)
+
+
+def test_narrow_query_on_a_huge_matrix_skips_the_product():
+    @rule(matrix={'a': list(range(1000)), 'b': list(range(1000))})
+    def huge(a, b):
+        pass
+
+    query = Query('a == 7 and b in [1, 2, 3]')
+    assert query.residual_predicate() is None  # nothing evaluated per row
+    ncalls = 0
+
+    def counted(test):
+        def count(value):
+            nonlocal ncalls
+            ncalls += 1
+            return test(value)
+        return count
+
+    query.conditions = {name: [counted(test) for test in tests]
+                        for name, tests in query.conditions.items()}
+    batch = expand_rule_batch(huge, query)
+    assert ncalls == 2000  # each axis value once, not each of the 1e6 rows
+    assert [batch.kwargs(i) for i in range(len(batch))] == [
+        {'a': 7, 'b': 1}, {'a': 7, 'b': 2}, {'a': 7, 'b': 3}]
+
+
+def test_multiplying_a_non_number_kwarg_is_an_error():
+    query = Query("year * 2 == 4000 or model * 1000000000000 == 'x'")
+    assert query({'year': 2000, 'model': 'era5'})
+    with pytest.raises(QueryError, match='numbers only'):
+        query({'year': 1999, 'model': 'era5'})
+
+
+def test_formatting_a_non_number_kwarg_is_an_error():
+    query = Query("year % 10 == 0 or model % 1 == 'x'")
+    assert query({'year': 2000, 'model': 'era5'})
+    with pytest.raises(QueryError, match='numbers only'):
+        query({'year': 1999, 'model': '%0500000000d'})
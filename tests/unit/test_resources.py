@@ -314,6 +314,8 @@ def test_sidecar_round_trip_lands_resources_in_the_db(tmp_path, meta, monkeypatc
     assert record.wall_s is not None
     assert record.max_rss_bytes > 0
     assert record.rss_method == 'sample'
+    # The sidecar carries kwargs, so the ingested task resolves by key.
+    assert meta.find_tasks_by_key(task.key) == [(task.key, produce.name, task.kwargs)]
 
 
 def test_pre_0_9_sidecar_without_resources_ingests_as_nulls(tmp_path, meta, monkeypatch):
@@ -180,3 +180,24 @@ def test_callable_matrix_io_spec_checked_at_expansion():
 
     with pytest.raises(SignatureError, match="inputs function"):
         expand_rule(r)
+
+
+def test_checks_only_for_defers_other_rules_to_finalize():
+    from remake import Remake
+    from remake.core.rule import checks_only_for
+
+    with checks_only_for(['target']):
+
+        @rule(outputs={'o': 'o.txt'})
+        def other():  # missing the outputs parameter: deferred, not raised
+            pass
+
+        with pytest.raises(SignatureError):
+
+            @rule(outputs={'o': 'o.txt'})
+            def target():
+                pass
+
+    assert other._checks_deferred
+    with pytest.raises(SignatureError):
+        Remake(rules=[other]).finalize()
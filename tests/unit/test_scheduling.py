@@ -0,0 +1,255 @@
+from remake import Remake, rule
+from remake.metadata import TASK_STATUS_SUCCESS
+
+
+def _rule(tmp_path, config=None):
+    @rule(outputs={'o': str(tmp_path / '{n}.txt')}, matrix={'n': list(range(100))},
+          config=config)
+    def tiny(outputs, n):
+        pass
+
+    return tiny
+
+
+def test_batch_size_fixed_and_capped_by_worker_share(tmp_path, meta):
+    from remake.core.dag import expand_rule
+    from remake.executors.scheduling import batch_size, batches
+
+    r = _rule(tmp_path)
+    rmk = Remake(rules=[r], metadata=meta, config={'multiproc': {'batch_size': 30}})
+    tasks = expand_rule(r)
+    assert batch_size(rmk, r, tasks, 2, 'multiproc') == 30
+    # Never more than an equal share per worker: 100 tasks on 8 -> 13.
+    assert batch_size(rmk, r, tasks, 8, 'multiproc') == 13
+    assert batch_size(rmk, r, tasks, 2, 'dask') == 1  # other section: unbatched
+    assert [len(b) for b in batches(tasks, 30)] == [30, 30, 30, 10]
+
+
+def test_batch_seconds_uses_recorded_wall_time(tmp_path, meta):
+    from remake.core.dag import expand_rule
+    from remake.executors.scheduling import batch_size
+
+    r = _rule(tmp_path, config={'multiproc': {'batch_seconds': 1.0}})
+    rmk = Remake(rules=[r], metadata=meta,
+                 config={'multiproc': {'batch_size': 4}})
+    rmk.finalize()
+    tasks = expand_rule(r)
+    # No measurements yet: the fixed size is the fallback.
+    assert batch_size(rmk, r, tasks, 1, 'multiproc') == 4
+    for task in tasks[:5]:
+        meta.update_task(task, TASK_STATUS_SUCCESS, resources={
+            'wall_s': 0.05, 'cpu_s': 0.05, 'max_rss_bytes': None, 'rss_method': None})
+    assert batch_size(rmk, r, tasks, 1, 'multiproc') == 20
+
+
+def test_pack_durations_next_fit_in_order():
+    from remake.executors.scheduling import pack_durations
+
+    assert pack_durations([10, 20, 25, 5, 100, 1], 30) == [[0, 1], [2, 3], [4], [5]]
+    # Unknown durations are estimated from the known median (10 here).
+    assert pack_durations([10, None, None, 10], 25) == [[0, 1], [2, 3]]
+    # Nothing known: fixed-size runs.
+    assert pack_durations([None] * 5, 30, size=2) == [[0, 1], [2, 3], [4]]
+    assert pack_durations([None] * 2, 30) == [[0], [1]]
+
+
+def test_parse_mem_and_detect_budget(tmp_path, monkeypatch):
+    from remake.executors import scheduling
+
+    assert scheduling.parse_mem('512M') == 512 * 2**20
+    assert scheduling.parse_mem('1.5g') == 3 * 2**29
+    assert scheduling.parse_mem('100') == 100 * 2**20  # sbatch --mem: MB
+    assert scheduling.parse_mem(4096) == 4096
+    assert scheduling.resolve_mem_budget(None) is None
+
+    root = tmp_path / 'cgroup'
+    monkeypatch.setattr(scheduling, 'CGROUP_ROOT', root)
+    monkeypatch.setattr(scheduling, 'PROC_CGROUP', tmp_path / 'missing')
+    (root / 'memory').mkdir(parents=True)
+    (root / 'memory.max').write_text('max\n')  # v2, unlimited: physical memory
+    # v1 reports unlimited as a huge number.
+    (root / 'memory/memory.limit_in_bytes').write_text(f'{2**62}\n')
+    physical = scheduling.detect_mem_budget()
+    assert physical is not None and physical < 2**62
+    (root / 'memory.max').write_text(f'{2**30}\n')
+    assert scheduling.resolve_mem_budget('auto') == 2**30
+
+
+def test_detect_budget_reads_own_nested_cgroup(tmp_path, monkeypatch):
+    # Under SLURM/systemd/containers the limit is on the process's own cgroup
+    # (or an ancestor), while the root says 'max'; the smallest one wins.
+    from remake.executors import scheduling
+
+    root = tmp_path / 'cgroup'
+    monkeypatch.setattr(scheduling, 'CGROUP_ROOT', root)
+    monkeypatch.setattr(scheduling, 'PROC_CGROUP', tmp_path / 'cgroup.txt')
+    job = root / 'system.slice/slurmstepd.scope/job_42'
+    step = job / 'step_0/user/task_0'
+    step.mkdir(parents=True)
+    (root / 'memory.max').write_text('max\n')
+    (job / 'memory.max').write_text(f'{2**30}\n')
+    (job / 'step_0/memory.max').write_text(f'{2**31}\n')
+    (step / 'memory.max').write_text('max\n')
+    (tmp_path / 'cgroup.txt').write_text(
+        '0::/system.slice/slurmstepd.scope/job_42/step_0/user/task_0\n')
+    assert scheduling.detect_mem_budget() == 2**30
+
+    # cgroup v1: the memory controller's hierarchy.
+    v1 = root / 'memory/slurm/uid_1000/job_42'
+    v1.mkdir(parents=True)
+    (v1 / 'memory.limit_in_bytes').write_text(f'{2**29}\n')
+    (root / 'memory/memory.limit_in_bytes').write_text(f'{2**62}\n')
+    (tmp_path / 'cgroup.txt').write_text(
+        '5:cpuset:/slurm/uid_1000/job_42\n'
+        '4:memory:/slurm/uid_1000/job_42\n')
+    assert scheduling.detect_mem_budget() == 2**29
+
+
+def test_task_mem_from_history_config_or_default(tmp_path, meta):
+    from remake.core.dag import expand_rule
+    from remake.executors.scheduling import task_mem
+
+    r = _rule(tmp_path)
+    rmk = Remake(rules=[r], metadata=meta,
+                 config={'multiproc': {'default_task_mem': '2G'}})
+    rmk.finalize()
+    assert task_mem(rmk, r, 'multiproc') == 2 * 2**30
+    for rss, task in zip((100, 300, 200), expand_rule(r)):
+        meta.update_task(task, TASK_STATUS_SUCCESS, resources={
+            'wall_s': 1.0, 'cpu_s': 1.0, 'max_rss_bytes': rss, 'rss_method': 'sample'})
+    assert task_mem(rmk, r, 'multiproc') == 300  # the largest recorded peak
+    r.config['multiproc'] = {'task_mem': '1G'}
+    assert task_mem(rmk, r, 'multiproc') == 2**30
+
+
+def test_critical_path_priority_starts_long_chains_first():
+    from remake.executors.scheduling import critical_path, dependents, priority_keys, simulate
+
+    # a[i] -> b[i] element-wise; b[0] is the long one.
+    durations = [[1.0, 2.0, 3.0], [10.0, 1.0, 1.0]]
+    task_waits = [[[], [], []], [[(0, 0)], [(0, 1)], [(0, 2)]]]
+    group_waits = [[], []]
+    ranks = critical_path(durations, *dependents(task_waits, group_waits))
+    assert [ranks[0, i] for i in range(3)] == [11.0, 3.0, 4.0]
+
+    def makespan(priority):
+        rmk = Remake(config={'multiproc': {'priority': priority}})
+        keys = priority_keys(rmk, None, durations, ranks, 'multiproc')
+        return simulate(durations, task_waits, group_waits, 2, keys)
+
+    # a[0] is the shortest task, but b[0] hangs off it.
+    assert makespan('critical_path') == 11.0
+    assert makespan('plan') == 12.0
+    assert makespan('longest') == 13.0
+    # A rule-level wait makes every task of the upstream group carry the
+    # longest downstream chain.
+    ranks = critical_path(durations, *dependents([[[]] * 3, [[]] * 3], [[], [0]]))
+    assert [ranks[0, i] for i in range(3)] == [11.0, 12.0, 13.0]
+
+
+def test_priority_callable_and_unknown(tmp_path):
+    import pytest
+
+    from remake.core.dag import expand_rule
+    from remake.core.exceptions import RemakeError
+    from remake.executors.scheduling import priority_keys
+
+    r = _rule(tmp_path)
+    groups = [(r, expand_rule(r)[:3])]
+    durations = [[1.0, 2.0, 3.0]]
+    ranks = {(0, i): 0.0 for i in range(3)}
+    rmk = Remake(config={'dask': {'priority': lambda task, seconds: task.kwargs['n']}})
+    keys = priority_keys(rmk, groups, durations, ranks, 'dask')
+    assert sorted(keys, key=keys.get) == [(0, 2), (0, 1), (0, 0)]  # higher first
+    rmk = Remake(config={'dask': {'priority': 'shortest'}})
+    with pytest.raises(RemakeError, match='unknown priority'):
+        priority_keys(rmk, groups, durations, ranks, 'dask')
+
+
+def test_task_durations_fall_back_to_rule_then_wave_median(tmp_path, meta):
+    from remake.core.dag import expand_rule
+    from remake.executors.scheduling import task_durations
+
+    r = _rule(tmp_path)
+
+    @rule(outputs={'o': str(tmp_path / 'other_{n}.txt')}, matrix={'n': [0, 1]})
+    def other(outputs, n):
+        pass
+
+    rmk = Remake(rules=[r, other], metadata=meta)
+    rmk.finalize()
+    tasks = expand_rule(r)[:4]
+    groups = [(r, tasks), (other, expand_rule(other))]
+    assert task_durations(rmk, groups) == ([[1.0] * 4, [1.0] * 2], False)
+    for wall, task in zip((2.0, 4.0, 9.0), tasks):
+        meta.update_task(task, TASK_STATUS_SUCCESS, resources={
+            'wall_s': wall, 'cpu_s': wall, 'max_rss_bytes': None, 'rss_method': None})
+    durations, measured = task_durations(rmk, groups)
+    assert measured
+    assert durations == [[2.0, 4.0, 9.0, 4.0], [4.0, 4.0]]
+
+
+def _estimate_rules(tmp_path, gen_config=None):
+    @rule(outputs={'raw': str(tmp_path / 'raw_{n}.txt')}, matrix={'n': [0, 1, 2, 3]},
+          config=gen_config)
+    def generate(outputs, n):
+        pass
+
+    @rule(inputs=generate.outputs, outputs={'out': str(tmp_path / 'out_{n}.txt')},
+          matrix=generate.matrix, depends_on=[generate])
+    def process(inputs, outputs, n):
+        pass
+
+    return generate, process
+
+
+def _estimate(tmp_path, meta, model, config=None, gen_config=None, nproc=2):
+    from remake.core.dag import expand_rule
+    from remake.executors.estimate import estimate
+
+    generate, process = _estimate_rules(tmp_path, gen_config)
+    rmk = Remake(rules=[generate, process], metadata=meta, config=config)
+    rmk.finalize()
+    tasks = expand_rule(generate) + expand_rule(process)
+    for wall, task in zip((4, 1, 1, 1, 1, 1, 1, 4), tasks):
+        meta.update_task(task, TASK_STATUS_SUCCESS, resources={
+            'wall_s': float(wall), 'cpu_s': 0.0, 'max_rss_bytes': None, 'rss_method': None})
+    return estimate(rmk, tasks, model, nproc)
+
+
+def test_estimate_local_models(tmp_path, meta):
+    est = _estimate(tmp_path, meta, 'singleproc')
+    assert (est.nslots, est.makespan) == (1, 14.0)
+    # Per-rule barriers on 2 workers: 4 | 1+1+1 for each rule.
+    est = _estimate(tmp_path, meta, 'dask')
+    assert est.makespan == 8.0
+    assert est.rules[0]['utilisation'] == 0.875  # 7s of work in 2 x 4s
+    # Pipelined: process[3] (4s) starts as soon as generate[3] is done.
+    est = _estimate(tmp_path, meta, 'multiproc')
+    assert (est.makespan, est.critical_path_s) == (7.0, 5.0)
+    assert est.nmeasured == est.ntasks == 8
+    assert [(s['rule'], s['kwargs'], s['seconds']) for s in est.path] == [
+        ('generate', {'n': 0}, 4.0), ('process', {'n': 0}, 1.0)]
+
+
+def test_estimate_slurm_aftercorr_throttle_and_bundles(tmp_path, meta):
+    import pytest
+
+    from remake.core.exceptions import RemakeError
+
+    # aftercorr, room for everything: the longest element chain.
+    est = _estimate(tmp_path, meta, 'slurm', nproc=None)
+    assert (est.nslots, est.makespan) == (None, 5.0)
+    # generate throttled to one element at a time.
+    est = _estimate(tmp_path, meta, 'slurm', nproc=None,
+                    gen_config={'slurm': {'array_throttle': 1}})
+    assert est.makespan == 11.0
+    assert est.rules[0]['slots'] == 1 and est.rules[1]['slots'] == 4
+    # Bundled in pairs (process follows its element-wise upstream's bundles).
+    est = _estimate(tmp_path, meta, 'slurm', nproc=None,
+                    config={'slurm': {'bundle_size': 2}})
+    assert [r['elements'] for r in est.rules] == [2, 2]
+    assert est.makespan == 7.0
+    assert est.path[0]['ntasks'] == 2
+    with pytest.raises(RemakeError, match='Unknown estimate model'):
+        _estimate(tmp_path, meta, 'threads')
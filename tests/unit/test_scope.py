@@ -3,7 +3,13 @@ import warnings
 import pytest
 
 from remake import Remake, ScopeError, ScopeWarning, Sqlite3Backend, rule
-from remake.core.scope import exec_function, function_source, undeclared_names, uses_hash
+from remake.core.scope import (
+    exec_function,
+    function_source,
+    io_hash,
+    undeclared_names,
+    uses_hash,
+)
 
 CONSTANT = 42
 
@@ -166,6 +172,38 @@ def test_uses_hash_class_body_change(tmp_path):
     assert exec_function(fn, {'Calib': c1})(1.0) == 2.5
 
 
+def test_rule_renderings_memoised_until_their_objects_change(tmp_path):
+    import os
+
+    from remake.loader import load_module
+
+    helpers = tmp_path / 'helpers_memo.py'
+    helpers.write_text('def normalise(x):\n    return x * 3\n')
+    normalise = load_module(helpers).normalise
+
+    @rule(outputs={'o': 'o.txt'}, uses={'normalise': normalise, 't': 0.5})
+    def r(outputs):
+        pass
+
+    assert r.uses_hash == uses_hash(r.uses)
+    assert r.source is r.source and r.uses_hash is r.uses_hash
+    first = r.uses_hash
+
+    # The helper's file is edited (a notebook/long-lived process reloading
+    # nothing): its mtime changes, so the source is read again.
+    helpers.write_text('def normalise(x):\n    return x * 4\n')
+    stat = helpers.stat()
+    os.utime(helpers, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert r.uses_hash != first
+
+    # A plain value changed in place, and a rebound part, are seen too.
+    r.uses['t'] = 0.7
+    assert 't=0.7' in r.uses_hash
+    io_before = r.io_hash
+    r.outputs = {'o': 'other.txt'}
+    assert r.io_hash != io_before and r.io_hash == io_hash(r)
+
+
 def test_uses_hash_handles_sourceless_class():
     # A class defined via exec has no source AND no __code__: must not
     # crash; falls back to repr (body changes undetected, documented).
@@ -1,5 +1,5 @@
 from remake import FileToken, ZarrStore, rule
-from remake.core.task import Task
+from remake.core.task import Task, compute_keys, prime_keys
 
 
 @rule(
@@ -24,6 +24,28 @@ def test_key_differs_for_different_kwargs():
     assert t1.key != t2.key
 
 
+def test_compute_keys_matches_task_key():
+    rows = [
+        {'model': 'era5', 'year': 1980},
+        {'year': 1981, 'model': 'era5'},  # order-independent, like Task.key
+        {'model': "it's", 'year': -0.0},
+        {'model': 'era5', 'year': True},
+        {'model': 'era5'},  # a different name set falls back per row
+        {'model': 'era5', 'month': 1},
+    ]
+    assert compute_keys(example, rows) == [
+        Task(rule=example, kwargs=kw).key for kw in rows]
+    assert compute_keys(example, []) == []
+
+
+def test_prime_keys_seeds_cached_key():
+    tasks = [Task(rule=example, kwargs={'model': 'era5', 'year': y}) for y in (1, 2)]
+    prime_keys(tasks)
+    assert all('key' in t.__dict__ for t in tasks)
+    assert [t.key for t in tasks] == [
+        Task(rule=example, kwargs=t.kwargs).key for t in tasks]
+
+
 def test_format_string_resolution():
     t = Task(rule=example, kwargs={'model': 'era5', 'year': 1980})
     assert t.inputs == {'raw': 'data/raw/era5/1980.nc'}
@@ -3,7 +3,17 @@ from pathlib import Path
 
 import pytest
 
-from remake.core.tokens import FileToken, S3Object, ZarrStore, as_token
+from remake.core.tokens import (
+    SCANDIR_MIN_PATHS,
+    FileToken,
+    OutputToken,
+    S3Object,
+    ZarrStore,
+    as_token,
+    check_complete,
+    invalidate_listings,
+    listing_cache,
+)
 
 
 def test_file_token_is_path_like():
@@ -29,6 +39,84 @@ def test_zarr_store_requires_consolidated_metadata(tmp_path):
     assert token.is_complete()
 
 
+class _FlagToken(OutputToken):
+    def __init__(self, done):
+        self.done = done
+
+    def identity(self):
+        return f'flag:{self.done}'
+
+    def format(self, **kwargs):
+        return self
+
+    def is_complete(self):
+        return self.done
+
+
+def test_check_complete_matches_is_complete(tmp_path):
+    dense = tmp_path / 'dense'
+    dense.mkdir()
+    for n in range(0, 2 * SCANDIR_MIN_PATHS, 2):
+        (dense / f'{n}.nc').write_text('x')
+    (dense / 'dangling.nc').symlink_to(tmp_path / 'nowhere')
+    (dense / 'linked.nc').symlink_to(dense / '0.nc')
+    (tmp_path / 'sparse.txt').write_text('x')
+    store = tmp_path / 'store.zarr'
+    store.mkdir()
+    (store / '.zmetadata').write_text('{}')
+    tokens = [FileToken(str(dense / f'{n}.nc')) for n in range(2 * SCANDIR_MIN_PATHS)]
+    tokens += [
+        FileToken(str(dense / 'dangling.nc')),
+        FileToken(str(dense / 'linked.nc')),
+        FileToken(str(tmp_path / 'sparse.txt')),
+        FileToken(str(tmp_path / 'missing_dir' / 'a.nc')),
+        FileToken(str(dense) + '/'),
+        ZarrStore(str(store)),
+        ZarrStore(str(tmp_path / 'half.zarr')),
+        _FlagToken(True),
+        _FlagToken(False),
+    ]
+    expected = [token.is_complete() for token in tokens]
+    assert check_complete(tokens) == expected
+    assert check_complete(tokens, max_workers=1) == expected
+    assert check_complete([]) == []
+
+
+def test_listing_cache_scans_each_directory_once(tmp_path, monkeypatch):
+    import remake.core.tokens as tokens_mod
+
+    for n in range(3):
+        (tmp_path / f'{n}.nc').write_text('x')
+    scanned = []
+    real_scan = tokens_mod._scan
+
+    def counting_scan(parent):
+        scanned.append(parent)
+        return real_scan(parent)
+
+    monkeypatch.setattr(tokens_mod, '_scan', counting_scan)
+    tokens = [FileToken(str(tmp_path / f'{n}.nc')) for n in range(5)]
+    with listing_cache():
+        assert [t.is_complete() for t in tokens] == [True] * 3 + [False] * 2
+        assert check_complete(tokens) == [True] * 3 + [False] * 2
+    assert scanned == [str(tmp_path)]
+    assert [t.is_complete() for t in tokens] == [True] * 3 + [False] * 2
+    assert scanned == [str(tmp_path)]  # no cache outside the block
+
+
+def test_listing_cache_stale_until_invalidated(tmp_path):
+    token = FileToken(str(tmp_path / 'out' / 'a.nc'))
+    store = ZarrStore(str(tmp_path / 'out' / 'b.zarr'))
+    with listing_cache():
+        assert not token.is_complete() and not store.is_complete()
+        (tmp_path / 'out' / 'b.zarr').mkdir(parents=True)
+        Path(token).write_text('x')
+        (tmp_path / 'out' / 'b.zarr' / '.zmetadata').write_text('{}')
+        assert not token.is_complete()  # cached: out/ did not exist
+        invalidate_listings([token, store])
+        assert token.is_complete() and store.is_complete()
+
+
 def test_format_interpolates_and_preserves_type():
     token = ZarrStore('data/{model}/{year}.zarr').format(model='era5', year=1980)
     assert isinstance(token, ZarrStore)